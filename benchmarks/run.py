@@ -0,0 +1,254 @@
+
+"""Offline micro/macro benchmarks for the closed-loop hot paths.
+
+    python -m benchmarks.run                         # full matrix -> bench_results.json
+    python -m benchmarks.run --quick --out new.json
+    python -m benchmarks.run --baseline bench_results.json --threshold 0.2
+
+Every case reports per-call latency (median / p95 / min, microseconds) over several
+timed repeats. With --baseline, cases whose median is slower than the baseline by
+more than --threshold are flagged and the exit status is 1.
+"""
+import argparse, fnmatch, json, os, platform, sys, tempfile, time
+import numpy as np
+
+from src.utils.signal import welch_bandpower
+from src.processing.eeg_pipeline import EEGPipeline
+from src.processing.signal_quality import SignalQualityGate
+from src.processing.burst_detector import BetaBurstDetector, detect_bursts_batch
+from src.policy.bandpower_controller import BandpowerPIDController
+from src.policy.burst_threshold_policy import BurstThresholdPolicy
+from src.policy.ml_policy import MLPolicy
+from src.utils.clock import VirtualClock
+
+BANDS = {'beta': [13.0, 30.0], 'alpha': [8.0, 12.0]}
+CASES = {}
+
+def case(name):
+    def deco(fn):
+        CASES[name] = fn
+        return fn
+    return deco
+
+def measure(fn, repeats=7, min_time=0.05, calls_per_item=1):
+    """Per-call latency in microseconds; `fn` is called in batches sized to take ~min_time."""
+    n = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        dt = time.perf_counter() - t0
+        if dt >= min_time or n >= 1 << 20:
+            break
+        n *= 2 if dt <= 0 else max(2, min(10, int(min_time / dt) + 1))
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        samples.append((time.perf_counter() - t0) / (n * calls_per_item) * 1e6)
+    s = np.asarray(samples)
+    return {'median_us': float(np.median(s)), 'p95_us': float(np.percentile(s, 95)),
+            'min_us': float(s.min()), 'calls': n * repeats * calls_per_item}
+
+def spectral_matrix(quick):
+    channels = [8, 64] if quick else [8, 32, 64, 128, 256]
+    rates = [250, 1000] if quick else [250, 500, 1000, 2000]
+    windows = [1.0] if quick else [0.5, 1.0, 2.0]
+    return [(c, fs, w) for c in channels for fs in rates for w in windows]
+
+def bench_spectral(quick, results, pattern):
+    rng = np.random.default_rng(0)
+    for n_ch, fs, win in spectral_matrix(quick):
+        x = rng.normal(size=(n_ch, int(fs * win)))
+        name = f"features/ch{n_ch}/fs{fs}/win{win}"
+        if fnmatch.fnmatch(name, pattern):
+            pipe = EEGPipeline(fs=fs, bands=BANDS, chunk_sec=win)
+            results[name] = measure(lambda: pipe.features(x))
+        name = f"features_sdft/ch{n_ch}/fs{fs}/win{win}"
+        if fnmatch.fnmatch(name, pattern):
+            # one quarter-window hop per update
+            pipe = EEGPipeline(fs=fs, bands=BANDS, chunk_sec=win, hop_sec=win / 4, feature_backend='sdft')
+            hop = x[:, :int(fs * win / 4)]
+            results[name] = measure(lambda: pipe.features(hop))
+        name = f"quality/ch{n_ch}/fs{fs}/win{win}"
+        if fnmatch.fnmatch(name, pattern):
+            # gate on the PSD the band-power path already produced
+            pipe = EEGPipeline(fs=fs, bands=BANDS, chunk_sec=win)
+            pipe.bandpowers(x)
+            gate = SignalQualityGate(fs)
+            results[name] = measure(lambda: gate.assess(x, *pipe.last_spectrum))
+        name = f"welch_bandpower/fs{fs}/win{win}"
+        if n_ch == 8 and fnmatch.fnmatch(name, pattern):
+            results[name] = measure(lambda: welch_bandpower(x[0], fs, 13.0, 30.0))
+
+@case('burst_detector/update')
+def bench_burst():
+    det = BetaBurstDetector()
+    vals = np.random.default_rng(1).gamma(2.0, 1.0, 4096).tolist()
+    ts = (np.arange(4096) * 0.25).tolist()
+    def run():
+        for v, t in zip(vals, ts):
+            det.update(v, timestamp=t)
+    return measure(run, calls_per_item=4096)
+
+@case('burst_detector/batch_grid16')
+def bench_burst_batch():
+    vals = np.random.default_rng(1).gamma(2.0, 1.0, 4096)
+    ts = np.arange(4096) * 0.25
+    grid = np.linspace(1.0, 3.0, 16)
+    return measure(lambda: detect_bursts_batch(vals, ts, z_thresh=grid), calls_per_item=4096 * 16)
+
+@case('policy/pid')
+def bench_pid():
+    ctrl = BandpowerPIDController(kp=0.15, ki=0.01, kd=0.01)
+    return measure(lambda: ctrl.propose_delta(3.0, 5.0))
+
+@case('policy/burst_threshold')
+def bench_burst_policy():
+    pol = BurstThresholdPolicy(log_fn=lambda msg: None, clock=VirtualClock())
+    evt = {'active': True, 'just_started': False, 'just_ended': False}
+    return measure(lambda: pol.propose_delta(evt))
+
+@case('policy/ml_predict')
+def bench_ml():
+    rng = np.random.default_rng(2)
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'w.npz')
+        np.savez(path, W1=rng.normal(size=(3, 32)), b1=np.zeros(32), W2=rng.normal(size=(32, 1)), b2=np.zeros(1))
+        ml = MLPolicy(path)
+    feats = [3.0, 6.0, 0.5]
+    return measure(lambda: ml.predict_mA(feats))
+
+@case('policy/ml_predict_batch256')
+def bench_ml_batch():
+    rng = np.random.default_rng(2)
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'w.npz')
+        np.savez(path, W1=rng.normal(size=(3, 32)), b1=np.zeros(32), W2=rng.normal(size=(32, 1)), b2=np.zeros(1))
+        ml = MLPolicy(path)
+    X = rng.normal(size=(256, 3))
+    return measure(lambda: ml.predict_batch(X), calls_per_item=256)
+
+@case('features/graph_eval_ch64')
+def bench_feature_graph():
+    from src.processing.feature_graph import FeatureGraph
+    bands = ['delta', 'theta', 'alpha', 'beta', 'gamma']
+    nodes = {f"{b}_rel": {'op': 'relative', 'band': b} for b in bands}
+    nodes.update({f"{b}_rel_mean": {'op': 'mean', 'input': f"{b}_rel"} for b in bands})
+    nodes['beta_left'] = {'op': 'mean', 'input': 'beta', 'channels': list(range(32))}
+    outputs = ['beta_power_smooth', 'beta_alpha_ratio', 'beta_left'] + [f"{b}_rel_mean" for b in bands]
+    g = FeatureGraph(bands, 64, outputs, nodes=nodes)
+    bp = np.random.default_rng(3).uniform(1, 2, size=(64, len(bands)))
+    return measure(lambda: g.evaluate(bp))
+
+@case('loop/simulation_tick')
+def bench_loop():
+    import yaml
+    from src.app.closed_loop import ClosedLoopSession
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    cfg.update(mode='simulation', clock='virtual', seconds=10**9)
+    cfg['safety'].update(require_human_confirm=False, max_session_minutes=10**9)
+    session = ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None)
+    res = measure(session.step)
+    res['ticks_per_sec'] = 1e6 / res['median_us']
+    session.stop()
+    return res
+
+def _device(latency_sec):
+    from src.hardware.mock_device import MockDeviceServer
+    from src.hardware.socket_stimulator import SocketStimulator
+    d = tempfile.mkdtemp()
+    dev = MockDeviceServer(os.path.join(d, 'stim.sock'), latency_sec=latency_sec, log_fn=lambda msg: None)
+    stim = SocketStimulator(dev.socket_path, log_fn=lambda msg: None)
+    stim.connect()
+    stim.start()
+    return dev, stim
+
+def _close_device(dev, stim):
+    stim.disconnect()
+    dev.close()
+    os.rmdir(os.path.dirname(dev.socket_path))
+
+def bench_stim_ramp(latency_sec, batched):
+    """Sending one 3 s ramp (30 setpoints): one command per step vs one waveform command."""
+    dev, stim = _device(latency_sec)
+    t, mA = stim.compile_ramp(1.0, 3.0)
+    def per_step():
+        for v in mA:
+            stim.output(v)
+    try:
+        return measure((lambda: stim.send_waveform(t, mA)) if batched else per_step, repeats=5)
+    finally:
+        _close_device(dev, stim)
+
+def bench_stim_actuation(latency_sec):
+    """Command sent -> new level confirmed by a device readback."""
+    dev, stim = _device(latency_sec)
+    levels = iter(np.tile([0.5, 1.0], 1 << 20))
+    def actuate():
+        v = next(levels)
+        stim.output(v)
+        while stim.readback() != v:
+            pass
+    try:
+        return measure(actuate, repeats=5)
+    finally:
+        _close_device(dev, stim)
+
+for _lat in (0.0, 0.001):
+    _tag = f"lat{int(_lat * 1000)}ms"
+    case(f'stim/ramp30_per_step/{_tag}')(lambda lat=_lat: bench_stim_ramp(lat, batched=False))
+    case(f'stim/ramp30_waveform/{_tag}')(lambda lat=_lat: bench_stim_ramp(lat, batched=True))
+    case(f'stim/actuation/{_tag}')(lambda lat=_lat: bench_stim_actuation(lat))
+
+def compare(results, baseline, threshold):
+    flagged = []
+    for name, r in sorted(results.items()):
+        b = baseline.get('results', {}).get(name)
+        if b is None:
+            continue
+        ratio = r['median_us'] / max(b['median_us'], 1e-9)
+        r['baseline_median_us'] = b['median_us']
+        r['ratio'] = ratio
+        if ratio > 1.0 + threshold:
+            flagged.append((name, b['median_us'], r['median_us'], ratio))
+    return flagged
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--out', default='bench_results.json')
+    p.add_argument('--quick', action='store_true', help="small spectral matrix for a fast check")
+    p.add_argument('--filter', default='*', help="glob on case names, e.g. 'features/*'")
+    p.add_argument('--baseline', default=None, help="previous results JSON to compare against")
+    p.add_argument('--threshold', type=float, default=0.2, help="allowed slowdown vs baseline (0.2 = +20%%)")
+    args = p.parse_args()
+
+    results = {}
+    bench_spectral(args.quick, results, args.filter)
+    for name, fn in CASES.items():
+        if fnmatch.fnmatch(name, args.filter):
+            results[name] = fn()
+    for name, r in results.items():
+        print(f"{name:40s} {r['median_us']:12.2f} us  (p95 {r['p95_us']:.2f})")
+
+    out = {'meta': {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0],
+                    'numpy': np.__version__, 'platform': platform.platform(),
+                    'cpu_count': os.cpu_count()},
+           'results': results}
+    flagged = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            flagged = compare(results, json.load(f), args.threshold)
+        out['regressions'] = [n for n, *_ in flagged]
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(out, f, indent=1)
+    print(f"[BENCH] {len(results)} cases -> {args.out}")
+    for name, old, new, ratio in flagged:
+        print(f"[REGRESSION] {name}: {old:.2f} -> {new:.2f} us ({ratio:.2f}x)")
+    if flagged:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
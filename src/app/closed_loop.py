@@ -1,26 +1,466 @@
 
-import argparse, time, sys, os, json
+import argparse
+from contextlib import nullcontext
 import numpy as np
 
 from ..streaming.lsl_client import EEGSource
+from ..streaming.acquisition_process import ProcessAcquisition, AcquisitionError
+from ..processing.channel_pool import ChannelGroupPool
 from ..processing.eeg_pipeline import EEGPipeline
+from ..processing.preprocess import make_preprocessor
 from ..processing.burst_detector import BetaBurstDetector
+from ..processing.feature_graph import FeatureGraph
+from ..processing.signal_quality import make_quality_gate, describe
 from ..policy.bandpower_controller import BandpowerPIDController
 from ..policy.burst_threshold_policy import BurstThresholdPolicy
 from ..policy.ml_policy import MLPolicy
 from ..hardware.stimulator_api import MockStimulator
+from ..hardware.socket_stimulator import SocketStimulator
+from ..hardware.ramp_scheduler import RampScheduler
 from ..safety.safety_manager import SafetyManager
+from ..safety.confirmation import ConfirmationBroker
+from ..utils.clock import make_clock, VirtualClock
+from ..utils.signal import seconds_to_samples
+from ..utils.ringbuffer import RingBuffer
+from ..utils.logsink import RateLimitedLog
+from ..recording.session_recorder import SessionRecorder
+from .metrics import LoopInstrumentation, run_profiled
 
 def load_config(path):
     import yaml
     with open(path, 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
 
+def build_controller(cfg, log, clock):
+    """Returns (ctrl, ml); exactly one of them drives the loop."""
+    c = cfg['controller']
+    def pid():
+        return BandpowerPIDController(kp=c['kp'], ki=c['ki'], kd=c['kd'], max_step_mA=c['max_step_mA'])
+    if c['kind'] == 'bandpower_pid':
+        return pid(), None
+    if c['kind'] == 'burst_threshold':
+        return BurstThresholdPolicy(
+            step_up_mA=c.get('step_up_mA', 0.10),
+            step_down_mA=c.get('step_down_mA', 0.05),
+            cooldown_sec=c.get('cooldown_sec', 60),
+            quiet_sec=c.get('quiet_sec', 120),
+            log_fn=log, clock=clock
+        ), None
+    weights_path = c.get('weights_path', 'models/ml_policy_weights.npz')
+    try:
+        return None, MLPolicy(weights_path)
+    except Exception as e:
+        log(f"[WARN] MLPolicy unavailable: {e}. Falling back to PID.")
+        return pid(), None
+
+def raw_window_samples(pre, pipe):
+    """Raw (pre-decimation) samples behind one analysis window of `pipe`."""
+    return pre.decimate * seconds_to_samples(pipe.fs, pipe.window_sec)
+
+class ClosedLoopSession:
+    """One closed loop: EEG source -> features -> burst detector -> policy -> safety -> stimulator.
+    `step()` runs a single tick; `run()` loops until the session length or safety limits end it.
+    Per-session outcome metrics are kept in `self.metrics`.
+    `host`: a SessionHost that extracts this session's features in its batched pass; the
+    session then builds no preprocessor, pipeline or quality gate of its own (`process()` is
+    unavailable) and shares the host's gate.
+    """
+    def __init__(self, cfg, clock=None, log_fn=print, seed=42, recorder=None, instrumentation=None,
+                 ramp_thread=None, host=None):
+        self.cfg = cfg
+        self.recorder = recorder  # optional SessionRecorder; gets every chunk, feature and command
+        self.instr = instrumentation  # optional metrics.LoopInstrumentation
+        self.clock = clock if clock is not None else make_clock(cfg.get('clock', 'wall'))
+        self.log = log = log_fn
+        clock = self.clock
+
+        # EEG
+        eeg_cfg = cfg['eeg']
+        # Streaming mode: pull `hop_sec` of new samples per tick, features over `window_sec`
+        hop_sec = eeg_cfg.get('hop_sec')
+        src_kwargs = dict(mode=cfg['mode'], fs=eeg_cfg['fs'], n_channels=eeg_cfg['n_channels'],
+                          chunk_sec=hop_sec or eeg_cfg['chunk_sec'], log_fn=log, seed=seed,
+                          replay_path=(cfg.get('replay') or {}).get('path'))
+        # Notch / bandpass / decimation ahead of feature extraction (state kept across chunks)
+        self.pre = None
+        if host is None:
+            self.pre = make_preprocessor(eeg_cfg, eeg_cfg['n_channels'],
+                                         chunk_samples=seconds_to_samples(eeg_cfg['fs'], src_kwargs['chunk_sec']))
+        acq = cfg.get('acquisition', {}) or {}
+        self.feature_pool = None
+        if acq.get('process'):
+            # Acquisition in its own process, samples shared through a lock-free shm ring
+            self.src = ProcessAcquisition(capacity_sec=acq.get('capacity_sec', 30.0),
+                                          heartbeat_timeout_sec=acq.get('heartbeat_timeout_sec', 5.0),
+                                          **src_kwargs)
+            if host is not None:
+                pass  # the host extracts the features
+            elif acq.get('feature_workers') and self.pre is not None:
+                log("[WARN] acquisition.feature_workers reads raw samples; disabled while eeg preprocessing is on.")
+            elif acq.get('feature_workers'):
+                self.feature_pool = ChannelGroupPool(self.src.ring.spec, eeg_cfg['fs'], eeg_cfg['bands'],
+                                                     detrend=eeg_cfg['detrend'], n_workers=acq['feature_workers'],
+                                                     window_samples=seconds_to_samples(eeg_cfg['fs'], eeg_cfg.get('window_sec') or eeg_cfg['chunk_sec']))
+        else:
+            self.src = EEGSource(clock=clock, **src_kwargs)
+        self.pipe = None
+        if host is None:
+            self.pipe = EEGPipeline(fs=self.pre.fs_out if self.pre is not None else eeg_cfg['fs'],
+                                    bands=eeg_cfg['bands'], detrend=eeg_cfg['detrend'],
+                                    chunk_sec=eeg_cfg['chunk_sec'], window_sec=eeg_cfg.get('window_sec'),
+                                    hop_sec=hop_sec, feature_backend=eeg_cfg.get('feature_backend', 'welch'))
+
+        # Per-channel quality gate on the samples and PSD the features are computed from; with
+        # preprocessing on, on the raw window instead (a notch would hide the line noise)
+        self.quality = host.quality if host is not None else make_quality_gate(cfg.get('quality'), eeg_cfg['fs'])
+        self._raw = None
+        if self.quality is not None and self.pre is not None:
+            self._raw = RingBuffer(eeg_cfg['n_channels'], raw_window_samples(self.pre, self.pipe))
+        self._bad = ()
+
+        # Controller
+        self.ctrl, self.ml = build_controller(cfg, log, clock)
+
+        # Stimulator (mock by default; a device socket talks to src.hardware.mock_device)
+        stim_cfg = cfg['stimulator']
+        if stim_cfg.get('device_socket'):
+            self.stim = SocketStimulator(stim_cfg['device_socket'], timeout_sec=stim_cfg.get('device_timeout_sec', 1.0),
+                                         log_fn=log, clock=clock)
+        else:
+            self.stim = MockStimulator(log_fn=log, clock=clock)
+        # Ramps run in the background so EEG keeps flowing; on a virtual clock they
+        # advance with the loop via poll() instead of a thread
+        if ramp_thread is None:
+            ramp_thread = not isinstance(clock, VirtualClock)
+        self.ramp = RampScheduler(self.stim, clock=clock, threaded=ramp_thread)
+        if recorder is not None:
+            self.stim.add_output_listener(lambda t, mA: recorder.record('stim', t=t, mA=mA))
+
+        # Burst detector
+        bd_cfg = cfg.get('burst_detector', {'ema_alpha':0.05,'z_thresh':2.0,'hysteresis':0.5,'min_duration_sec':2.0})
+        self.burst = BetaBurstDetector(
+            ema_alpha=bd_cfg.get('ema_alpha', 0.05),
+            z_thresh=bd_cfg.get('z_thresh', 2.0),
+            hysteresis=bd_cfg.get('hysteresis', 0.5),
+            min_duration_sec=bd_cfg.get('min_duration_sec', 2.0),
+            clock=clock
+        )
+
+        # Feature graph: the single source of per-tick features. Evaluates only what the
+        # burst detector, an ML policy and the controller / log line read
+        fg_cfg = cfg.get('features') or {}
+        bands = list(eeg_cfg['bands'])
+        self.ml_inputs = list(fg_cfg.get('ml_inputs') or ['beta_power_smooth', 'alpha_power', 'beta_alpha_ratio'])
+        dup = sorted({n for n in self.ml_inputs if self.ml_inputs.count(n) > 1})
+        if dup:
+            raise ValueError(f"features.ml_inputs lists {dup} more than once.")
+        self.burst_input = fg_cfg.get('burst_input', 'beta_power_smooth')
+        reported = ['beta_power', 'beta_power_smooth'] + (['alpha_power', 'beta_alpha_ratio'] if 'alpha' in bands else [])
+        outputs = (self.ml_inputs if self.ml is not None else []) + [self.burst_input] + reported
+        self.graph = FeatureGraph(bands, eeg_cfg['n_channels'], outputs, nodes=fg_cfg.get('nodes'),
+                                  groups=fg_cfg.get('groups'), smoothing=cfg['biomarker']['smoothing'])
+        # scalar outputs become the tick's feature dict (logged, recorded, read by control)
+        self._feature_names = [n for n in self.graph.slots if self.graph.is_scalar(n)]
+        if not self.graph.is_scalar(self.burst_input):
+            raise ValueError(f"features.burst_input {self.burst_input!r} is not a scalar feature.")
+        self.last_bandpowers = None
+        if self.ml is not None:
+            n = self.graph.slots[self.ml_inputs[-1]].stop
+            if n != self.ml.n_features:
+                raise ValueError(f"features.ml_inputs give {n} values; the ML policy expects {self.ml.n_features}.")
+            self._ml_slots = slice(0, n)  # ml_inputs come first in the graph's output vector
+
+        # Safety
+        s = cfg['safety']
+        self.safety = SafetyManager(max_mA=s['max_mA'], min_mA=s['min_mA'],
+                                    ramp_rate_mA_per_min=s['ramp_rate_mA_per_min'],
+                                    min_seconds_between_changes=s['min_seconds_between_changes'],
+                                    max_session_minutes=s['max_session_minutes'],
+                                    require_human_confirm=s['require_human_confirm'],
+                                    emergency_stop_key=s['emergency_stop_key'],
+                                    log_fn=log, clock=clock)
+        # Operator confirmation runs beside the loop: proposals are posted, replies polled per tick
+        self.confirm = None
+        if s['require_human_confirm']:
+            self.confirm = ConfirmationBroker(socket_path=s.get('confirm_socket'),
+                                              terminal=s.get('confirm_terminal', True),
+                                              ttl_sec=s.get('confirm_timeout_sec', 10.0),
+                                              emergency_stop_key=s['emergency_stop_key'],
+                                              clock=clock, log_fn=log)
+        self.estopped = False
+
+        self.target_beta = cfg['biomarker']['target_beta_uV2']
+        self.target_tol = cfg['biomarker'].get('target_tolerance_uV2', 1.0)
+        self.metrics = {'ticks': 0, 'seconds': 0.0, 'time_in_target_sec': 0.0,
+                        'changes': 0, 'bursts': 0, 'charge_mC': 0.0, 'low_quality_ticks': 0}
+        self._started = False
+        self._last_tick_ts = None
+        self.end_ts = None
+
+    def start(self):
+        self.stim.connect()
+        self.stim.set_polarity(self.cfg['stimulator']['polarity'])
+        self.stim.current_mA = self.cfg['stimulator']['initial_mA']
+        self.stim.start()
+        self.end_ts = self.clock.now() + max(1, int(self.cfg['seconds']))
+        self._last_tick_ts = self.clock.now()
+        self._started = True
+        self.log(f"[START] mode={self.cfg['mode']} clock={self.cfg.get('clock', 'wall')} "
+                 f"session={self.cfg['seconds']}s target_beta={self.target_beta}")
+
+    def running(self):
+        """Starts the session on first use; False once session length or safety limits are hit."""
+        if not self._started:
+            self.start()
+        if self.src.exhausted or self.estopped:
+            return False
+        if self.ramp.fault is not None:
+            if 'stimulator_error' not in self.metrics:
+                self.log(f"[SAFETY] Stimulator fault: {self.ramp.fault} Output stopped; ending session.")
+                self.metrics['stimulator_error'] = self.ramp.fault
+            return False
+        return self.clock.now() < self.end_ts and self.safety.within_session_limits()
+
+    def _timed(self, stage):
+        return self.instr.timer(stage) if self.instr is not None else nullcontext()
+
+    def acquire(self):
+        """Acquisition stage: next EEG chunk [channels, samples], or None once the source
+        ran out while waiting (a process replay can end between running() and the read)."""
+        self.ramp.poll()
+        self.src.set_stimulation(self.stim.current_mA if self.stim.is_on else 0.0)
+        with self._timed('acquisition_wait'):
+            try:
+                chunk = self.src.next_chunk()
+            except EOFError:
+                if not self.src.exhausted:
+                    raise
+                return None  # end of stream; running() is False from here on
+        if self.instr is not None:
+            self.instr.arrival()
+        if self.recorder is not None:
+            self.recorder.record_eeg(self.clock.now(), chunk)
+        return chunk
+
+    def process(self, chunk):
+        """Processing stage: features + quality gate + burst detector update. Returns (feats, b_evt)."""
+        with self._timed('features'):
+            if self.feature_pool is not None:
+                end = self.src.read_pos
+                bp = self.feature_pool.bandpowers(end)
+                n = min(self.feature_pool.window, end)
+                window, spectrum = self.src.ring.view(end - n, n), (None, None)  # spectra stay in the workers
+            else:
+                if self._raw is not None:
+                    self._raw.write(chunk)
+                if self.pre is not None:
+                    chunk = self.pre.process(chunk)
+                bp = self.pipe.bandpowers(chunk)
+                window, spectrum = self.pipe.last_window, self.pipe.last_spectrum
+        good = None
+        if self.quality is not None:
+            with self._timed('quality'):
+                if self._raw is not None:
+                    good = self.quality.assess_raw(self._raw.latest(len(self._raw)))
+                else:
+                    good = self.quality.assess(window, *spectrum)
+        return self.observe(bp, good, self.quality.flags if self.quality is not None else None)
+
+    def observe(self, bp, good=None, flags=None):
+        """Features, burst detector update and logging/recording for one tick's per-channel
+        band powers bp [n_channels, n_bands] (already extracted, e.g. batched by a host).
+        good / flags: channel mask and failure bits from the quality gate (None = all usable)."""
+        log, graph = self.log, self.graph
+        self.last_bandpowers = bp
+        with self._timed('feature_graph'):
+            graph.evaluate(bp, good)
+            feats = {name: graph.value(name) for name in self._feature_names}
+        if self.quality is not None:
+            n_ch = len(bp)
+            bad = () if good is None else tuple(np.flatnonzero(~good))
+            if bad != self._bad:
+                log("[QUALITY] bad channels: " + (", ".join(f"{c}({describe(flags[c])})" if flags is not None else str(c)
+                                                            for c in bad) or "none"))
+                self._bad = bad
+            feats['good_channels'] = n_good = n_ch - len(bad)
+            if not self.safety.report_signal_quality(n_good, n_ch, self.quality.min_good(n_ch)):
+                self.metrics['low_quality_ticks'] += 1
+        beta = feats['beta_power_smooth']
+        alpha = feats.get('alpha_power', 0.0)
+        ratio = feats.get('beta_alpha_ratio', beta / max(1e-6, alpha))
+        log(f"[EEG] beta={feats['beta_power']:.3f} beta_s={beta:.3f} alpha={alpha:.3f} ratio={ratio:.3f}")
+
+        # Update burst detector
+        with self._timed('burst_update'):
+            b_evt = self.burst.update(graph.value(self.burst_input))
+        if b_evt['just_started']:
+            self.metrics['bursts'] += 1
+            log(f"[BURST] started (z={b_evt['z_score']:.2f}, baseline={b_evt['baseline']:.3f})")
+        elif b_evt['just_ended']:
+            log(f"[BURST] ended (z={b_evt['z_score']:.2f})")
+        if self.recorder is not None:
+            t = self.clock.now()
+            self.recorder.record('features', t=t, **feats)
+            self.recorder.record('bursts', t=t, active=b_evt['active'], just_started=b_evt['just_started'],
+                                 just_ended=b_evt['just_ended'], z_score=float(b_evt['z_score']),
+                                 baseline=float(b_evt['baseline']))
+        if self.ml is not None:
+            # copied: in the staged runtime the next tick's evaluate() may run before control
+            feats['ml_inputs'] = graph.values[self._ml_slots].copy()
+        return feats, b_evt
+
+    def ml_features(self, feats):
+        """MLPolicy input vector for one tick (features.ml_inputs, captured by observe())."""
+        return feats['ml_inputs']
+
+    def wants_proposal(self):
+        """True when the policy should propose: change window open, nothing awaiting confirmation."""
+        return (not self.estopped and self.safety.can_change_now()
+                and (self.confirm is None or self.confirm.pending is None))
+
+    def control(self, feats, b_evt, proposed_mA=None):
+        """Control stage: policy proposal -> safety clamp -> confirmation -> ramp.
+        `proposed_mA` lets a caller pass an ML proposal it already scored (batched).
+        With confirmation on, the proposal is posted and applied on a later tick once
+        approved; replies and emergency stops are picked up here every tick."""
+        log, stim, safety, broker = self.log, self.stim, self.safety, self.confirm
+        beta = feats['beta_power_smooth']
+        in_target = abs(beta - self.target_beta) <= self.target_tol
+
+        approved = None
+        if broker is not None:
+            with self._timed('confirm_wait'):
+                approved, denied = broker.poll(stim.current_mA)
+            if broker.estopped and not self.estopped:
+                self.emergency_stop()
+            elif denied is not None:
+                log("[CTRL] Change denied; waiting for the next change window.")
+                safety.mark_changed()
+
+        if self.estopped:
+            pass
+        elif approved is not None and not safety.signal_ok:
+            log(f"[CTRL] Approved change #{approved.id} dropped: EEG signal quality too low.")
+        elif approved is not None:
+            # Re-check against current limits; poll() expires a stale or moved proposal before matching replies
+            with self._timed('safety_clamp'):
+                target_mA = safety.clamp_target(approved.target_mA, stim.current_mA)
+            self._record_control(approved.target_mA, target_mA, True)
+            self._apply(target_mA)
+        elif self.wants_proposal():
+            with self._timed('policy'):
+                if isinstance(self.ctrl, BurstThresholdPolicy):
+                    delta = self.ctrl.propose_delta(b_evt)
+                    proposed_abs = stim.current_mA + delta
+                elif self.ml is not None:
+                    proposed_abs = (proposed_mA if proposed_mA is not None
+                                    else self.ml.predict_mA(self.ml_features(feats)))
+                else:
+                    delta = self.ctrl.propose_delta(beta, self.target_beta)
+                    proposed_abs = stim.current_mA + delta
+            with self._timed('safety_clamp'):
+                target_mA = safety.clamp_target(proposed_abs, stim.current_mA)
+
+            log(f"[CTRL] proposed={proposed_abs:.3f} mA -> clamped target={target_mA:.3f} mA (now={stim.current_mA:.3f})")
+            self._record_control(proposed_abs, target_mA, broker is None)
+            if broker is None:
+                self._apply(target_mA)
+            else:
+                with self._timed('confirm_wait'):
+                    broker.propose(target_mA, stim.current_mA)
+
+        now = self.clock.now()
+        dt = now - self._last_tick_ts
+        self._last_tick_ts = now
+        self.metrics['ticks'] += 1
+        self.metrics['seconds'] += dt
+        if in_target:
+            self.metrics['time_in_target_sec'] += dt
+        if self.instr is not None:
+            self.instr.end_tick()
+
+    def _record_control(self, proposed_mA, target_mA, confirmed):
+        if self.recorder is not None:
+            self.recorder.record('control', t=self.clock.now(), proposed_mA=float(proposed_mA),
+                                 target_mA=float(target_mA), current_mA=float(self.stim.current_mA),
+                                 confirmed=bool(confirmed))
+
+    def _apply(self, target_mA):
+        # Ramp time derived from allowed ramp rate and delta
+        delta = abs(target_mA - self.stim.current_mA)
+        # Convert ramp_rate mA/min into a seconds ramp; ensure >= 2s
+        seconds = max(2.0, 60.0 * (delta / max(1e-6, self.safety.ramp_rate)))
+        with self._timed('stim_command'):
+            if not self.ramp.ramp_to(target_mA, seconds=seconds):
+                return  # device fault: output stopped, running() ends the session
+        self.safety.mark_changed()
+        self.metrics['changes'] += 1
+
+    def emergency_stop(self):
+        """Drop the output to zero now and end the session (running() turns False)."""
+        self.log("[SAFETY] Emergency stop: stimulation off.")
+        self.estopped = True
+        self.metrics['emergency_stop'] = True
+        self.ramp.safe_stop()
+
+    def step(self):
+        """Run one tick serially. Returns False once the session should end."""
+        if not self.running():
+            return False
+        chunk = self.acquire()
+        if chunk is None:
+            return False
+        feats, b_evt = self.process(chunk)
+        self.control(feats, b_evt)
+        return True
+
+    def stop(self):
+        if self.confirm is not None:
+            self.confirm.close()
+        self.ramp.safe_stop()
+        self.ramp.close()
+        self.stim.disconnect()
+        if self.feature_pool is not None:
+            self.feature_pool.close()
+        if hasattr(self.src, 'close'):
+            self.src.close()
+        self.metrics['charge_mC'] = self.stim.delivered_mC
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.instr is not None:
+            self.instr.export()
+        self.log(f"[END] Applied changes: {self.metrics['changes']}")
+
+    def run(self):
+        try:
+            while self.step():
+                pass
+        except KeyboardInterrupt:
+            self.log("[STOP] Interrupted by user.")
+        except AcquisitionError as e:
+            self.log(f"[SAFETY] {e} Stopping stimulation.")
+            self.metrics['acquisition_error'] = str(e)
+        finally:
+            self.stop()
+        return self.metrics
+
 def main():
     p = argparse.ArgumentParser()
     p.add_argument('--config', default='configs/config.yaml')
-    p.add_argument('--mode', choices=['simulation','lsl'], default=None)
+    p.add_argument('--mode', choices=['simulation','lsl','replay'], default=None)
     p.add_argument('--seconds', type=int, default=None)
+    p.add_argument('--clock', choices=['wall','virtual'], default=None,
+                   help="'virtual' runs a simulated session as fast as the CPU allows")
+    p.add_argument('--staged', action='store_true', default=None,
+                   help="run acquisition/processing/control on separate threads (wall clock only)")
+    p.add_argument('--replay', default=None, metavar='PATH',
+                   help="recording to replay (.npy / .npz / recorder directory); implies --mode replay")
+    p.add_argument('--replay-speed', type=float, default=None,
+                   help="replay pace as a multiple of real time; 0 = as fast as possible (default)")
+    p.add_argument('--profile', nargs='?', const='profile', default=None, metavar='DIR',
+                   help="run the session under cProfile + tracemalloc and write reports to DIR")
+    p.add_argument('--record', default=None, metavar='DIR',
+                   help="write a full-fidelity session recording to DIR")
     args = p.parse_args()
 
     cfg = load_config(args.config)
@@ -28,126 +468,81 @@ def main():
         cfg['mode'] = args.mode
     if args.seconds is not None:
         cfg['seconds'] = args.seconds
+    if args.clock is not None:
+        cfg['clock'] = args.clock
+    rp = cfg.setdefault('replay', {}) or {}
+    cfg['replay'] = rp
+    if args.replay is not None:
+        rp['path'] = args.replay
+        cfg['mode'] = 'replay'
+    if args.replay_speed is not None:
+        rp['speed'] = args.replay_speed
+    speed = 1.0
+    if cfg['mode'] == 'replay':
+        if not rp.get('path'):
+            p.error('Replay mode needs --replay PATH (or replay.path).')
+        # Max speed runs on the virtual clock (bit-reproducible); otherwise scaled real time
+        speed = float(rp.get('speed') or 0)
+        cfg['clock'] = 'virtual' if speed == 0 else 'wall'
+    if cfg['mode'] == 'lsl' and cfg.get('clock', 'wall') != 'wall':
+        p.error('LSL mode requires the wall clock.')
+    if (cfg.get('acquisition', {}) or {}).get('process') and cfg.get('clock', 'wall') != 'wall':
+        p.error('Process acquisition requires the wall clock.')
+    if cfg['stimulator'].get('device_socket') and cfg.get('clock', 'wall') != 'wall':
+        p.error('A stimulator device requires the wall clock.')
+    rt = cfg.get('runtime', {}) or {}
+    if args.staged:
+        rt['staged'] = True
+    if rt.get('staged') and cfg.get('clock', 'wall') != 'wall':
+        p.error('Staged runtime requires the wall clock.')
 
-    # Logging
-    def log(msg): print(msg)
-
-    # EEG
-    eeg_cfg = cfg['eeg']
-    src = EEGSource(mode=cfg['mode'], fs=eeg_cfg['fs'], n_channels=eeg_cfg['n_channels'],
-                    chunk_sec=eeg_cfg['chunk_sec'], log_fn=log)
-    pipe = EEGPipeline(fs=eeg_cfg['fs'], bands=eeg_cfg['bands'], detrend=eeg_cfg['detrend'],
-                       chunk_sec=eeg_cfg['chunk_sec'], smoothing=cfg['biomarker']['smoothing'])
-
-    # Controller
-    if cfg['controller']['kind'] == 'bandpower_pid':
-        ctrl = BandpowerPIDController(kp=cfg['controller']['kp'],
-                                      ki=cfg['controller']['ki'],
-                                      kd=cfg['controller']['kd'],
-                                      max_step_mA=cfg['controller']['max_step_mA'])
-        ml = None
-    elif cfg['controller']['kind'] == 'burst_threshold':
-        ctrl = BurstThresholdPolicy(
-            step_up_mA=cfg['controller'].get('step_up_mA', 0.10),
-            step_down_mA=cfg['controller'].get('step_down_mA', 0.05),
-            cooldown_sec=cfg['controller'].get('cooldown_sec', 60),
-            quiet_sec=cfg['controller'].get('quiet_sec', 120),
-            log_fn=log
-        )
-        ml = None
+    # Logging: human-readable console output, rate-limited per message tag on session time
+    clock = make_clock(cfg.get('clock', 'wall'), speed=speed or 1.0)
+    log_cfg = cfg.get('logging', {}) or {}
+    log = RateLimitedLog(print, min_interval_sec=log_cfg.get('rate_limit_sec', 1.0), clock=clock)
+
+    rec_cfg = cfg.get('recording', {}) or {}
+    rec_dir = args.record or rec_cfg.get('dir')
+    recorder = None
+    if rec_dir:
+        recorder = SessionRecorder(rec_dir, segment_rows=rec_cfg.get('segment_rows', 4096),
+                                   eeg_segment_samples=rec_cfg.get('eeg_segment_samples', 30000),
+                                   eeg_dtype=rec_cfg.get('eeg_dtype'), meta={'config': cfg}, log_fn=log)
+        log(f"[REC] Recording to {rec_dir}")
+
+    m_cfg = cfg.get('metrics', {}) or {}
+    instr = None
+    if m_cfg.get('enabled', True):
+        eeg_cfg = cfg['eeg']
+        period = eeg_cfg.get('hop_sec') or eeg_cfg['chunk_sec']
+        ms = lambda v: None if v is None else v / 1000.0
+        instr = LoopInstrumentation(period, tick_deadline_sec=ms(m_cfg.get('tick_deadline_ms')),
+                                    stage_deadlines_sec={k: ms(v) for k, v in (m_cfg.get('stage_deadlines_ms') or {}).items()},
+                                    json_path=m_cfg.get('json_path'), prom_path=m_cfg.get('prom_path'),
+                                    export_every_sec=m_cfg.get('export_every_sec', 10.0))
+
+    session = ClosedLoopSession(cfg, clock=clock, log_fn=log,
+                                recorder=recorder, instrumentation=instr)
+    def run():
+        if rt.get('staged'):
+            from .stages import StagedRunner
+            metrics = StagedRunner(session, queue_size=rt.get('queue_size', 4),
+                                   overflow=rt.get('overflow', 'drop_oldest'),
+                                   deadlines_ms=rt.get('deadlines_ms'),
+                                   max_latency_ms=rt.get('max_latency_ms')).run()
+            log("[STAGES] " + " ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}"
+                                        for k, v in metrics.items() if k.startswith(('deadline', 'dropped', 'max_', 'latency'))))
+        else:
+            session.run()
+        if instr is not None:
+            tb = instr.tick_busy.summary()
+            log(f"[METRICS] ticks={instr.ticks} tick_busy p50={1e3*tb['p50']:.2f}ms p99={1e3*tb['p99']:.2f}ms "
+                f"max={1e3*tb['max']:.2f}ms deadline_misses={sum(instr.deadline_misses.values()) + instr.tick_deadline_misses}")
+
+    if args.profile:
+        run_profiled(run, args.profile, log_fn=log)
     else:
-        weights_path = cfg['controller'].get('weights_path', 'models/ml_policy_weights.npz')
-        try:
-            ml = MLPolicy(weights_path)
-        except Exception as e:
-            log(f"[WARN] MLPolicy unavailable: {e}. Falling back to PID.")
-            ctrl = BandpowerPIDController(kp=cfg['controller']['kp'],
-                                          ki=cfg['controller']['ki'],
-                                          kd=cfg['controller']['kd'],
-                                          max_step_mA=cfg['controller']['max_step_mA'])
-            ml = None
-
-    # Stimulator (mock by default)
-    stim = MockStimulator(log_fn=log)
-    stim.connect()
-    stim.set_polarity(cfg['stimulator']['polarity'])
-    stim.start()
-    stim.current_mA = cfg['stimulator']['initial_mA']
-
-    # Burst detector
-    bd_cfg = cfg.get('burst_detector', {'ema_alpha':0.05,'z_thresh':2.0,'hysteresis':0.5,'min_duration_sec':2.0})
-    burst = BetaBurstDetector(
-        ema_alpha=bd_cfg.get('ema_alpha', 0.05),
-        z_thresh=bd_cfg.get('z_thresh', 2.0),
-        hysteresis=bd_cfg.get('hysteresis', 0.5),
-        min_duration_sec=bd_cfg.get('min_duration_sec', 2.0)
-    )
-
-    # Safety
-    s = cfg['safety']
-    safety = SafetyManager(max_mA=s['max_mA'], min_mA=s['min_mA'],
-                           ramp_rate_mA_per_min=s['ramp_rate_mA_per_min'],
-                           min_seconds_between_changes=s['min_seconds_between_changes'],
-                           max_session_minutes=s['max_session_minutes'],
-                           require_human_confirm=s['require_human_confirm'],
-                           emergency_stop_key=s['emergency_stop_key'],
-                           log_fn=log)
-
-    # Loop
-    target_beta = cfg['biomarker']['target_beta_uV2']
-    end_ts = time.time() + max(1, int(cfg['seconds']))
-    changes = 0
-
-    log(f"[START] mode={cfg['mode']} session={cfg['seconds']}s target_beta={target_beta}")
-    try:
-        while time.time() < end_ts:
-            if not safety.within_session_limits():
-                break
-            chunk = src.next_chunk()  # [channels, samples]
-            feats = pipe.features(chunk)
-            beta = feats['beta_power_smooth']
-            alpha = feats.get('alpha_power', 0.0)
-            ratio = beta / max(1e-6, alpha)
-            log(f"[EEG] beta={feats['beta_power']:.3f} beta_s={beta:.3f} alpha={alpha:.3f} ratio={ratio:.3f}")
-
-            # Update burst detector
-            b_evt = burst.update(beta)
-            if b_evt['just_started']:
-                log(f"[BURST] started (z={b_evt['z_score']:.2f}, baseline={b_evt['baseline']:.3f})")
-            elif b_evt['just_ended']:
-                log(f"[BURST] ended (z={b_evt['z_score']:.2f})")
-
-            if safety.can_change_now():
-                if isinstance(ctrl, BurstThresholdPolicy):
-                    delta = ctrl.propose_delta(b_evt)
-                    proposed_abs = stim.current_mA + delta
-                    target_mA = safety.clamp_target(proposed_abs, stim.current_mA)
-                elif ml is not None:
-                    features_vec = [beta, alpha, ratio]
-                    proposed_abs = ml.predict_mA(features_vec)
-                    target_mA = safety.clamp_target(proposed_abs, stim.current_mA)
-                else:
-                    delta = ctrl.propose_delta(beta, target_beta)
-                    proposed_abs = stim.current_mA + delta
-                    target_mA = safety.clamp_target(proposed_abs, stim.current_mA)
-
-                log(f"[CTRL] proposed={proposed_abs:.3f} mA -> clamped target={target_mA:.3f} mA (now={stim.current_mA:.3f})")
-                if safety.maybe_confirm(target_mA):
-                    # Ramp time derived from allowed ramp rate and delta
-                    delta = abs(target_mA - stim.current_mA)
-                    # Convert ramp_rate mA/min into a seconds ramp; ensure >= 2s
-                    seconds = max(2.0, 60.0 * (delta / max(1e-6, safety.ramp_rate)))
-                    stim.ramp_to(target_mA, seconds=seconds)
-                    safety.mark_changed()
-                    changes += 1
-                else:
-                    log("[CTRL] Change not confirmed or confirmation timed out.")
-    except KeyboardInterrupt:
-        log("[STOP] Interrupted by user.")
-    finally:
-        stim.stop()
-        stim.disconnect()
-        log(f"[END] Applied changes: {changes}")
+        run()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,266 @@
+"""Bulk offline feature extraction over a library of recordings.
+
+    python -m src.app.extract recordings/ --out features/
+    python -m src.app.extract recordings/ --out features/ --hop-sec 0.25 --workers 8
+
+Every recording under the input directory (.npy channels-first, .npz, or SessionRecorder
+directory) is streamed through memory-mapped reads a block of windows at a time: the
+session's preprocessing, per-channel Welch band powers on fixed windows, channel means
+over the channels the session's quality gate passes (judged on the raw samples, as in a
+session), the smoothed beta marker and burst events on the session's
+`features.burst_input`, as a replayed session computes them once its first
+window has filled (overlapping windows equal the session's sliding Welch, which uses the
+same segment plan). Each file becomes one columnar .npz under --out (same relative
+path); manifest.json records content hashes, so re-runs only extract new or changed
+inputs (and everything after a change of feature settings).
+"""
+import argparse, hashlib, json, os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .closed_loop import load_config
+from ..processing.burst_detector import detect_bursts_batch, ewma
+from ..processing.feature_graph import FeatureGraph
+from ..processing.preprocess import make_preprocessor
+from ..processing.signal_quality import make_quality_gate
+from ..processing.spectral import SpectralEngine, sliding_welch_grid
+from ..recording.session_recorder import INDEX
+from ..streaming.replay import ReplayReader
+
+MANIFEST = 'manifest.json'
+
+def feature_params(cfg, window_sec=None, hop_sec=None):
+    """Everything that changes the extracted features, from a session config."""
+    eeg = cfg['eeg']
+    window = window_sec or eeg.get('window_sec') or eeg['chunk_sec']
+    return {'eeg': {k: eeg[k] for k in ('fs', 'bands', 'detrend', 'notch_hz', 'notch_q', 'bandpass',
+                                        'filter_order', 'decimate') if k in eeg},
+            'window_sec': float(window),
+            'hop_sec': float(hop_sec or eeg.get('hop_sec') or window),
+            'smoothing': cfg['biomarker']['smoothing'],
+            'features': {k: v for k, v in (cfg.get('features') or {}).items() if k in ('burst_input', 'nodes', 'groups')},
+            'burst_detector': dict(cfg.get('burst_detector') or {}),
+            'quality': dict(cfg.get('quality') or {})}
+
+def params_hash(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def find_recordings(root):
+    """Relative paths of recordings under root (recorder directories are not descended into)."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        if INDEX in filenames:
+            found.append(os.path.relpath(dirpath, root))
+            dirnames[:] = []
+            continue
+        dirnames.sort()
+        found += [os.path.relpath(os.path.join(dirpath, f), root) for f in sorted(filenames)
+                  if f.endswith(('.npy', '.npz')) and not f.endswith('.features.npz')]
+    return found
+
+def _files(path):
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(os.path.join(d, f) for d, _, fs in os.walk(path) for f in fs)
+
+def stat_signature(path):
+    """Cheap change check (sizes + mtimes); a mismatch falls back to the content hash."""
+    return ';'.join(f"{os.path.relpath(f, path)}:{os.stat(f).st_size}:{os.stat(f).st_mtime_ns}"
+                    for f in _files(path))
+
+def content_hash(path, block=1 << 20):
+    h = hashlib.sha256()
+    for f in _files(path):
+        h.update(os.path.relpath(f, path).encode())
+        with open(f, 'rb') as fh:
+            while True:
+                buf = fh.read(block)
+                if not buf:
+                    break
+                h.update(buf)
+    return h.hexdigest()
+
+def extract_features(reader, params, block_windows=64):
+    """Feature columns for one ReplayReader. Reads `block_windows` hops at a time."""
+    eeg = dict(params['eeg'], fs=reader.fs or params['eeg']['fs'])
+    bands = eeg['bands']
+    pre = make_preprocessor(eeg, reader.n_channels)
+    fs = pre.fs_out if pre is not None else eeg['fs']
+    q = pre.decimate if pre is not None else 1
+    # the segment plan a session's SlidingWelch uses for this hop (the default plan when hop == window)
+    win, hop, nperseg, step, _ = sliding_welch_grid(fs, params['window_sec'], params['hop_sec'])
+    engine = SpectralEngine(fs, bands, detrend=eeg['detrend'], nperseg=nperseg, noverlap=nperseg - step)
+    gate = make_quality_gate(params.get('quality'), eeg['fs'])
+    # with preprocessing on, the gate sees the raw samples behind each window, as in a session
+    raw_gate = gate is not None and pre is not None
+    # the burst detector tracks features.burst_input, as in a session; other graph nodes
+    # than the classic marker are evaluated per window from the band powers
+    fp = params.get('features') or {}
+    burst_input = fp.get('burst_input') or 'beta_power_smooth'
+    graph = None
+    if burst_input != 'beta_power_smooth':
+        graph = FeatureGraph(bands, reader.n_channels, [burst_input], nodes=fp.get('nodes'),
+                             groups=fp.get('groups'), smoothing=params['smoothing'])
+        if not graph.is_scalar(burst_input):
+            raise ValueError(f"features.burst_input {burst_input!r} is not a scalar feature.")
+
+    carry = np.zeros((reader.n_channels, 0))
+    carry_start = 0                # output-sample index of carry[:, 0]
+    raw_carry = carry              # raw samples from input index carry_start * q on
+    next_end = -(-win // hop) * hop  # first window end: first full window on the hop grid
+    ends, bps, goods = [], [], []
+    while reader.remaining:
+        raw = np.asarray(reader.read(min(block_windows * hop * q, reader.remaining)), dtype=float)
+        x = pre.process(raw) if pre is not None else raw
+        buf = np.concatenate([carry, x], axis=1)
+        n_w = max(0, (carry_start + buf.shape[1] - next_end) // hop + 1)
+        if raw_gate:
+            raw_buf = np.concatenate([raw_carry, raw], axis=1)
+            # a window's raw samples end q * (its end); a short last read may not have them all
+            n_w = min(n_w, max(0, (q * carry_start + raw_buf.shape[1] - q * next_end) // (q * hop) + 1))
+        if n_w:
+            s0 = next_end - win - carry_start
+            windows = sliding_window_view(buf, win, axis=-1)[:, s0:s0 + (n_w - 1) * hop + 1:hop]
+            windows = windows.transpose(1, 0, 2)                      # [n_w, C, win]
+            bps.append(engine.bandpowers(windows))                      # [n_w, C, n_bands]
+            if raw_gate:
+                raw_windows = sliding_window_view(raw_buf, q * win, axis=-1)[:, q * s0:q * (s0 + (n_w - 1) * hop) + 1:q * hop]
+                goods.append(gate.assess_raw(raw_windows.transpose(1, 0, 2)))
+            elif gate is not None:
+                # the session's gate, on the same windows and the PSD just computed
+                goods.append(gate.assess(windows, engine.last_freqs, engine.last_psd))
+            ends.append(next_end + hop * np.arange(n_w))
+            next_end += n_w * hop
+        keep = min(buf.shape[1], max(0, next_end - win - carry_start))
+        carry, carry_start = buf[:, keep:], carry_start + keep
+        if raw_gate:
+            raw_carry = raw_buf[:, q * keep:]
+
+    n_bands = len(bands)
+    bp = np.concatenate(bps) if bps else np.zeros((0, reader.n_channels, n_bands))
+    t = np.concatenate(ends) / fs if ends else np.zeros(0)
+    good = np.concatenate(goods) if goods else np.ones(bp.shape[:2], dtype=bool)
+    cols = {'t': t}
+    if gate is not None:
+        cols['good_ch'] = good
+        cols['good_channels'] = good.sum(axis=1)
+    # channel means skip bad channels, unless that would leave none (as FeatureGraph does)
+    use = good | ~good.any(axis=1, keepdims=True)
+    for j, name in enumerate(bands):
+        cols[f"{name}_power"] = (bp[:, :, j] * use).sum(axis=1) / use.sum(axis=1)
+        cols[f"{name}_power_ch"] = bp[:, :, j]
+    beta = cols.get('beta_power', np.zeros(len(t)))
+    smooth = ewma(beta, params['smoothing']) if len(t) else beta
+    cols['beta_power_smooth'] = smooth
+    cols['beta_alpha_ratio'] = smooth / np.maximum(1e-6, cols.get('alpha_power', np.zeros(len(t))))
+    marker = smooth
+    if graph is not None:
+        marker = cols[burst_input] = np.array([graph.evaluate(row, g)[0] for row, g in zip(bp, good)])
+    bd = params['burst_detector']
+    ev = detect_bursts_batch(marker, t, **{k: bd[k] for k in ('ema_alpha', 'z_thresh', 'hysteresis',
+                                                              'min_duration_sec') if k in bd})
+    cols['burst_z'] = ev['z_score'][0]
+    cols['burst_baseline'] = ev['baseline'][0]
+    cols['burst_active'] = ev['active'][0]
+    cols['burst_onset_t'] = t[ev['onsets'][0]]
+    cols['burst_offset_t'] = t[ev['offsets'][0]]
+    cols['fs'] = np.float64(fs)
+    return cols
+
+def extract_file(path, out_path, params, known_hash=None):
+    """Worker: hash one recording and, unless it matches `known_hash`, write its feature table."""
+    h = content_hash(path)
+    if h == known_hash and os.path.exists(out_path):
+        return {'content_hash': h, 'skipped': True}
+    reader = ReplayReader(path)
+    cols = extract_features(reader, params)
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    tmp = out_path + '.tmp.npz'
+    np.savez(tmp, **cols)
+    os.replace(tmp, out_path)
+    return {'content_hash': h, 'skipped': False, 'n_windows': int(len(cols['t'])),
+            'n_bursts': int(len(cols['burst_onset_t'])), 'n_channels': reader.n_channels,
+            'seconds': float(reader.total / (reader.fs or params['eeg']['fs']))}
+
+def load_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {'files': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def extract_library(in_dir, out_dir, params, workers=None, force=False, log_fn=print):
+    """Extract every new or changed recording under in_dir; returns the manifest.
+    A recording that fails gets an `error` in its manifest entry and is retried next run."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    ph = params_hash(params)
+    manifest['params'] = params
+    files = manifest['files']
+    jobs = {}
+    recordings = find_recordings(in_dir)
+    for rel in recordings:
+        path = os.path.join(in_dir, rel)
+        out_rel = rel.rstrip(os.sep) + '.features.npz'
+        entry = files.get(rel)
+        known = None
+        if not force and entry and entry.get('params_hash') == ph and os.path.exists(os.path.join(out_dir, out_rel)):
+            if entry.get('stat') == stat_signature(path):
+                continue
+            known = entry['content_hash']
+        jobs[rel] = (path, out_rel, known)
+    log_fn(f"[EXTRACT] {len(recordings)} recordings, extracting or re-checking {len(jobs)}")
+    if not jobs:
+        save_manifest(out_dir, manifest)
+        return manifest
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futs = {pool.submit(extract_file, path, os.path.join(out_dir, out_rel), params, known): rel
+                for rel, (path, out_rel, known) in jobs.items()}
+        for i, fut in enumerate(as_completed(futs), 1):
+            rel = futs[fut]
+            path, out_rel, _ = jobs[rel]
+            try:
+                row = fut.result()
+            except Exception as e:
+                # one unreadable recording must not abort the library; retried next run
+                entry = files.setdefault(rel, {})
+                entry.pop('params_hash', None)
+                entry['error'] = f"{type(e).__name__}: {e}"
+                save_manifest(out_dir, manifest)
+                log_fn(f"[EXTRACT] {i}/{len(jobs)} {rel}: FAILED ({entry['error']})")
+                continue
+            entry = files.get(rel, {}) if row['skipped'] else {}
+            entry.pop('error', None)
+            entry.update(content_hash=row['content_hash'], stat=stat_signature(path), params_hash=ph,
+                         output=out_rel, **{k: v for k, v in row.items() if k not in ('content_hash', 'skipped')})
+            files[rel] = entry
+            save_manifest(out_dir, manifest)  # after every file, so an interrupted run resumes
+            what = 'unchanged' if row['skipped'] else f"{entry['n_windows']} windows, {entry['n_bursts']} bursts"
+            log_fn(f"[EXTRACT] {i}/{len(jobs)} {rel}: {what}")
+    return manifest
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('input', help="directory of recordings (.npy, .npz, recorder directories)")
+    p.add_argument('--out', default='features')
+    p.add_argument('--config', default='configs/config.yaml', help="eeg / biomarker / burst_detector settings")
+    p.add_argument('--window-sec', type=float, default=None, help="default: eeg.window_sec or eeg.chunk_sec")
+    p.add_argument('--hop-sec', type=float, default=None, help="default: eeg.hop_sec, else disjoint windows")
+    p.add_argument('--workers', type=int, default=None, help="default: all cores")
+    p.add_argument('--force', action='store_true', help="re-extract everything")
+    args = p.parse_args()
+    if not os.path.isdir(args.input):
+        p.error(f"Not a directory: {args.input}")
+    params = feature_params(load_config(args.config), args.window_sec, args.hop_sec)
+    extract_library(args.input, args.out, params, workers=args.workers, force=args.force)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+
+"""Per-stage latency instrumentation for the closed loop, with JSON / Prometheus export."""
+import json, math, os, threading, time
+
+STAGES = ('acquisition_wait', 'features', 'quality', 'feature_graph', 'burst_update', 'policy',
+          'safety_clamp', 'confirm_wait', 'stim_command')
+
+class StreamingHistogram:
+    """Fixed log-spaced buckets (seconds), so quantiles cost O(buckets) and memory is constant.
+    Quantiles are interpolated inside the bucket; relative error is bounded by the bucket
+    width (~12% at 20 buckets per decade).
+    """
+    def __init__(self, lo=1e-6, hi=100.0, per_decade=20):
+        self.lo = lo
+        self.per_decade = per_decade
+        n = int(math.ceil(math.log10(hi / lo) * per_decade))
+        self.bounds = [lo * 10 ** (i / per_decade) for i in range(n + 1)]
+        self.counts = [0] * (n + 2)  # [< lo] + n buckets + [>= hi]
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, x):
+        if x < self.lo:
+            i = 0
+        else:
+            i = min(len(self.counts) - 1, 1 + int(math.log10(x / self.lo) * self.per_decade))
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += x
+        if x > self.max:
+            self.max = x
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = 0.0 if i == 0 else self.bounds[i - 1]
+                hi = self.max if i >= len(self.bounds) else min(self.bounds[i], self.max)
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self.max
+
+    def summary(self):
+        return {'count': self.count, 'mean': self.sum / self.count if self.count else 0.0,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95),
+                'p99': self.quantile(0.99), 'max': self.max}
+
+class LoopInstrumentation:
+    """Times each loop stage per tick, tracks loop jitter and deadline misses, and
+    periodically writes a JSON snapshot and a Prometheus text-format file.
+    Durations are real (perf_counter) time even on a virtual clock.
+    Safe to share between stage threads: the histograms are updated under a lock and
+    the busy time of the tick in progress is accumulated per thread, so a stage hands
+    its share on with take_busy()/add_busy() and end_tick() counts one tick only.
+    """
+    def __init__(self, tick_period_sec, tick_deadline_sec=None, stage_deadlines_sec=None,
+                 json_path=None, prom_path=None, export_every_sec=10.0):
+        self.tick_period = tick_period_sec
+        self.tick_deadline = tick_deadline_sec if tick_deadline_sec is not None else tick_period_sec
+        self.stage_deadlines = dict(stage_deadlines_sec or {})
+        self.json_path = json_path
+        self.prom_path = prom_path
+        self.export_every = export_every_sec
+        self.hist = {s: StreamingHistogram() for s in STAGES}
+        self.tick_busy = StreamingHistogram()
+        self.jitter = StreamingHistogram()
+        self.deadline_misses = {s: 0 for s in STAGES}
+        self.tick_deadline_misses = 0
+        self.ticks = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()  # .busy: this thread's share of the tick in progress
+        self._last_arrival = None
+        self._next_export = time.monotonic() + (export_every_sec or 0.0)
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.hist[stage].add(seconds)
+            limit = self.stage_deadlines.get(stage)
+            if limit is not None and seconds > limit:
+                self.deadline_misses[stage] += 1
+        if stage != 'acquisition_wait':
+            self.add_busy(seconds)
+
+    def add_busy(self, seconds):
+        """Add to the calling thread's busy time for the tick in progress."""
+        self._local.busy = getattr(self._local, 'busy', 0.0) + seconds
+
+    def take_busy(self):
+        """Return and reset the calling thread's busy time for the tick in progress."""
+        busy = getattr(self._local, 'busy', 0.0)
+        self._local.busy = 0.0
+        return busy
+
+    def timer(self, stage):
+        return _StageTimer(self, stage)
+
+    def arrival(self):
+        """Mark sample arrival (end of the acquisition wait) to measure loop jitter."""
+        now = time.perf_counter()
+        with self._lock:
+            if self._last_arrival is not None:
+                self.jitter.add(abs((now - self._last_arrival) - self.tick_period))
+            self._last_arrival = now
+
+    def end_tick(self):
+        busy = self.take_busy()
+        with self._lock:
+            self.ticks += 1
+            self.tick_busy.add(busy)
+            if busy > self.tick_deadline:
+                self.tick_deadline_misses += 1
+        if self.export_every is not None and time.monotonic() >= self._next_export:
+            self.export()
+            self._next_export = time.monotonic() + self.export_every
+
+    def snapshot(self):
+        return {
+            'timestamp': time.time(),
+            'ticks': self.ticks,
+            'stages_sec': {s: h.summary() for s, h in self.hist.items()},
+            'tick_busy_sec': self.tick_busy.summary(),
+            'loop_jitter_sec': self.jitter.summary(),
+            'deadline_misses': dict(self.deadline_misses, tick=self.tick_deadline_misses),
+        }
+
+    def prometheus(self):
+        lines = ['# HELP closed_loop_stage_seconds Per-tick stage duration.',
+                 '# TYPE closed_loop_stage_seconds summary']
+        for s, h in self.hist.items():
+            for q in (0.5, 0.95, 0.99):
+                lines.append(f'closed_loop_stage_seconds{{stage="{s}",quantile="{q}"}} {h.quantile(q):.9g}')
+            lines.append(f'closed_loop_stage_seconds_sum{{stage="{s}"}} {h.sum:.9g}')
+            lines.append(f'closed_loop_stage_seconds_count{{stage="{s}"}} {h.count}')
+        lines += ['# HELP closed_loop_stage_seconds_max Max stage duration.',
+                  '# TYPE closed_loop_stage_seconds_max gauge']
+        lines += [f'closed_loop_stage_seconds_max{{stage="{s}"}} {h.max:.9g}' for s, h in self.hist.items()]
+        for name, h in (('closed_loop_tick_busy_seconds', self.tick_busy),
+                        ('closed_loop_jitter_seconds', self.jitter)):
+            lines += [f'# TYPE {name} summary']
+            lines += [f'{name}{{quantile="{q}"}} {h.quantile(q):.9g}' for q in (0.5, 0.95, 0.99)]
+            lines += [f'{name}_sum {h.sum:.9g}', f'{name}_count {h.count}']
+        lines += ['# HELP closed_loop_deadline_misses_total Stage/tick deadline misses.',
+                  '# TYPE closed_loop_deadline_misses_total counter']
+        lines += [f'closed_loop_deadline_misses_total{{stage="{s}"}} {n}' for s, n in self.deadline_misses.items()]
+        lines.append(f'closed_loop_deadline_misses_total{{stage="tick"}} {self.tick_deadline_misses}')
+        lines += ['# TYPE closed_loop_ticks_total counter', f'closed_loop_ticks_total {self.ticks}']
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        with self._lock:
+            snap = json.dumps(self.snapshot(), indent=1) if self.json_path else None
+            prom = self.prometheus() if self.prom_path else None
+        if self.json_path:
+            _atomic_write(self.json_path, snap)
+        if self.prom_path:
+            _atomic_write(self.prom_path, prom)
+
+class _StageTimer:
+    __slots__ = ('inst', 'stage', 't0')
+    def __init__(self, inst, stage):
+        self.inst, self.stage = inst, stage
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+    def __exit__(self, *exc):
+        self.inst.record(self.stage, time.perf_counter() - self.t0)
+
+def _atomic_write(path, text):
+    d = os.path.dirname(os.path.abspath(path))
+    os.makedirs(d, exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def run_profiled(fn, out_dir, log_fn=print):
+    """Run fn() under cProfile + tracemalloc and write reports to out_dir."""
+    import cProfile, pstats, tracemalloc, io
+    os.makedirs(out_dir, exist_ok=True)
+    tracemalloc.start(25)
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(fn)
+    finally:
+        snap = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        prof.dump_stats(os.path.join(out_dir, 'session.prof'))
+        buf = io.StringIO()
+        pstats.Stats(prof, stream=buf).sort_stats('cumulative').print_stats(50)
+        with open(os.path.join(out_dir, 'cprofile.txt'), 'w', encoding='utf-8') as f:
+            f.write(buf.getvalue())
+        with open(os.path.join(out_dir, 'tracemalloc.txt'), 'w', encoding='utf-8') as f:
+            f.write(f"peak traced memory: {peak/1e6:.1f} MB\n")
+            for stat in snap.statistics('lineno')[:40]:
+                f.write(f"{stat}\n")
+        log_fn(f"[PROFILE] Reports written to {out_dir}")
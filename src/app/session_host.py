@@ -0,0 +1,209 @@
+
+"""Many independent closed loops in one process, ticked in lockstep.
+
+    python -m src.app.session_host --sessions 16 --clock virtual --seconds 1200
+    python -m src.app.session_host --config configs/a.yaml --config configs/b.yaml
+
+Each session keeps its own EEG source, SafetyManager, confirmation, policy state,
+stimulator and ramps. Only the stateless heavy lifting is shared: per tick the
+sessions' chunks are stacked into one [n_sessions, n_channels, n_samples] array for a
+single batched feature pass, and ML proposals of all sessions due for a change are
+scored with one predict_batch call per model.
+"""
+import argparse, copy
+import numpy as np
+
+from .closed_loop import ClosedLoopSession, load_config, raw_window_samples
+from ..processing.eeg_pipeline import EEGPipeline
+from ..processing.preprocess import make_preprocessor
+from ..processing.signal_quality import make_quality_gate
+from ..utils.clock import make_clock
+from ..utils.ringbuffer import RingBuffer
+from ..utils.signal import seconds_to_samples
+from ..utils.logsink import RateLimitedLog
+
+# Settings that must match for sessions to share one batched feature pass
+SHARED_EEG_KEYS = ('fs', 'n_channels', 'chunk_sec', 'hop_sec', 'window_sec', 'bands', 'detrend',
+                   'notch_hz', 'notch_q', 'bandpass', 'filter_order', 'decimate', 'feature_backend')
+
+class _SessionClock:
+    """A session's view of the host clock: reads shared time, never sleeps.
+    The host paces the whole group with one sleep per tick."""
+    def __init__(self, clock):
+        self.clock = clock
+
+    def now(self):
+        return self.clock.now()
+
+    def sleep(self, seconds):
+        pass
+
+def _session_log(log_fn, name):
+    """Insert the session name after the leading tag, so '[EEG] x' -> '[EEG] s3: x'
+    and per-tag rate limiting / always-pass tags keep working."""
+    def log(msg):
+        if msg.startswith('[') and ']' in msg:
+            tag, rest = msg.split(']', 1)
+            log_fn(f"{tag}] {name}:{rest}")
+        else:
+            log_fn(f"{name}: {msg}")
+    return log
+
+class SessionHost:
+    """Runs N ClosedLoopSessions from `cfgs` (one config dict per session) on one clock."""
+    def __init__(self, cfgs, clock=None, log_fn=print, seeds=None):
+        if not cfgs:
+            raise ValueError("SessionHost needs at least one session config.")
+        base = cfgs[0]
+        for i, cfg in enumerate(cfgs[1:], 1):
+            if cfg['mode'] != base['mode'] or any(cfg['eeg'].get(k) != base['eeg'].get(k) for k in SHARED_EEG_KEYS):
+                raise ValueError(f"Session {i}: mode and eeg.{SHARED_EEG_KEYS} must match session 0.")
+            if cfg.get('quality') != base.get('quality'):
+                raise ValueError(f"Session {i}: the quality section must match session 0.")
+        self.clock = clock if clock is not None else make_clock(base.get('clock', 'wall'))
+        self.log = log_fn
+        seeds = list(seeds) if seeds is not None else [42 + i for i in range(len(cfgs))]
+        # The batched feature pass; sessions build no pipeline, preprocessor or gate of their own
+        eeg = base['eeg']
+        # One preprocessor over all sessions' channels (filters are per channel anyway)
+        self.pre = make_preprocessor(eeg, len(cfgs) * eeg['n_channels'],
+                                     chunk_samples=seconds_to_samples(eeg['fs'], eeg.get('hop_sec') or eeg['chunk_sec']))
+        self.pipe = EEGPipeline(fs=self.pre.fs_out if self.pre is not None else eeg['fs'],
+                                bands=eeg['bands'], detrend=eeg['detrend'],
+                                chunk_sec=eeg['chunk_sec'], window_sec=eeg.get('window_sec'),
+                                hop_sec=eeg.get('hop_sec'), feature_backend=eeg.get('feature_backend', 'welch'))
+        self.quality = make_quality_gate(base.get('quality'), eeg['fs'])
+        self._raw = None
+        if self.quality is not None and self.pre is not None:
+            # the gate checks raw samples, as in a single session
+            self._raw = RingBuffer(len(cfgs) * eeg['n_channels'], raw_window_samples(self.pre, self.pipe))
+        self.sessions = [ClosedLoopSession(cfg, clock=_SessionClock(self.clock), log_fn=_session_log(log_fn, f"s{i}"),
+                                           seed=seeds[i], ramp_thread=False, host=self)
+                         for i, cfg in enumerate(cfgs)]
+        # Sessions loading the same weights share one model, so they can be scored together
+        models = {}
+        for s, cfg in zip(self.sessions, cfgs):
+            if s.ml is not None:
+                path = cfg['controller'].get('weights_path', 'models/ml_policy_weights.npz')
+                s.ml = models.setdefault(path, s.ml)
+        self.models = list(models.values())
+
+        src = self.sessions[0].src
+        self.tick_sec = src.n_samples / src.fs
+        # LSL / process-acquisition sessions are paced by their sources
+        self.paced = base['mode'] != 'lsl' and not (base.get('acquisition', {}) or {}).get('process')
+        self._stack = np.zeros((len(cfgs), src.n_channels, src.n_samples))
+        self.alive = [True] * len(cfgs)
+
+    def _finish(self, i):
+        self.alive[i] = False
+        self._stack[i] = 0.0  # keeps the batched (sliding) feature layout fixed
+        self.sessions[i].stop()
+
+    def step(self):
+        """One lockstep tick of every live session. Returns False once all have ended."""
+        for i, s in enumerate(self.sessions):
+            if self.alive[i] and not s.running():
+                self._finish(i)
+        live = [i for i in range(len(self.sessions)) if self.alive[i]]
+        if not live:
+            return False
+        for i in live:
+            chunk = self.sessions[i].acquire()
+            if chunk is None:
+                self._finish(i)
+            else:
+                self._stack[i] = chunk
+        live = [i for i in live if self.alive[i]]
+        if not live:
+            return False
+        if self.paced:
+            self.clock.sleep(self.tick_sec)
+
+        stack = self._stack
+        n_sess, n_ch, _ = stack.shape
+        if self._raw is not None:
+            self._raw.write(stack.reshape(n_sess * n_ch, -1))
+        if self.pre is not None:
+            stack = self.pre.process(stack.reshape(n_sess * n_ch, -1)).reshape(n_sess, n_ch, -1)
+        bp = self.pipe.bandpowers(stack)  # [n_sessions, n_channels, n_bands]
+        good = flags = [None] * len(self.sessions)
+        if self.quality is not None:
+            # one vectorized pass over every session's channels, on the shared PSD (or raw window)
+            if self._raw is not None:
+                good = self.quality.assess_raw(self._raw.latest(len(self._raw)).reshape(n_sess, n_ch, -1))
+            else:
+                good = self.quality.assess(self.pipe.last_window, *self.pipe.last_spectrum)
+            flags = self.quality.flags
+        obs = {i: self.sessions[i].observe(bp[i], good[i], flags[i]) for i in live}
+
+        proposed = {}
+        for model in self.models:
+            due = [i for i in live if self.sessions[i].ml is model and self.sessions[i].wants_proposal()]
+            if due:
+                X = [self.sessions[i].ml_features(obs[i][0]) for i in due]
+                proposed.update(zip(due, model.predict_batch(X).tolist()))
+        for i in live:
+            feats, b_evt = obs[i]
+            self.sessions[i].control(feats, b_evt, proposed_mA=proposed.get(i))
+        return True
+
+    def stop(self):
+        for i in range(len(self.sessions)):
+            if self.alive[i]:
+                self._finish(i)
+
+    def run(self):
+        """Tick until every session has ended; returns the per-session metrics."""
+        try:
+            while self.step():
+                pass
+        except KeyboardInterrupt:
+            self.log("[STOP] Interrupted by user.")
+        finally:
+            self.stop()
+        return [s.metrics for s in self.sessions]
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--config', action='append', default=None,
+                   help="session config (repeat for one session per config)")
+    p.add_argument('--sessions', type=int, default=None,
+                   help="number of sessions (configs are repeated round-robin)")
+    p.add_argument('--mode', choices=['simulation', 'replay'], default=None)
+    p.add_argument('--seconds', type=int, default=None)
+    p.add_argument('--clock', choices=['wall', 'virtual'], default=None)
+    args = p.parse_args()
+
+    base = [load_config(path) for path in (args.config or ['configs/config.yaml'])]
+    cfgs = [copy.deepcopy(base[i % len(base)]) for i in range(args.sessions or len(base))]
+    for cfg in cfgs:
+        if args.mode is not None:
+            cfg['mode'] = args.mode
+        if args.seconds is not None:
+            cfg['seconds'] = args.seconds
+        if args.clock is not None:
+            cfg['clock'] = args.clock
+    for i, cfg in enumerate(cfgs):
+        # One stdin cannot answer N sessions: confirmations (and devices) get per-session sockets
+        s = cfg['safety']
+        s['confirm_terminal'] = False
+        if s.get('confirm_socket'):
+            s['confirm_socket'] = f"{s['confirm_socket']}.s{i}"
+        if cfg['stimulator'].get('device_socket'):
+            cfg['stimulator']['device_socket'] = f"{cfg['stimulator']['device_socket']}.s{i}"
+    if cfgs[0]['mode'] == 'lsl':
+        p.error('Use one closed_loop process per LSL stream.')
+    if cfgs[0]['stimulator'].get('device_socket') and cfgs[0].get('clock', 'wall') != 'wall':
+        p.error('A stimulator device requires the wall clock.')
+
+    clock = make_clock(cfgs[0].get('clock', 'wall'))
+    log = RateLimitedLog(print, min_interval_sec=(cfgs[0].get('logging', {}) or {}).get('rate_limit_sec', 1.0),
+                         clock=clock)
+    host = SessionHost(cfgs, clock=clock, log_fn=log)
+    for i, m in enumerate(host.run()):
+        log(f"[END] s{i}: ticks={m['ticks']} in_target={m['time_in_target_sec']:.0f}s "
+            f"changes={m['changes']} bursts={m['bursts']} charge={m['charge_mC']:.1f} mC")
+
+if __name__ == '__main__':
+    main()
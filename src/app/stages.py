@@ -0,0 +1,165 @@
+
+"""Staged closed loop: acquisition -> processing -> control, each on its own thread,
+connected by bounded queues with per-stage deadlines.
+"""
+import threading, time
+from collections import deque
+
+class StageQueue:
+    """Bounded hand-off between two stages.
+    overflow='drop_oldest' discards the stalest item when full, so a slow consumer
+    always sees fresh data; overflow='block' applies backpressure to the producer.
+    """
+    def __init__(self, maxsize=4, overflow='drop_oldest'):
+        if overflow not in ('drop_oldest', 'block'):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.maxsize = max(1, int(maxsize))
+        self.overflow = overflow
+        self.dropped = 0
+        self._items = deque()
+        self._cv = threading.Condition()
+
+    def put(self, item, stop_evt=None):
+        with self._cv:
+            while len(self._items) >= self.maxsize:
+                if self.overflow == 'drop_oldest':
+                    self._items.popleft()
+                    self.dropped += 1
+                    break
+                if stop_evt is not None and stop_evt.is_set():
+                    return False
+                self._cv.wait(0.1)
+            self._items.append(item)
+            self._cv.notify_all()
+            return True
+
+    def get(self, timeout=0.1):
+        """Oldest item, or None after `timeout` seconds with nothing queued."""
+        with self._cv:
+            if not self._items and not self._cv.wait_for(lambda: self._items, timeout):
+                return None
+            item = self._items.popleft()
+            self._cv.notify_all()
+            return item
+
+    def __len__(self):
+        return len(self._items)
+
+class Stage(threading.Thread):
+    """Runs `fn` once per item on its own thread and counts missed deadlines.
+    Source stages (inq=None) call fn() repeatedly; others call fn(item).
+    A non-None result is forwarded to `outq`. Any exception stops the whole runner.
+    """
+    def __init__(self, name, fn, inq, outq, deadline_sec, stop_evt):
+        super().__init__(name=name, daemon=True)
+        self.fn, self.inq, self.outq = fn, inq, outq
+        self.deadline = deadline_sec
+        self.stop_evt = stop_evt
+        self.ticks = 0
+        self.missed_deadlines = 0
+        self.max_busy_sec = 0.0
+        self.error = None
+
+    def run(self):
+        try:
+            while not self.stop_evt.is_set():
+                if self.inq is None:
+                    item = None
+                else:
+                    item = self.inq.get()
+                    if item is None:
+                        continue
+                t0 = time.perf_counter()
+                out = self.fn() if self.inq is None else self.fn(item)
+                busy = time.perf_counter() - t0
+                self.ticks += 1
+                self.max_busy_sec = max(self.max_busy_sec, busy)
+                if self.deadline is not None and busy > self.deadline:
+                    self.missed_deadlines += 1
+                if out is not None and self.outq is not None:
+                    self.outq.put(out, self.stop_evt)
+        except Exception as e:
+            self.error = e
+            self.stop_evt.set()
+
+class StagedRunner:
+    """Runs a ClosedLoopSession as three concurrent stages.
+    Every work item carries the time its samples arrived, so the control stage can
+    track arrival -> decision latency (`max_latency_ms`, `latency_misses`).
+    Raw chunks always queue with backpressure: processing keeps streaming state
+    (sliding windows, filters, decimator phase) that a dropped chunk would tear.
+    `overflow` applies to the feature queue in front of control only.
+    """
+    def __init__(self, session, queue_size=4, overflow='drop_oldest', deadlines_ms=None,
+                 max_latency_ms=None):
+        self.session = session
+        chunk_sec = session.src.n_samples / session.src.fs
+        d = {'acquisition': 1500.0 * chunk_sec, 'processing': 100.0, 'control': 200.0}
+        d.update({k: v for k, v in (deadlines_ms or {}).items() if v is not None})
+        self.deadlines_ms = d
+        self.max_latency_ms = max_latency_ms
+        self.stop_evt = threading.Event()
+        self.q_proc = StageQueue(queue_size, 'block')
+        self.q_ctrl = StageQueue(queue_size, overflow)
+        self.latency_max_ms = 0.0
+        self.latency_misses = 0
+        self.stages = [
+            Stage('acquisition', self._acquire, None, self.q_proc, d['acquisition']/1000.0, self.stop_evt),
+            Stage('processing', self._process, self.q_proc, self.q_ctrl, d['processing']/1000.0, self.stop_evt),
+            Stage('control', self._control, self.q_ctrl, None, d['control']/1000.0, self.stop_evt),
+        ]
+
+    def _acquire(self):
+        chunk = self.session.acquire()
+        if chunk is None:
+            self.stop_evt.wait()  # source ended; run() sees running() turn False and stops
+            return None
+        return (time.perf_counter(), chunk)
+
+    def _process(self, item):
+        t_arrival, chunk = item
+        feats, b_evt = self.session.process(chunk)
+        instr = self.session.instr
+        # this tick's processing time travels with it to the control thread, which ends the tick
+        busy = instr.take_busy() if instr is not None else 0.0
+        return t_arrival, busy, feats, b_evt
+
+    def _control(self, item):
+        t_arrival, busy, feats, b_evt = item
+        if self.session.instr is not None:
+            self.session.instr.add_busy(busy)
+        self.session.control(feats, b_evt)
+        latency_ms = 1000.0 * (time.perf_counter() - t_arrival)
+        self.latency_max_ms = max(self.latency_max_ms, latency_ms)
+        if self.max_latency_ms is not None and latency_ms > self.max_latency_ms:
+            self.latency_misses += 1
+
+    def stats(self):
+        out = {'max_latency_ms': self.latency_max_ms, 'latency_misses': self.latency_misses,
+               'dropped_processing': self.q_proc.dropped, 'dropped_control': self.q_ctrl.dropped}
+        for st in self.stages:
+            out[f'deadline_misses_{st.name}'] = st.missed_deadlines
+            out[f'max_busy_ms_{st.name}'] = 1000.0 * st.max_busy_sec
+        return out
+
+    def run(self):
+        session = self.session
+        session.running()  # start the session before any stage touches it
+        for st in self.stages:
+            st.start()
+        try:
+            while not self.stop_evt.wait(0.1):
+                if not session.running():
+                    break
+        except KeyboardInterrupt:
+            session.log("[STOP] Interrupted by user.")
+        finally:
+            self.stop_evt.set()
+            for st in self.stages:
+                st.join(timeout=2.0)
+            session.metrics.update(self.stats())
+            for st in self.stages:
+                if st.error is not None:
+                    session.log(f"[STAGE] {st.name} failed: {st.error!r}")
+            session.stop()
+        return session.metrics
@@ -0,0 +1,176 @@
+
+"""Parallel parameter sweep over config keys, one virtual-clock session per point.
+
+    python -m src.app.sweep --param controller.kp=0.05,0.1,0.2 --param safety.ramp_rate_mA_per_min=0.25,0.5
+    python -m src.app.sweep --random 200 --param burst_detector.z_thresh=1.5:3.0 --param burst_detector.hysteresis=0.2:1.0
+
+Results go to one columnar .npz (one array per column). Points whose config hash is
+already in the results file are skipped, so an interrupted sweep can be resumed; a
+point that failed keeps its `error` in the row and is retried on the next run.
+
+All points share common random numbers: replicate r of every point simulates the same
+virtual subject (seed from --seed and r), so differences between points are parameter
+effects, not subject noise. Use --replicates to average over several subjects.
+"""
+import argparse, copy, hashlib, itertools, json, os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+from .closed_loop import ClosedLoopSession, load_config
+from ..utils.clock import VirtualClock
+
+def set_key(cfg, dotted, value):
+    node = cfg
+    *parents, leaf = dotted.split('.')
+    for k in parents:
+        node = node.setdefault(k, {})
+    node[leaf] = value
+
+def parse_param(spec):
+    """'a.b=1,2,3' -> ('a.b', [1,2,3]); 'a.b=0:1' -> ('a.b', (0.0, 1.0)) range for random search."""
+    key, _, values = spec.partition('=')
+    if not values:
+        raise ValueError(f"Bad --param {spec!r}; expected key=v1,v2 or key=lo:hi")
+    if ':' in values:
+        lo, hi = values.split(':')
+        return key, (float(lo), float(hi))
+    import yaml
+    return key, [yaml.safe_load(v) for v in values.split(',')]
+
+def grid_points(params):
+    keys = list(params)
+    for combo in itertools.product(*(params[k] for k in keys)):
+        yield dict(zip(keys, combo))
+
+def random_points(params, n, seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        pt = {}
+        for k, v in params.items():
+            if isinstance(v, tuple):
+                pt[k] = float(rng.uniform(*v))
+            else:
+                pt[k] = v[int(rng.integers(len(v)))]
+        yield pt
+
+def config_hash(cfg):
+    return hashlib.sha256(json.dumps(cfg, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def replicate_seed(seed, replicate):
+    """Subject seed of one replicate; the same for every point of a sweep."""
+    return int(np.random.SeedSequence([seed, replicate]).generate_state(1)[0])
+
+def run_point(cfg, seed):
+    """Worker: one full closed-loop session on a virtual clock, no logging."""
+    session = ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None, seed=seed)
+    metrics = dict(session.run())
+    metrics['seed'] = seed
+    return metrics
+
+def load_results(path):
+    if not os.path.exists(path):
+        return {}
+    with np.load(path, allow_pickle=False) as d:
+        return {k: d[k].tolist() for k in d.files}
+
+def save_results(path, cols):
+    n = max(len(v) for v in cols.values())
+    arrays = {}
+    for k, v in cols.items():
+        v = v + [None] * (n - len(v))
+        if all(isinstance(x, str) or x is None for x in v):
+            arrays[k] = np.array(['' if x is None else x for x in v])
+        else:
+            arrays[k] = np.array([np.nan if x is None else x for x in v], dtype=float)
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+def append_row(cols, row):
+    n = len(cols.get('config_hash', []))
+    for k in set(cols) | set(row):
+        col = cols.setdefault(k, [None] * n)
+        col.append(row.get(k))
+
+def drop_rows(cols, hashes):
+    """Remove the rows of `hashes` (failed points about to be retried)."""
+    keep = [i for i, h in enumerate(cols.get('config_hash', [])) if h not in hashes]
+    for k, v in cols.items():
+        cols[k] = [v[i] for i in keep]
+
+def run_sweep(base, points, out, seed=0, replicates=1, workers=None, log_fn=print):
+    """Run every (point, replicate) not yet in `out`; returns the result columns."""
+    cols = load_results(out)
+    done = {h for h, err in zip(cols.get('config_hash', []), cols.get('error', itertools.repeat('')))
+            if not err}
+    jobs = {}
+    for pt in points:
+        for r in range(replicates):
+            cfg = copy.deepcopy(base)
+            for k, v in pt.items():
+                set_key(cfg, k, v)
+            cfg['sweep_seed'] = seed
+            cfg['sweep_replicate'] = r
+            h = config_hash(cfg)
+            if h not in done and h not in jobs:
+                jobs[h] = (cfg, dict(pt, replicate=r), replicate_seed(seed, r))
+    n_runs = len(points) * replicates
+    log_fn(f"[SWEEP] {n_runs} runs, {n_runs - len(jobs)} already done, running {len(jobs)}")
+    if not jobs:
+        return cols
+    drop_rows(cols, set(jobs))
+
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futs = {pool.submit(run_point, cfg, s): h for h, (cfg, _, s) in jobs.items()}
+        for i, fut in enumerate(as_completed(futs), 1):
+            h = futs[fut]
+            _, pt, s = jobs[h]
+            try:
+                metrics = fut.result()
+            except Exception as e:
+                # one failed point must not take the rest of the sweep with it
+                metrics = {'seed': s, 'error': f"{type(e).__name__}: {e}"}
+            row = {'config_hash': h, **pt, **metrics}
+            append_row(cols, row)
+            save_results(out, cols)  # after every run, so a crash loses at most in-flight work
+            if 'error' in metrics:
+                log_fn(f"[SWEEP] {i}/{len(jobs)} {h} {pt} failed: {metrics['error']}")
+            else:
+                log_fn(f"[SWEEP] {i}/{len(jobs)} {h} {pt} -> "
+                       f"in_target={row['time_in_target_sec']:.0f}s changes={row['changes']} "
+                       f"charge={row['charge_mC']:.0f}mC bursts={row['bursts']}")
+    return cols
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--config', default='configs/config.yaml')
+    p.add_argument('--param', action='append', default=[], required=True,
+                   help="key=v1,v2,... (grid) or key=lo:hi (uniform, with --random)")
+    p.add_argument('--random', type=int, default=0, help="number of random points instead of a full grid")
+    p.add_argument('--seed', type=int, default=0, help="base seed (random search and the shared subject seeds)")
+    p.add_argument('--replicates', type=int, default=1, help="subjects per point (same subjects for every point)")
+    p.add_argument('--seconds', type=int, default=None)
+    p.add_argument('--workers', type=int, default=None, help="default: all cores")
+    p.add_argument('--out', default='results/sweep.npz')
+    args = p.parse_args()
+
+    base = load_config(args.config)
+    base['mode'] = 'simulation'
+    base['clock'] = 'virtual'
+    base['safety']['require_human_confirm'] = False
+    if args.seconds is not None:
+        base['seconds'] = args.seconds
+
+    params = dict(parse_param(s) for s in args.param)
+    if args.random:
+        points = list(random_points(params, args.random, args.seed))
+    else:
+        if any(isinstance(v, tuple) for v in params.values()):
+            p.error("lo:hi ranges need --random")
+        points = list(grid_points(params))
+
+    run_sweep(base, points, args.out, seed=args.seed, replicates=args.replicates, workers=args.workers)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+
+"""Local stand-in for a stimulator device behind a Unix socket.
+
+    python -m src.hardware.mock_device --socket /tmp/tdcs-stim.sock --latency-ms 5
+
+Protocol: one JSON object per line each way. Every request carries an `id` and an `op`:
+    {"id": 1, "op": "output", "mA": 1.2}                      set the output now
+    {"id": 2, "op": "waveform", "t": [...], "mA": [...]}      play setpoints (t in s from receipt)
+    {"id": 3, "op": "read"}                                   report the output
+Replies echo the id: {"id": 1, "ok": true, "mA": <output now>, "t": <device time>},
+or {"id": 1, "ok": false, "error": "..."}. A new output or waveform replaces a waveform
+still playing. Each command is executed `latency_sec` (+ uniform jitter) after it
+arrives, like a slow serial link; setpoints above `max_mA` are rejected.
+"""
+import argparse, json, os, random, socket, threading, time
+from bisect import bisect_right
+from ..utils.sockets import is_socket
+
+class MockDeviceServer:
+    def __init__(self, socket_path, latency_sec=0.0, jitter_sec=0.0, max_mA=4.0, log_fn=print):
+        self.socket_path = socket_path
+        self.latency = float(latency_sec)
+        self.jitter = float(jitter_sec)
+        self.max_mA = float(max_mA)
+        self.log = log_fn
+        self.commands = 0
+        self._level = 0.0
+        self._wf = None  # (t0, t, mA)
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._conns = set()
+        if is_socket(socket_path):
+            os.unlink(socket_path)  # stale socket of an earlier run
+        elif os.path.lexists(socket_path):
+            raise ValueError(f"Device socket {socket_path} exists and is not a socket.")
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(socket_path)
+        self._server.listen(4)
+        self._server.settimeout(0.5)
+        self._thread = threading.Thread(target=self._serve, name='mock-device', daemon=True)
+        self._thread.start()
+
+    def level(self, now=None):
+        """Output current (mA) at device time `now`."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._wf is not None:
+                t0, t, mA = self._wf
+                k = bisect_right(t, now - t0)
+                if k:
+                    self._level = mA[k-1]
+                if k >= len(t):
+                    self._wf = None
+            return self._level
+
+    def _execute(self, req):
+        op = req.get('op')
+        if op == 'output':
+            mA = float(req['mA'])
+            if abs(mA) > self.max_mA:
+                raise ValueError(f"{mA:.3f} mA exceeds the device limit of {self.max_mA} mA")
+            with self._lock:
+                self._wf = None
+                self._level = mA
+        elif op == 'waveform':
+            t, mA = [float(v) for v in req['t']], [float(v) for v in req['mA']]
+            if not t or len(t) != len(mA) or any(b < a for a, b in zip(t, t[1:])):
+                raise ValueError("malformed waveform")
+            if max(abs(v) for v in mA) > self.max_mA:
+                raise ValueError(f"waveform exceeds the device limit of {self.max_mA} mA")
+            with self._lock:
+                self._wf = (time.monotonic(), t, mA)
+        elif op != 'read':
+            raise ValueError(f"unknown op {op!r}")
+
+    def _serve(self):
+        while not self._closed.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self._client, args=(conn,), daemon=True).start()
+
+    def _client(self, conn):
+        self._conns.add(conn)
+        with conn, conn.makefile('rw', encoding='utf-8') as f:
+            for line in f:
+                req = {}
+                try:
+                    req = json.loads(line)
+                    delay = self.latency + (random.uniform(0.0, self.jitter) if self.jitter else 0.0)
+                    if delay > 0:
+                        time.sleep(delay)
+                    self._execute(req)
+                    self.commands += 1
+                    now = time.monotonic()
+                    reply = {'id': req.get('id'), 'ok': True, 'mA': self.level(now), 't': now}
+                except (ValueError, KeyError, TypeError) as e:
+                    reply = {'id': req.get('id') if isinstance(req, dict) else None, 'ok': False, 'error': str(e)}
+                f.write(json.dumps(reply) + "\n")
+                f.flush()
+        self._conns.discard(conn)
+
+    def close(self):
+        """Shut down like a device that powers off: connected clients are cut off too."""
+        self._closed.set()
+        self._server.close()
+        for conn in list(self._conns):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._thread.join(timeout=1.0)
+        if is_socket(self.socket_path):
+            os.unlink(self.socket_path)
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--socket', default='/tmp/tdcs-stim.sock')
+    p.add_argument('--latency-ms', type=float, default=5.0, help="command execution delay")
+    p.add_argument('--jitter-ms', type=float, default=0.0, help="extra uniform random delay")
+    p.add_argument('--max-mA', type=float, default=4.0, help="device-side output limit")
+    args = p.parse_args()
+    dev = MockDeviceServer(args.socket, args.latency_ms / 1000.0, args.jitter_ms / 1000.0, args.max_mA)
+    print(f"[MockDevice] listening on {args.socket} (latency {args.latency_ms} ms). Ctrl-C to quit.")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dev.close()
+        print(f"[MockDevice] {dev.commands} commands served.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+
+import threading
+from ..utils.clock import WallClock
+
+class RampScheduler:
+    """Non-blocking linear ramps on a StimulatorAPI.
+    A ramp is a setpoint defined as a function of time (start level, target, start
+    time, duration); `poll()` applies the setpoint for "now". With threaded=True a
+    daemon thread polls every `step_sec`, so the caller never blocks. Without a
+    thread the owner calls poll() each tick (required on a VirtualClock, where time
+    only advances with the loop).
+    Retargeting mid-ramp starts a new ramp from the present output level.
+    On a stimulator with `supports_waveforms` the whole ramp goes out as one waveform
+    command and poll() only follows the device's playback; once it ends, the device's
+    readback must match the final setpoint.
+    A device error (RuntimeError: rejected, unacknowledged or mismatched command) stops
+    the stimulator and is kept in `fault`; the owner should then end the session.
+    """
+    def __init__(self, stim, clock=None, step_sec=0.1, threaded=False, readback_tol_mA=1e-6):
+        self.stim = stim
+        self.clock = clock if clock is not None else WallClock()
+        self.step_sec = float(step_sec)
+        self.readback_tol = float(readback_tol_mA)
+        self.fault = None  # str: why the stimulator was stopped, or None
+        self._lock = threading.Lock()
+        self._ramp = None  # (start_mA, target_mA, t0, seconds)
+        self._stop_evt = threading.Event()
+        self._thread = None
+        if threaded:
+            self._thread = threading.Thread(target=self._run, name='ramp-scheduler', daemon=True)
+            self._thread.start()
+
+    @property
+    def target(self):
+        """Target of the ramp in progress, or None when idle."""
+        r = self._ramp
+        return None if r is None else r[1]
+
+    @property
+    def active(self):
+        return self._ramp is not None
+
+    def ramp_to(self, target_mA, seconds):
+        """Start (or re-target) a ramp from the present output level; returns immediately.
+        Returns False if the device failed the command (see `fault`)."""
+        with self._lock:
+            if self.fault is not None:
+                return False
+            try:
+                batched = self.stim.supports_waveforms
+                if batched:
+                    self.stim.poll_waveform()
+                start = self.stim.current_mA
+                if seconds <= 0:
+                    self._ramp = None
+                    self._set(float(target_mA))
+                    return True
+                if batched:
+                    # the ramp only exists once the device has acknowledged it
+                    self.stim.send_waveform(*self.stim.compile_ramp(target_mA, seconds, self.step_sec))
+                self._ramp = (start, float(target_mA), self.clock.now(), float(seconds))
+            except RuntimeError as e:
+                self._fail(e)
+                return False
+            return True
+
+    def cancel(self):
+        """Abort the ramp in progress and hold the present output level."""
+        with self._lock:
+            self._ramp = None
+            if self.stim.supports_waveforms:
+                try:
+                    self.stim.cancel_waveform()
+                except RuntimeError as e:
+                    self._fail(e)
+
+    def safe_stop(self):
+        """Abort any ramp and drop the output to zero immediately."""
+        with self._lock:
+            self._ramp = None
+            self._stop_output()
+
+    def _stop_output(self):
+        try:
+            self.stim.stop()
+        except RuntimeError as e:
+            # unreachable device: the host side is off regardless; keep the first cause
+            self.fault = self.fault or f"stop failed: {e}"
+
+    def _fail(self, e):
+        self._ramp = None
+        self.fault = self.fault or str(e)
+        self._stop_output()
+
+    def poll(self):
+        """Apply the setpoint for the current time. Returns True while a ramp is in progress."""
+        with self._lock:
+            if self._ramp is None:
+                return False
+            try:
+                if self.stim.supports_waveforms:
+                    if not self.stim.poll_waveform():
+                        self._ramp = None
+                        self._verify()
+                    return self._ramp is not None
+                start, target, t0, seconds = self._ramp
+                frac = min(1.0, (self.clock.now() - t0) / seconds)
+                self._set(start + (target - start) * frac)
+                if frac >= 1.0:
+                    self._ramp = None
+            except RuntimeError as e:
+                self._fail(e)
+            return self._ramp is not None
+
+    def _verify(self):
+        """After a waveform: the device must report the level the host believes it set."""
+        level = self.stim.readback()
+        if abs(level - self.stim.current_mA) > self.readback_tol:
+            raise RuntimeError(f"Stimulator readback {level:.3f} mA after the ramp, "
+                               f"expected {self.stim.current_mA:.3f} mA.")
+
+    def _set(self, mA):
+        if mA != self.stim.current_mA:
+            self.stim.current_mA = mA
+            self.stim.output(mA)
+
+    def _run(self):
+        try:
+            while not self._stop_evt.wait(self.step_sec):
+                self.poll()
+        except Exception as e:
+            # A failed output command must never leave a ramp half-applied
+            self._fail(e)
+            raise
+
+    def close(self):
+        self._stop_evt.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
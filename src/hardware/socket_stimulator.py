@@ -0,0 +1,81 @@
+
+import json, socket, time
+from .stimulator_api import StimulatorAPI
+
+class SocketStimulator(StimulatorAPI):
+    """StimulatorAPI over the line-delimited JSON protocol of src.hardware.mock_device.
+    Every command waits for its acknowledgement; a missing, malformed, mismatched or
+    negative acknowledgement raises RuntimeError, which the ramp scheduler turns into a safe stop.
+    `last_rtt_sec` is the round trip of the latest command.
+    """
+    supports_waveforms = True
+
+    def __init__(self, socket_path, timeout_sec=1.0, log_fn=print, clock=None):
+        super().__init__(clock=clock)
+        self.socket_path = socket_path
+        self.timeout = float(timeout_sec)
+        self.log = log_fn
+        self.last_rtt_sec = None
+        self._sock = None
+        self._file = None
+        self._next_id = 1
+
+    def connect(self):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(self.timeout)
+        self._sock.connect(self.socket_path)
+        self._file = self._sock.makefile('rw', encoding='utf-8')
+        self.log(f"[DeviceStim] connected to {self.socket_path}.")
+
+    def disconnect(self):
+        if self._sock is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass  # device already gone; nothing left to flush to
+            self._sock.close()
+            self._sock = self._file = None
+            self.log("[DeviceStim] disconnected.")
+
+    def start(self):
+        super().start()
+        self.output(self.current_mA)  # the device only knows levels it was sent
+
+    def request(self, op, **fields):
+        """Send one command and return the device's acknowledgement."""
+        if self._sock is None:
+            raise RuntimeError("Stimulator device not connected.")
+        req_id = self._next_id
+        self._next_id += 1
+        t0 = time.perf_counter()
+        try:
+            self._file.write(json.dumps(dict(id=req_id, op=op, **fields)) + "\n")
+            self._file.flush()
+            line = self._file.readline()
+        except (OSError, socket.timeout) as e:
+            raise RuntimeError(f"Stimulator device: no acknowledgement for {op!r} ({e}).") from e
+        self.last_rtt_sec = time.perf_counter() - t0
+        if not line:
+            raise RuntimeError("Stimulator device closed the connection.")
+        try:
+            ack = json.loads(line)
+        except ValueError as e:
+            raise RuntimeError(f"Stimulator device: malformed acknowledgement for {op!r} ({e}).") from e
+        if not isinstance(ack, dict):
+            raise RuntimeError(f"Stimulator device: malformed acknowledgement for {op!r}: {line.strip()!r}.")
+        if ack.get('id') != req_id:
+            raise RuntimeError(f"Stimulator device: acknowledgement {ack.get('id')} for command {req_id}.")
+        if not ack.get('ok'):
+            raise RuntimeError(f"Stimulator device rejected {op!r}: {ack.get('error')}")
+        return ack
+
+    def _apply_output(self, mA: float):
+        self.request('output', mA=float(mA) if self.is_on else 0.0)
+
+    def _apply_waveform(self, t, mA):
+        if not self.is_on:
+            mA = mA * 0.0
+        return self.request('waveform', t=t.tolist(), mA=mA.tolist())
+
+    def _read_output(self):
+        return self.request('read')['mA']
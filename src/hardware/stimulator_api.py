@@ -1,15 +1,59 @@
 
-import time
+import numpy as np
+from ..utils.clock import WallClock
 
 class StimulatorAPI:
     """Abstract interface. Replace with a *certified* stimulator driver in HIL.
     This base class provides common ramping utilities. Do *not* subclass to real hardware
     without adding physical safety interlocks, impedance checks, and watchdogs.
+
+    Devices with `supports_waveforms` take a whole ramp as one command: a list of
+    timestamped setpoints that the device plays back on its own timer. Any later
+    command replaces a waveform still playing. `poll_waveform()` keeps `current_mA`
+    (and the output listeners) in step with the playback on the host side.
     """
-    def __init__(self):
-        self.current_mA = 0.0
+    supports_waveforms = False
+
+    def __init__(self, clock=None):
+        self.clock = clock if clock is not None else WallClock()
+        self._current_mA = 0.0
         self.polarity = 'anodal'
         self.is_on = False
+        self.delivered_mC = 0.0  # integrated |current| while on (mA*s)
+        self._charge_ts = self.clock.now()
+        self._output_listeners = []
+        self._waveform = None  # (t0, t [s from t0], mA) while the device plays a waveform
+
+    def add_output_listener(self, fn):
+        """fn(t, mA) is called after every output command (e.g. a session recorder)."""
+        self._output_listeners.append(fn)
+
+    def output(self, mA: float):
+        """Send one output command and notify listeners. Subclasses override _apply_output."""
+        self._waveform = None
+        self._apply_output(mA)
+        self._notify(mA)
+
+    def _notify(self, mA):
+        if self._output_listeners:
+            t = self.clock.now()
+            for fn in self._output_listeners:
+                fn(t, mA)
+
+    def _accumulate_charge(self):
+        now = self.clock.now()
+        if self.is_on:
+            self.delivered_mC += abs(self._current_mA) * (now - self._charge_ts)
+        self._charge_ts = now
+
+    @property
+    def current_mA(self):
+        return self._current_mA
+
+    @current_mA.setter
+    def current_mA(self, mA):
+        self._accumulate_charge()
+        self._current_mA = mA
 
     def connect(self): pass
     def disconnect(self): pass
@@ -18,31 +62,96 @@ class StimulatorAPI:
         assert polarity in ('anodal','cathodal')
         self.polarity = polarity
 
+    def compile_ramp(self, target_mA, seconds, step_sec=0.1, start_mA=None):
+        """Linear ramp as a setpoint waveform: (t, mA) arrays, one setpoint every
+        `step_sec` (t in seconds from the start), reaching the target at `seconds`."""
+        start = self.current_mA if start_mA is None else float(start_mA)
+        steps = max(1, int(round(seconds / step_sec)))
+        frac = np.arange(1, steps + 1) / steps
+        return seconds * frac, start + (float(target_mA) - start) * frac
+
+    def send_waveform(self, t, mA):
+        """Send a whole setpoint waveform as one command; returns the device acknowledgement.
+        Playback starts now; call poll_waveform() to follow it."""
+        t = np.asarray(t, dtype=float)
+        mA = np.asarray(mA, dtype=float)
+        if t.ndim != 1 or t.shape != mA.shape or not len(t):
+            raise ValueError("Waveform needs matching, non-empty 1-D time and setpoint arrays.")
+        if np.any(np.diff(t) < 0) or t[0] < 0:
+            raise ValueError("Waveform times must be non-negative and non-decreasing.")
+        ack = self._apply_waveform(t, mA)
+        self._waveform = (self.clock.now(), t, mA)
+        return ack
+
+    def poll_waveform(self):
+        """Bring current_mA to the setpoint the device is playing now (listeners see every
+        new level). Returns True while the waveform is still playing."""
+        if self._waveform is None:
+            return False
+        t0, t, mA = self._waveform
+        k = int(np.searchsorted(t, self.clock.now() - t0, side='right'))
+        if k and mA[k-1] != self._current_mA:
+            self.current_mA = float(mA[k-1])
+            self._notify(self._current_mA)
+        if k >= len(t):
+            self._waveform = None
+        return self._waveform is not None
+
+    def cancel_waveform(self):
+        """Stop a waveform in progress and hold the present level."""
+        if self._waveform is not None:
+            self.poll_waveform()
+            if self._waveform is not None:
+                self.output(self._current_mA)
+
+    def readback(self):
+        """Output current as reported by the device (mA)."""
+        return self._read_output()
+
     def ramp_to(self, target_mA: float, seconds: float):
-        """Ramp linearly to target over `seconds` to avoid abrupt steps."""
+        """Ramp linearly to target over `seconds` to avoid abrupt steps.
+        Blocks for the whole ramp; see RampScheduler for a non-blocking ramp."""
         if seconds <= 0:
             self.current_mA = float(target_mA)
             return
+        if self.supports_waveforms:
+            self.send_waveform(*self.compile_ramp(target_mA, seconds))
+            while self.poll_waveform():
+                self.clock.sleep(0.1)
+            return
         steps = max(1, int(seconds * 10))
         start = self.current_mA
         for i in range(1, steps+1):
             self.current_mA = start + (target_mA - start) * (i/steps)
-            self._apply_output(self.current_mA)
-            time.sleep(seconds/steps)
+            self.output(self.current_mA)
+            self.clock.sleep(seconds/steps)
 
-    def start(self): self.is_on = True
+    def start(self):
+        self._accumulate_charge()
+        self.is_on = True
     def stop(self): 
+        self._accumulate_charge()
         self.is_on = False
-        self._apply_output(0.0)
+        self.output(0.0)
         self.current_mA = 0.0
 
     def _apply_output(self, mA: float):
         """Override in subclass to send command to hardware."""
         pass
 
+    def _apply_waveform(self, t, mA):
+        """Override in subclasses with supports_waveforms = True."""
+        raise NotImplementedError
+
+    def _read_output(self):
+        """Override to query the device; the base class reports the commanded level."""
+        return self._current_mA
+
 class MockStimulator(StimulatorAPI):
-    def __init__(self, log_fn=print):
-        super().__init__()
+    supports_waveforms = True
+
+    def __init__(self, log_fn=print, clock=None):
+        super().__init__(clock=clock)
         self.log = log_fn
 
     def connect(self):
@@ -55,4 +164,10 @@ class MockStimulator(StimulatorAPI):
         if self.is_on:
             self.log(f"[MockStim] output => {mA:.3f} mA ({self.polarity})")
         else:
-            self.log(f"[MockStim] (standby) => {mA:.3f} mA")        
+            self.log(f"[MockStim] (standby) => {mA:.3f} mA")
+
+    def _apply_waveform(self, t, mA):
+        state = self.polarity if self.is_on else 'standby'
+        self.log(f"[MockStim] waveform => {len(t)} setpoints {self.current_mA:.3f} -> {mA[-1]:.3f} mA "
+                 f"over {t[-1]:.1f} s ({state})")
+        return {'ok': True, 'n': len(t)}
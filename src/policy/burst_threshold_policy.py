@@ -1,5 +1,5 @@
 
-import time
+from ..utils.clock import WallClock
 
 class BurstThresholdPolicy:
     """Threshold/State-based controller driven by beta-burst detection.
@@ -7,7 +7,7 @@ class BurstThresholdPolicy:
     - In prolonged quiet: after quiet_sec with no active burst, propose a small downward step (-step_down_mA).
     SafetyManager will clamp/ramp and enforce change intervals.
     """
-    def __init__(self, step_up_mA=0.10, step_down_mA=0.05, cooldown_sec=60, quiet_sec=120, log_fn=print):
+    def __init__(self, step_up_mA=0.10, step_down_mA=0.05, cooldown_sec=60, quiet_sec=120, log_fn=print, clock=None):
         self.step_up = float(step_up_mA)
         self.step_down = float(step_down_mA)
         self.cooldown = int(cooldown_sec)
@@ -15,9 +15,10 @@ class BurstThresholdPolicy:
         self._last_up_ts = 0.0
         self._last_any_burst_ts = 0.0
         self.log = log_fn
+        self.clock = clock if clock is not None else WallClock()
 
     def propose_delta(self, burst_event, now=None):
-        now = time.time() if now is None else float(now)
+        now = self.clock.now() if now is None else float(now)
         delta = 0.0
 
         if burst_event['just_started']:
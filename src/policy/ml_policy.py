@@ -1,25 +1,103 @@
 
 import numpy as np
 import os
+import re
+
+_WEIGHT_KEY = re.compile(r'[Wb]\d+|x_mean|x_std')
 
 class MLPolicy:
-    """Pure NumPy MLP inference stub.
-    Expects a weights file (npz) with keys: W1,b1,W2,b2
+    """Pure NumPy MLP inference.
+    Weights: an npz file (only the arrays named below are read from it), or a directory
+    of .npy files (memory-mapped), with keys W1,b1, W2,b2, ... Wn,bn (any depth; ReLU
+    between layers, linear output) and optional input normalization x_mean, x_std
+    (a zero std leaves that input unscaled).
     Input: feature vector [beta_power, alpha_power, beta/alpha, ...]
     Output: recommended absolute mA (not delta) which will be clamped by SafetyManager.
+
+    Weights are converted once to contiguous float32; normalization is folded into
+    the first layer, and activations go into preallocated buffers, so inference
+    allocates nothing per call.
     """
     def __init__(self, weights_path):
         if not os.path.exists(weights_path):
             raise FileNotFoundError(f"Weights not found: {weights_path}")
-        d = np.load(weights_path, allow_pickle=False)
-        self.W1, self.b1 = d['W1'], d['b1']
-        self.W2, self.b2 = d['W2'], d['b2']
+        d = _load_arrays(weights_path)
+        self.W, self.b = [], []
+        i = 1
+        while f'W{i}' in d:
+            self.W.append(np.ascontiguousarray(d[f'W{i}'], dtype=np.float32))
+            self.b.append(np.ascontiguousarray(np.ravel(d[f'b{i}']), dtype=np.float32))
+            i += 1
+        if not self.W:
+            raise ValueError(f"No layers (W1, b1, ...) in {weights_path}")
+        for k, (W, b) in enumerate(zip(self.W, self.b)):
+            if W.ndim != 2 or b.shape != (W.shape[1],) or (k and W.shape[0] != self.W[k-1].shape[1]):
+                raise ValueError(f"Layer {k+1} shape mismatch: W{W.shape} b{b.shape}")
+        self.n_features = self.W[0].shape[0]
+        self.n_outputs = self.W[-1].shape[1]
+        if 'x_mean' in d or 'x_std' in d:
+            mean = np.ravel(d['x_mean']).astype(np.float64) if 'x_mean' in d else np.zeros(self.n_features)
+            std = np.ravel(d['x_std']).astype(np.float64) if 'x_std' in d else np.ones(self.n_features)
+            std = np.where(std > 0, std, 1.0)  # a constant training input: nothing to scale
+            # (x - mean) / std @ W1 + b1  ==  x @ (W1 / std) + (b1 - (mean / std) @ W1)
+            W1 = self.W[0].astype(np.float64)
+            self.b[0] = (self.b[0] - (mean / std) @ W1).astype(np.float32)
+            self.W[0] = np.ascontiguousarray(W1 / std[:, None], dtype=np.float32)
+        # Single-sample path: bias folded in as an extra input row, every buffer ends in a
+        # constant 1, so each layer is a single dot (+ in-place ReLU).
+        self._Wa = [np.ascontiguousarray(np.vstack([W, b]), dtype=np.float32) for W, b in zip(self.W, self.b)]
+        self._x = np.ones(self.n_features + 1, dtype=np.float32)
+        self._h = [np.ones(W.shape[1] + 1, dtype=np.float32) for W in self.W[:-1]]
+        self._y = np.zeros(self.n_outputs, dtype=np.float32)
+        self._batch = None  # (capacity, x buffer, activation buffers)
 
-    @staticmethod
-    def _relu(x): return np.maximum(0, x)
+    # Backwards-compatible names for the 2-layer case
+    @property
+    def W1(self): return self.W[0]
+    @property
+    def b1(self): return self.b[0]
+    @property
+    def W2(self): return self.W[1]
+    @property
+    def b2(self): return self.b[1]
 
     def predict_mA(self, features):
-        x = np.asarray(features, dtype=float).reshape(1, -1)
-        h = self._relu(x @ self.W1 + self.b1)
-        y = h @ self.W2 + self.b2
-        return float(y.ravel()[0])
+        x = self._x
+        x[:-1] = features
+        for Wa, h in zip(self._Wa, self._h):
+            np.dot(x, Wa, out=h[:-1])
+            np.maximum(h, 0.0, out=h)
+            x = h
+        np.dot(x, self._Wa[-1], out=self._y)
+        return float(self._y[0])
+
+    def predict_batch(self, features):
+        """features: [n_sessions, n_features] -> [n_sessions] mA.
+        The result is a view of an internal buffer, overwritten by the next call."""
+        features = np.asarray(features)
+        n = features.shape[0]
+        if self._batch is None or self._batch[0] < n:
+            cap = max(n, 2 * self._batch[0] if self._batch else 1)
+            self._batch = (cap, np.zeros((cap, self.n_features), dtype=np.float32),
+                           [np.zeros((cap, W.shape[1]), dtype=np.float32) for W in self.W])
+        _, xb, hb = self._batch
+        x = xb[:n]
+        x[:] = features
+        last = len(self.W) - 1
+        for k, (W, b, h) in enumerate(zip(self.W, self.b, hb)):
+            h = h[:n]
+            np.matmul(x, W, out=h)
+            np.add(h, b, out=h)
+            if k < last:
+                np.maximum(h, 0.0, out=h)
+            x = h
+        return x[:, 0]
+
+def _load_arrays(path):
+    """.npy files in a directory are memory-mapped. NumPy cannot memory-map inside an npz
+    (a zip), so from one only the weight and normalization arrays are read."""
+    if os.path.isdir(path):
+        return {os.path.splitext(f)[0]: np.load(os.path.join(path, f), mmap_mode='r')
+                for f in os.listdir(path) if f.endswith('.npy')}
+    with np.load(path, allow_pickle=False) as npz:
+        return {k: npz[k] for k in npz.files if _WEIGHT_KEY.fullmatch(k)}
@@ -1,14 +1,15 @@
 
-import time
-from collections import deque
 import math
+import numpy as np
+from ..utils.clock import WallClock
 
 class BetaBurstDetector:
     """Detects beta 'bursts' on a streaming beta-power scalar.
     Uses an EWMA/EWMSD baseline and a z-threshold with hysteresis and min duration.
     This avoids requiring SciPy filters while giving a robust event detector.
     """
-    def __init__(self, ema_alpha=0.05, z_thresh=2.0, hysteresis=0.5, min_duration_sec=2.0):
+    def __init__(self, ema_alpha=0.05, z_thresh=2.0, hysteresis=0.5, min_duration_sec=2.0, clock=None):
+        self.clock = clock if clock is not None else WallClock()
         self.ema_alpha = float(ema_alpha)
         self.z_thresh = float(z_thresh)
         self.hysteresis = float(hysteresis)
@@ -41,7 +42,7 @@ class BetaBurstDetector:
           'baseline': float           # EWMA baseline
         }
         """
-        now = time.time() if timestamp is None else float(timestamp)
+        now = self.clock.now() if timestamp is None else float(timestamp)
         self._update_ew(float(beta_value))
         sigma = math.sqrt(max(1e-12, self.var))
         z = 0.0 if sigma == 0.0 else (beta_value - self.mu) / sigma
@@ -78,3 +79,154 @@ class BetaBurstDetector:
             'z_score': z,
             'baseline': self.mu
         }
+
+    def detect_batch(self, values, timestamps):
+        """Whole-recording detection with this detector's parameters (state is not touched).
+        See detect_bursts_batch."""
+        return detect_bursts_batch(values, timestamps, self.ema_alpha, self.z_thresh,
+                                   self.hysteresis, self.min_duration_sec)
+
+def _linear_scan(u, c, y0, block=256):
+    """y_t = c * y_{t-1} + u_t along the last axis of u [m, n], with y_{-1} = y0 [m].
+    Evaluated block by block as a lower-triangular matmul, so every step is vectorized
+    and only powers c**k <= 1 appear (numerically stable).
+    """
+    m, n = u.shape
+    out = np.empty_like(u)
+    L = max(1, min(block, n))
+    k = np.arange(L)
+    e = k[:, None] - k[None, :]
+    T = np.where(e >= 0, c ** np.maximum(e, 0), 0.0)   # T[i, j] = c**(i-j), i >= j
+    P = c ** (k + 1)
+    y = np.asarray(y0, dtype=float)
+    for b in range(0, n, L):
+        ub = u[:, b:b+L]
+        l = ub.shape[1]
+        yb = ub @ T[:l, :l].T + y[:, None] * P[:l]
+        out[:, b:b+l] = yb
+        y = yb[:, -1]
+    return out
+
+def ewma(values, alpha):
+    """Exponentially weighted moving average along the last axis of `values` ([n] or
+    [m, n]), seeded with the first value: y_0 = x_0, y_t = alpha x_t + (1 - alpha) y_{t-1}
+    (the streaming `utils.signal.ema` recursion, vectorized)."""
+    x = np.asarray(values, dtype=float)
+    rows = np.atleast_2d(x)
+    y = rows.copy()
+    if rows.shape[1] > 1:
+        a = float(alpha)
+        y[:, 1:] = _linear_scan(a * rows[:, 1:], 1.0 - a, rows[:, 0])
+    return y.reshape(x.shape)
+
+def ew_zscores(values, ema_alpha):
+    """EWMA baseline and z-scores for rows of `values` [m, n], identical in definition to
+    BetaBurstDetector.update (equal up to float rounding). Returns (z, mu)."""
+    x = np.atleast_2d(np.asarray(values, dtype=float))
+    a = float(ema_alpha)
+    c = 1.0 - a
+    mu = ewma(x, a)
+    var = np.zeros_like(x)
+    if x.shape[1] > 1:
+        d = x[:, 1:] - mu[:, :-1]  # x_t - mu_{t-1}
+        var[:, 1:] = _linear_scan(a * c * c * d * d, c, np.zeros(len(x)))
+    sigma = np.sqrt(np.maximum(1e-12, var))
+    return (x - mu) / sigma, mu
+
+def _next_true(mask):
+    """For every i, the smallest j >= i with mask[j] (len(mask) if none)."""
+    n = len(mask)
+    idx = np.where(mask, np.arange(n), n)
+    return np.minimum.accumulate(idx[::-1])[::-1]
+
+def _first_sustained(t, s, e, min_duration_sec):
+    """For runs [s, e): first k with t[k] - t[s] >= min_duration_sec (e if none).
+    Located with searchsorted, then nudged onto the exact float predicate the streaming
+    detector evaluates (t must be non-decreasing)."""
+    last = len(t) - 1
+    k = np.clip(np.searchsorted(t, t[s] + min_duration_sec, side='left'), s, e)
+    while True:
+        back = (k > s) & ((t[np.maximum(k - 1, 0)] - t[s]) >= min_duration_sec)
+        if not back.any():
+            break
+        k = k - back
+    while True:
+        fwd = (k < e) & ~((t[np.minimum(k, last)] - t[s]) >= min_duration_sec)
+        if not fwd.any():
+            break
+        k = k + fwd
+    return k
+
+def _burst_events(z, t, z_thresh, hysteresis, min_duration_sec):
+    """Hysteresis / min-duration state machine of BetaBurstDetector over a whole z series.
+    Candidate onsets are found for all above-threshold runs at once; the Python loop
+    only steps from burst to burst. Returns (onsets, offsets) index arrays."""
+    n = len(z)
+    lo = z_thresh - hysteresis
+    above = z >= z_thresh
+    nxt_not_above = _next_true(~above)
+    nxt_below = _next_true(z <= lo)
+    starts = np.flatnonzero(above & ~np.concatenate(([False], above[:-1])))
+    ends = nxt_not_above[starts]
+    ks = _first_sustained(t, starts, ends, min_duration_sec)
+    ok = ks < ends
+    q_start, q_onset = starts[ok], ks[ok]
+    onsets, offsets = [], []
+    pos = 0
+    while pos < n:
+        if pos > 0 and above[pos] and above[pos - 1]:
+            # burst ended inside an above-threshold run (hysteresis <= 0): timing restarts here
+            e = nxt_not_above[pos]
+            k = _first_sustained(t, np.array([pos]), np.array([e]), min_duration_sec)[0]
+            if k >= e:
+                pos = e
+                continue
+        else:
+            r = np.searchsorted(q_start, pos)
+            if r >= len(q_start):
+                break
+            k = q_onset[r]
+        onsets.append(k)
+        j = nxt_below[k + 1] if k + 1 < n else n  # end is checked from the next sample on
+        if j >= n:
+            break
+        offsets.append(j)
+        pos = j + 1
+    return np.asarray(onsets, dtype=np.int64), np.asarray(offsets, dtype=np.int64)
+
+def detect_bursts_batch(values, timestamps, ema_alpha=0.05, z_thresh=2.0, hysteresis=0.5,
+                        min_duration_sec=2.0):
+    """Offline equivalent of feeding BetaBurstDetector.update() sample by sample.
+    values: [n] or [n_configs, n] beta values; timestamps: [n] non-decreasing seconds.
+    ema_alpha / z_thresh / hysteresis / min_duration_sec: scalars or [n_configs] arrays
+    (a threshold grid). z-scores are computed once per distinct (values row, ema_alpha).
+    Returns dict with 'z_score', 'baseline', 'active' ([n_configs, n]) and per-config
+    'onsets' / 'offsets' index arrays (a burst still active at the end has no offset).
+    """
+    vals = np.atleast_2d(np.asarray(values, dtype=float))
+    t = np.asarray(timestamps, dtype=float)
+    params = np.broadcast_arrays(np.asarray(ema_alpha, dtype=float), np.asarray(z_thresh, dtype=float),
+                                 np.asarray(hysteresis, dtype=float), np.asarray(min_duration_sec, dtype=float))
+    n_cfg = max(len(vals), max(p.size for p in params))
+    alpha, zt, hy, md = (np.broadcast_to(p.ravel() if p.ndim else p, (n_cfg,)) for p in params)
+    rows = np.broadcast_to(np.arange(len(vals)), (n_cfg,))
+    n = vals.shape[1]
+    z = np.empty((n_cfg, n))
+    mu = np.empty((n_cfg, n))
+    cache = {}
+    for i in range(n_cfg):
+        key = (int(rows[i]), float(alpha[i]))
+        if key not in cache:
+            cache[key] = ew_zscores(vals[rows[i]], alpha[i])
+        z[i], mu[i] = cache[key][0][0], cache[key][1][0]
+    active = np.zeros((n_cfg, n), dtype=bool)
+    onsets, offsets = [], []
+    for i in range(n_cfg):
+        on, off = _burst_events(z[i], t, zt[i], hy[i], md[i])
+        onsets.append(on)
+        offsets.append(off)
+        edges = np.zeros(n + 1, dtype=np.int64)
+        np.add.at(edges, on, 1)
+        np.add.at(edges, off, -1)
+        active[i] = np.cumsum(edges[:n]) > 0
+    return {'z_score': z, 'baseline': mu, 'active': active, 'onsets': onsets, 'offsets': offsets}
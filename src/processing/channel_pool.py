@@ -0,0 +1,47 @@
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+
+from .spectral import SpectralEngine
+from ..utils.shm_ring import SharedRing
+
+# Per-worker state, set by _init_worker
+_ring = None
+_engine = None
+
+def _init_worker(spec, fs, bands, detrend):
+    global _ring, _engine
+    _ring = SharedRing.attach(spec)
+    _engine = SpectralEngine(fs, bands, detrend=detrend)
+
+def _group_bandpowers(lo, hi, start, n):
+    # Reads straight out of shared memory; only the small [channels, bands] result is pickled
+    bp = _engine.bandpowers(_ring.view(start, n)[lo:hi])
+    if not _ring.intact(start):
+        raise RuntimeError("Window overwritten while computing band powers.")
+    return bp
+
+class ChannelGroupPool:
+    """Band powers of a SharedRing window fanned out over worker processes, one
+    contiguous channel group per task. Workers attach to the ring once and read the
+    window zero-copy, so per-tick traffic is just (start, n) in and band powers out.
+    Results equal SpectralEngine.bandpowers on the same window.
+    """
+    def __init__(self, ring_spec, fs, bands, detrend=True, window_samples=None, n_workers=2):
+        self.window = window_samples
+        n_channels = ring_spec[1]
+        self.n_workers = max(1, int(n_workers))
+        edges = np.linspace(0, n_channels, self.n_workers + 1).astype(int)
+        self.groups = [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+        self.pool = ProcessPoolExecutor(self.n_workers, mp_context=mp.get_context('spawn'),
+                                        initializer=_init_worker, initargs=(ring_spec, fs, bands, detrend))
+
+    def bandpowers(self, end, n=None):
+        """Band powers [n_channels, n_bands] of samples [end - n, end) (n defaults to the window)."""
+        n = min(self.window if n is None else n, end)
+        futs = [self.pool.submit(_group_bandpowers, lo, hi, end - n, n) for lo, hi in self.groups]
+        return np.concatenate([f.result() for f in futs], axis=0)
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
@@ -1,27 +1,93 @@
 
-import numpy as np
-from ..utils.signal import welch_bandpower, ema
+from ..utils.signal import ema
+from .spectral import SpectralEngine, SlidingWelch, SlidingDFT, sliding_welch_grid
 
 class EEGPipeline:
-    def __init__(self, fs, bands, detrend=True, chunk_sec=1.0, smoothing=0.3):
+    def __init__(self, fs, bands, detrend=True, chunk_sec=1.0, smoothing=0.3,
+                 window_sec=None, hop_sec=None, feature_backend='welch'):
         self.fs = fs
         self.bands = bands
         self.detrend = detrend
         self.chunk_sec = chunk_sec
         self.smoothing = smoothing
+        # Streaming mode: chunks are `hop_sec` of new samples, features cover `window_sec`
+        self.hop_sec = hop_sec
+        self.window_sec = window_sec if window_sec is not None else chunk_sec
+        # 'welch': (sliding) Welch PSD; 'sdft': recursive sliding DFT on band bins only
+        if feature_backend not in ('welch', 'sdft'):
+            raise ValueError(f"Unknown feature_backend: {feature_backend}")
+        self.feature_backend = feature_backend
+        self.spectral = SpectralEngine(fs, bands, detrend=detrend)
+        self.sliding = None
+        if hop_sec is not None and feature_backend == 'welch':
+            # fail at construction on a hop the segment grid cannot follow; until the
+            # first window has filled, the buffered samples get the same segment plan
+            _, _, nperseg, step, _ = sliding_welch_grid(fs, self.window_sec, hop_sec)
+            self._warmup = SpectralEngine(fs, bands, detrend=detrend, nperseg=nperseg, noverlap=nperseg - step)
         self._ema_beta = None
+        self.last_bandpowers = None  # [n_channels, n_bands] behind the latest features
+        self.last_window = None      # [..., n_channels, n_samples] the latest band powers cover
+        self._spectrum_src = self.spectral
 
     def features(self, chunk):
         """chunk: ndarray [n_channels, n_samples]
         returns dict with bandpowers averaged across channels
+        In streaming mode (hop_sec set) chunk holds only the newest samples.
         """
-        n_channels, n_samples = chunk.shape
-        feats = {}
-        for band_name, (fmin, fmax) in self.bands.items():
-            vals = []
-            for ch in range(n_channels):
-                vals.append(welch_bandpower(chunk[ch], self.fs, fmin, fmax, detrend=self.detrend))
-            feats[f"{band_name}_power"] = float(np.mean(vals))
+        return self.features_from_bandpowers(self.bandpowers(chunk))
+
+    def bandpowers(self, chunk):
+        """chunk: [..., n_channels, n_samples] -> per-channel band powers [..., n_channels, n_bands].
+        Leading axes (e.g. sessions) are processed in the same batched pass."""
+        if self.hop_sec is None and self.feature_backend == 'welch':
+            self._spectrum_src = self.spectral
+            self.last_window = chunk
+            return self.spectral.bandpowers(chunk)
+        lead = chunk.shape[:-1]
+        flat = chunk.reshape(-1, chunk.shape[-1])
+        if self.feature_backend == 'sdft':
+            if self.sliding is None:
+                self.sliding = SlidingDFT(self.fs, self.bands, flat.shape[0], self.window_sec,
+                                          detrend=self.detrend)
+            bp = self.sliding.push(flat)
+            self._spectrum_src = self.sliding
+            if bp is None:
+                # warm-up: a Hann periodogram of what has been buffered, not a zero-filled window
+                bp = self.spectral.bandpowers(self.sliding.ring.latest(len(self.sliding.ring)))
+                self._spectrum_src = self.spectral
+            self._keep_window(lead)
+            return bp.reshape(lead + bp.shape[-1:])
+        if self.sliding is None:
+            self.sliding = SlidingWelch(self.fs, self.bands, flat.shape[0], self.window_sec,
+                                        self.hop_sec, detrend=self.detrend)
+        bp = self.sliding.push(flat)
+        self._spectrum_src = self.sliding
+        if bp is None:
+            # warm-up: the window has not filled yet, use what has been buffered
+            bp = self._warmup.bandpowers(self.sliding.ring.latest(len(self.sliding.ring)))
+            self._spectrum_src = self._warmup
+        self._keep_window(lead)
+        return bp.reshape(lead + bp.shape[-1:])
+
+    def _keep_window(self, lead):
+        ring = self.sliding.ring
+        self.last_window = ring.latest(len(ring)).reshape(lead + (-1,))
+
+    @property
+    def last_spectrum(self):
+        """(freqs, psd [..., n_channels, n_freqs]) behind the latest band powers (shared, not
+        recomputed), or (None, None) with SlidingDFT, which only tracks the band bins."""
+        if self._spectrum_src is self.sliding and self.feature_backend == 'sdft':
+            return None, None
+        return self._spectrum_src.last_freqs, self._spectrum_src.last_psd
+
+    def features_from_bandpowers(self, bp, good=None):
+        """bp: per-channel band powers [n_channels, n_bands] in `self.bands` order.
+        good: optional channel mask; averages skip masked channels (all channels if none is good).
+        Standalone use only; a ClosedLoopSession computes its features with its FeatureGraph."""
+        self.last_bandpowers = bp
+        means = (bp[good] if good is not None and good.any() else bp).mean(axis=0)
+        feats = {f"{name}_power": float(means[j]) for j, name in enumerate(self.spectral.band_names)}
         # Smooth one key marker (beta) for control stability
         beta = feats.get("beta_power", 0.0)
         feats["beta_power_smooth"] = ema(self._ema_beta, beta, self.smoothing)
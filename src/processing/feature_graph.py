@@ -0,0 +1,169 @@
+
+"""Declarative feature graph over per-channel band powers.
+
+Leaves are the configured bands: `beta` is the per-channel beta power [n_channels] of
+the current tick. Nodes (config `features.nodes`) derive further features:
+
+    beta_left:  {op: mean, input: beta, group: motor_left}    # channel-group average
+    beta_rel:   {op: relative, band: beta}                    # beta / sum of all bands, per channel
+    rel_mean:   {op: mean, input: beta_rel}                   # average over all channels
+    rel_smooth: {op: ema, input: rel_mean, alpha: 0.2}        # smoothed across ticks
+    lr_ratio:   {op: ratio, inputs: [beta_left, beta_right]}
+
+Built-in nodes `<band>_power` (channel mean), `beta_power_smooth` and `beta_alpha_ratio`
+reproduce the classic features. Means skip channels masked by the signal-quality gate.
+Only the requested outputs and what they depend on are evaluated, each once per tick
+(shared intermediates such as band sums included), and the outputs are written to a
+preallocated vector at fixed slots.
+"""
+import numpy as np
+
+OPS = ('mean', 'relative', 'ratio', 'ema', 'sum')
+
+def default_nodes(band_names, smoothing=0.3):
+    nodes = {f"{b}_power": {'op': 'mean', 'input': b} for b in band_names}
+    if 'beta' in band_names:
+        nodes['beta_power_smooth'] = {'op': 'ema', 'input': 'beta_power', 'alpha': smoothing}
+        if 'alpha' in band_names:
+            nodes['beta_alpha_ratio'] = {'op': 'ratio', 'inputs': ['beta_power_smooth', 'alpha_power']}
+    return nodes
+
+class FeatureGraph:
+    """Evaluates `outputs` from per-channel band powers [n_channels, n_bands] each tick.
+    `values` is the output vector (reused across ticks); `slots[name]` is the slice a
+    feature occupies in it (1 entry for scalars, n_channels for per-channel features).
+    """
+    def __init__(self, band_names, n_channels, outputs, nodes=None, groups=None, smoothing=0.3):
+        self.band_names = list(band_names)
+        self.n_channels = int(n_channels)
+        self.groups = dict(groups or {})
+        self.specs = default_nodes(self.band_names, smoothing)
+        self.specs.update(nodes or {})
+        self._size = {b: self.n_channels for b in self.band_names}
+        self._done = set(self.band_names)
+        self.plan = []          # (name, fn(memo) -> value), in dependency order
+        self._ema = {}
+        used = set(outputs)
+        for name in outputs:
+            used.update(self._resolve(name, ()))
+        # band columns actually read (by index), so unused bands are never touched
+        self.leaves = [(j, b) for j, b in enumerate(self.band_names) if b in used]
+        self.slots = {}
+        n = 0
+        for name in dict.fromkeys(outputs):
+            self.slots[name] = slice(n, n + self._size[name])
+            n += self._size[name]
+        self.values = np.zeros(n)
+        self._memo = {}
+
+    # --- graph construction ---
+
+    def _resolve(self, name, path):
+        """Add `name` and its dependencies to the plan; returns every node it reads."""
+        if name in self._done:
+            return {name}
+        if name in path:
+            raise ValueError(f"Feature graph cycle: {' -> '.join(path + (name,))}")
+        spec = self.specs.get(name)
+        if spec is None:
+            raise ValueError(f"Unknown feature {name!r} (bands: {self.band_names}, nodes: {sorted(self.specs)})")
+        op = spec.get('op')
+        if op not in OPS:
+            raise ValueError(f"Feature {name!r}: unknown op {op!r} (one of {OPS}).")
+        deps = self._inputs(name, spec)
+        used = {name}
+        for d in deps:
+            used |= self._resolve(d, path + (name,))
+        fn, size = getattr(self, f"_op_{op}")(name, spec, deps)
+        self._size[name] = size
+        self._done.add(name)
+        self.plan.append((name, fn))
+        return used
+
+    def _inputs(self, name, spec):
+        op = spec['op']
+        if op == 'relative':
+            over = tuple(spec.get('over') or self.band_names)
+            total = f"_sum:{'+'.join(over)}"
+            self.specs.setdefault(total, {'op': 'sum', 'bands': list(over)})
+            return [spec['band'], total]
+        if op == 'sum':
+            return list(spec['bands'])
+        if op == 'ratio':
+            if len(spec.get('inputs', ())) != 2:
+                raise ValueError(f"Feature {name!r}: ratio needs inputs: [numerator, denominator].")
+            return list(spec['inputs'])
+        return [spec['input']]
+
+    def _op_mean(self, name, spec, deps):
+        src = deps[0]
+        channels = spec.get('channels')
+        if 'group' in spec:
+            if spec['group'] not in self.groups:
+                raise ValueError(f"Feature {name!r}: unknown channel group {spec['group']!r}.")
+            channels = self.groups[spec['group']]
+        per_channel = self._size[src] == self.n_channels
+        if channels is None:
+            idx = None
+        else:
+            idx = np.asarray(channels, dtype=np.intp)
+            if not per_channel or idx.min() < 0 or idx.max() >= self.n_channels:
+                raise ValueError(f"Feature {name!r}: channels {list(channels)} do not index a per-channel input.")
+        def fn(m):
+            x, good = m[src], m['_good'] if per_channel else None
+            if idx is not None:
+                x, good = x[idx], good[idx] if good is not None else None
+            # masked channels are skipped, unless that would leave none
+            return float((x[good] if good is not None and good.any() else x).mean())
+        return fn, 1
+
+    def _op_sum(self, name, spec, deps):
+        return (lambda m: sum(m[b] for b in deps)), self.n_channels
+
+    def _op_relative(self, name, spec, deps):
+        band, total = deps
+        return (lambda m: m[band] / np.maximum(1e-12, m[total])), self.n_channels
+
+    def _op_ratio(self, name, spec, deps):
+        a, b = deps
+        return (lambda m: m[a] / np.maximum(1e-6, m[b])), max(self._size[a], self._size[b])
+
+    def _op_ema(self, name, spec, deps):
+        src, alpha = deps[0], float(spec.get('alpha', 0.3))
+        def fn(m):
+            prev = self._ema.get(name)
+            x = m[src]
+            if prev is None:
+                self._ema[name] = x.copy() if isinstance(x, np.ndarray) else x
+            else:
+                self._ema[name] = alpha * x + (1 - alpha) * prev
+            return self._ema[name]
+        return fn, self._size[src]
+
+    # --- per tick ---
+
+    def evaluate(self, bandpowers, good=None):
+        """bandpowers: [n_channels, n_bands] in band order; good: optional channel mask that
+        means leave out. Returns `values`."""
+        memo = self._memo
+        memo.clear()
+        memo['_good'] = None if good is None or good.all() else good
+        for j, b in self.leaves:
+            memo[b] = bandpowers[:, j]
+        for name, fn in self.plan:
+            memo[name] = fn(memo)
+        for name, sl in self.slots.items():
+            self.values[sl] = memo[name]
+        return self.values
+
+    def is_scalar(self, name):
+        """True for a single-value output (channel means, ratios of means, ...)."""
+        return self._size[name] == 1
+
+    def value(self, name):
+        """Latest value of an output: float for scalars, else a view of `values`."""
+        v = self.values[self.slots[name]]
+        return float(v[0]) if v.size == 1 and self._size[name] == 1 else v
+
+    def reset(self):
+        self._ema.clear()
@@ -0,0 +1,175 @@
+
+"""Streaming preprocessing ahead of EEGPipeline: line-noise notch, Butterworth
+bandpass and polyphase decimation, with state carried across chunks.
+
+Filters are designed here in NumPy (no SciPy) as second-order sections
+[b0, b1, b2, a0, a1, a2]. The whole cascade is fused into one state-space system and
+run block by block: for a block of L samples
+    y = T x + O s,        s' = A^L s + K x
+with T the lower-triangular impulse-response (Toeplitz) matrix, so every block is a
+couple of matmuls over all channels at once instead of a per-sample Python loop.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def notch_sos(f0, fs, q=30.0):
+    """Second-order IIR notch at f0 Hz (-3 dB width f0 / q)."""
+    w0 = 2 * np.pi * f0 / fs
+    alpha = np.sin(w0) / (2 * q)
+    c = np.cos(w0)
+    sos = np.array([[1.0, -2 * c, 1.0, 1 + alpha, -2 * c, 1 - alpha]])
+    return sos / sos[:, 3:4]
+
+def butter_bandpass_sos(lo, hi, fs, order=4):
+    """Butterworth bandpass (order per edge, so 2*order poles) as `order` sections,
+    via the analog prototype, lowpass->bandpass transform and bilinear transform."""
+    if not 0 < lo < hi < fs / 2:
+        raise ValueError(f"Bandpass edges must satisfy 0 < lo < hi < fs/2, got {lo}, {hi}.")
+    k = 2 * fs
+    wl, wh = k * np.tan(np.pi * lo / fs), k * np.tan(np.pi * hi / fs)  # prewarped
+    bw, w0 = wh - wl, np.sqrt(wl * wh)
+    proto = np.exp(1j * np.pi * (2 * np.arange(1, order + 1) + order - 1) / (2 * order))
+    d = np.sqrt((proto * bw) ** 2 - 4 * w0 ** 2 + 0j)
+    s = np.concatenate([(proto * bw + d) / 2, (proto * bw - d) / 2])
+    z = (k + s) / (k - s)
+    # Conjugate pairs -> one section each; real poles are paired with each other
+    upper = z[z.imag > 1e-12]
+    real = np.sort(z[np.abs(z.imag) <= 1e-12].real)
+    denoms = [[1.0, -2 * p.real, abs(p) ** 2] for p in upper]
+    denoms += [[1.0, -(a + b), a * b] for a, b in zip(real[::2], real[1::2])]
+    sos = np.array([[1.0, 0.0, -1.0] + den for den in denoms])  # zeros at z = +1 and -1
+    # Unit gain at the (digital) center frequency
+    wc = 2 * np.arctan(w0 / k)
+    zc = np.exp(-1j * wc * np.arange(3))
+    gain = np.prod([abs(sec[:3] @ zc) / abs(sec[3:] @ zc) for sec in sos])
+    sos[0, :3] /= gain
+    return sos
+
+def fir_lowpass(numtaps, cutoff, fs):
+    """Hamming-windowed sinc lowpass, unit DC gain."""
+    n = np.arange(numtaps) - (numtaps - 1) / 2
+    h = np.sinc(2 * cutoff / fs * n) * np.hamming(numtaps)
+    return h / h.sum()
+
+def _sos_state_space(sos):
+    """Cascade of transposed direct-form II biquads -> one (A, B, C, D) system."""
+    A = np.zeros((0, 0)); B = np.zeros(0); C = np.zeros(0); D = 1.0
+    for b0, b1, b2, _, a1, a2 in sos:
+        As = np.array([[-a1, 1.0], [-a2, 0.0]])
+        Bs = np.array([b1 - a1 * b0, b2 - a2 * b0])
+        Cs = np.array([1.0, 0.0])
+        n = len(B)
+        # series: previous output feeds this section
+        A = np.block([[A, np.zeros((n, 2))], [np.outer(Bs, C), As]])
+        B = np.concatenate([B, Bs * D])
+        C = np.concatenate([b0 * C, Cs])
+        D = b0 * D
+    return A, B, C, D
+
+class SOSFilter:
+    """Stateful cascade of second-order sections applied to [n_channels, n] chunks.
+    Output equals filtering the concatenated stream sample by sample (no chunk-edge
+    transients). The first sample initialises the state to the steady state for a
+    constant input, like lfilter_zi.
+    """
+    def __init__(self, sos, n_channels, block=64):
+        self.sos = np.atleast_2d(np.asarray(sos, dtype=float))
+        A, B, C, D = _sos_state_space(self.sos)
+        self.n_state = len(B)
+        L = self.block = int(block)
+        powers = [np.eye(self.n_state)]
+        for _ in range(L):
+            powers.append(A @ powers[-1])
+        h = np.array([D] + [C @ powers[m] @ B for m in range(L - 1)])  # Markov parameters
+        i, j = np.indices((L, L))
+        self._T = np.where(i >= j, h[np.clip(i - j, 0, L - 1)], 0.0)          # [L, L]
+        self._O = np.array([C @ powers[k] for k in range(L)])                  # [L, n_state]
+        self._K = np.array([powers[L - 1 - k] @ B for k in range(L)]).T        # [n_state, L]
+        self._A = powers                                                       # A^l for partial blocks
+        self._zi = np.linalg.solve(np.eye(self.n_state) - A, B)                # steady state per unit input
+        self.state = None
+        self.n_channels = n_channels
+
+    def reset(self):
+        self.state = None
+
+    def process(self, chunk):
+        x = np.asarray(chunk, dtype=float)
+        if self.state is None:
+            self.state = x[:, :1] * self._zi[None, :]
+        out = np.empty_like(x)
+        L = self.block
+        for b in range(0, x.shape[1], L):
+            xb = x[:, b:b+L]
+            l = xb.shape[1]
+            out[:, b:b+l] = xb @ self._T[:l, :l].T + self.state @ self._O[:l].T
+            self.state = self.state @ self._A[l].T + xb @ self._K[:, L-l:].T
+        return out
+
+class PolyphaseDecimator:
+    """Anti-aliased decimation by an integer factor across chunk boundaries.
+    Only every q-th output of the FIR is computed (the polyphase saving), and the last
+    numtaps-1 input samples are kept so chunk sizes need not be multiples of q.
+    """
+    def __init__(self, q, n_channels, fs, numtaps=None):
+        self.q = int(q)
+        numtaps = numtaps or 20 * self.q + 1
+        # Cutoff a little below the new Nyquist
+        self.h = fir_lowpass(numtaps, 0.8 * fs / (2 * self.q), fs)
+        self._hist = None
+        self._seen = 0
+        self._next = 0  # absolute index of the next input sample that produces an output
+
+    def process(self, chunk):
+        x = np.asarray(chunk, dtype=float)
+        K = len(self.h)
+        if self._hist is None:
+            self._hist = np.repeat(x[:, :1], K - 1, axis=1)  # pad with the first sample
+        buf = np.concatenate([self._hist, x], axis=1)
+        windows = sliding_window_view(buf, K, axis=-1)[:, self._next - self._seen::self.q]
+        y = windows @ self.h[::-1]
+        self._next += y.shape[1] * self.q
+        self._seen += x.shape[1]
+        self._hist = buf[:, -(K - 1):]
+        return y
+
+class Preprocessor:
+    """Notch -> bandpass (one fused SOS cascade) -> decimation, for [n_channels, n] chunks.
+    `fs_out` is the sampling rate of the returned chunks. With `chunk_samples` (the fixed
+    input chunk of a session) it must be a multiple of `decimate`, so every chunk
+    decimates to the same length; a sliding window downstream takes exactly one hop."""
+    def __init__(self, fs, n_channels, notch_hz=None, notch_q=30.0, bandpass=None, order=4, decimate=1,
+                 chunk_samples=None):
+        self.fs = fs
+        sections = []
+        if notch_hz:
+            if notch_hz >= fs / 2:
+                raise ValueError(f"notch_hz={notch_hz} is above Nyquist for fs={fs}.")
+            sections.append(notch_sos(notch_hz, fs, notch_q))
+        if bandpass:
+            sections.append(butter_bandpass_sos(bandpass[0], bandpass[1], fs, order))
+        self.filter = SOSFilter(np.vstack(sections), n_channels) if sections else None
+        self.decimate = q = int(decimate or 1)
+        if chunk_samples is not None and chunk_samples % q:
+            n = int(chunk_samples)
+            near = sorted({max(q, n - n % q), n - n % q + q})
+            raise ValueError(f"{n}-sample chunks cannot be decimated by {q} to a fixed length; use a "
+                             f"hop_sec / chunk_sec of a multiple of {q} samples, e.g. "
+                             + " or ".join(f"{m / fs:g} s" for m in near))
+        self.decimator = PolyphaseDecimator(self.decimate, n_channels, fs) if self.decimate > 1 else None
+        self.fs_out = fs / self.decimate
+
+    def process(self, chunk):
+        if self.filter is not None:
+            chunk = self.filter.process(chunk)
+        if self.decimator is not None:
+            chunk = self.decimator.process(chunk)
+        return chunk
+
+def make_preprocessor(eeg_cfg, n_channels, chunk_samples=None):
+    """Preprocessor from the `eeg` config section, or None when nothing is enabled."""
+    pre = Preprocessor(eeg_cfg['fs'], n_channels, notch_hz=eeg_cfg.get('notch_hz'),
+                       notch_q=eeg_cfg.get('notch_q', 30.0), bandpass=eeg_cfg.get('bandpass'),
+                       order=eeg_cfg.get('filter_order', 4), decimate=eeg_cfg.get('decimate', 1),
+                       chunk_samples=chunk_samples)
+    return pre if (pre.filter is not None or pre.decimator is not None) else None
@@ -0,0 +1,121 @@
+
+"""Per-channel signal-quality gate.
+
+All channels are checked in one vectorized pass per tick:
+  - amplitude range (peak-to-peak): flatline below `flat_uV`, artifact above `max_range_uV`
+  - clipping: share of samples sitting on the channel's own extremes for at least
+    `clip_run` samples in a row (a railed amplifier repeats its limit value; a lone
+    maximum is not clipping), or beyond `clip_uV`
+  - line-noise ratio: power within `line_bw_hz` of `line_hz` over total power (>= 1 Hz)
+  - high-frequency artifact ratio: power above `hf_hz` over total power
+Checks run on the analysis window the band powers cover (not just the newest hop), and
+the spectral checks read the PSD the band-power path already computed (SpectralEngine or
+SlidingWelch `last_psd`), so no second FFT is taken. SlidingDFT only tracks the band
+bins, so with it (and without a spectrum) only the time-domain checks apply.
+Preprocessing hides what the gate looks for (a notch removes the very line noise it
+measures, filters round off rails and steps), so with a preprocessor on, sessions pass
+the raw window to `assess_raw`, which takes its own Welch PSD of it.
+"""
+import math
+import numpy as np
+
+from ..utils.signal import welch_psd
+
+FLAT, RANGE, CLIP, LINE, HF = 1, 2, 4, 8, 16
+FLAG_NAMES = {FLAT: 'flat', RANGE: 'range', CLIP: 'clipped', LINE: 'line', HF: 'hf'}
+
+def describe(flags):
+    """'flat+line' style label for one channel's flag bits."""
+    return '+'.join(name for bit, name in FLAG_NAMES.items() if flags & bit) or 'ok'
+
+class SignalQualityGate:
+    """`assess(chunk, freqs, psd)` -> good-channel mask [..., n_channels]; the per-channel
+    metrics and failure bits of the latest call are kept in `metrics` and `flags`."""
+    def __init__(self, fs, flat_uV=0.5, max_range_uV=500.0, clip_fraction=0.05, clip_uV=None,
+                 clip_run=3, line_hz=50.0, line_bw_hz=1.0, line_ratio_max=0.5, hf_hz=70.0, hf_ratio_max=0.5,
+                 min_good_fraction=0.5):
+        self.fs = fs
+        self.flat_uV = float(flat_uV)
+        self.max_range_uV = float(max_range_uV) if max_range_uV else math.inf
+        self.clip_fraction = float(clip_fraction)
+        self.clip_uV = float(clip_uV) if clip_uV else None
+        self.clip_run = max(2, int(clip_run))
+        self.line_hz = line_hz
+        self.line_bw_hz = float(line_bw_hz)
+        self.line_ratio_max = float(line_ratio_max)
+        self.hf_hz = hf_hz
+        self.hf_ratio_max = float(hf_ratio_max)
+        self.min_good_fraction = float(min_good_fraction)
+        self._weights = {}
+        self.metrics = {}
+        self.flags = None
+
+    def min_good(self, n_channels):
+        """Fewest good channels the loop may act on."""
+        return max(1, math.ceil(self.min_good_fraction * n_channels))
+
+    def _spectral_weights(self, freqs):
+        """[n_freqs, 3] selector for (total, line, hf) power, cached per frequency grid."""
+        key = (len(freqs), float(freqs[0]), float(freqs[-1]))
+        W = self._weights.get(key)
+        if W is None:
+            W = np.zeros((len(freqs), 3))
+            W[:, 0] = freqs >= 1.0
+            if self.line_hz:
+                W[:, 1] = np.abs(freqs - self.line_hz) <= self.line_bw_hz
+            if self.hf_hz:
+                W[:, 2] = freqs >= self.hf_hz
+            self._weights[key] = W
+        return W
+
+    def _railed(self, x, hi, lo, rng):
+        """Per channel: samples in runs of >= clip_run on the channel's own max or min."""
+        k, n = self.clip_run, x.shape[-1]
+        if n < k:
+            return np.zeros(x.shape[:-1], dtype=np.intp)
+        tol = 1e-6 * rng[..., None]
+        at = (x >= hi[..., None] - tol) | (x <= lo[..., None] + tol)
+        run = at[..., k-1:].copy()      # run[i]: samples i .. i+k-1 all on a rail
+        for j in range(1, k):
+            run &= at[..., k-1-j:n-j]
+        covered = np.zeros_like(at)     # every sample inside such a run
+        for j in range(k):
+            covered[..., j:n-k+1+j] |= run
+        return np.count_nonzero(covered, axis=-1)
+
+    def assess(self, chunk, freqs=None, psd=None):
+        """chunk: the analysis window [..., n_channels, n_samples]; freqs / psd: its spectrum
+        [..., n_channels, n_freqs] if there is one."""
+        x = np.asarray(chunk)
+        hi = x.max(axis=-1)
+        lo = x.min(axis=-1)
+        rng = hi - lo
+        flags = np.where(rng < self.flat_uV, FLAT, 0)
+        flags |= np.where(rng > self.max_range_uV, RANGE, 0)
+        railed = self._railed(x, hi, lo, rng)
+        if self.clip_uV is not None:
+            railed = np.maximum(railed, np.count_nonzero(np.abs(x) >= self.clip_uV, axis=-1))
+        clipped = railed / x.shape[-1]
+        flags |= np.where((clipped > self.clip_fraction) & (rng >= self.flat_uV), CLIP, 0)
+        self.metrics = {'range': rng, 'clipped': clipped}
+        if psd is not None and freqs is not None:
+            p = psd @ self._spectral_weights(np.asarray(freqs))
+            total = np.maximum(p[..., 0], 1e-30)
+            line, hf = p[..., 1] / total, p[..., 2] / total
+            flags |= np.where(line > self.line_ratio_max, LINE, 0)
+            flags |= np.where(hf > self.hf_ratio_max, HF, 0)
+            self.metrics.update(line_ratio=line, hf_ratio=hf)
+        self.flags = flags
+        return flags == 0
+
+    def assess_raw(self, chunk):
+        """`assess` on raw samples at `fs` that have no spectrum yet (the window ahead of
+        preprocessing); the spectral checks get one Welch PSD of it."""
+        return self.assess(chunk, *welch_psd(chunk, self.fs))
+
+def make_quality_gate(q_cfg, fs):
+    """SignalQualityGate from the `quality` config section, or None when disabled."""
+    q_cfg = dict(q_cfg or {})
+    if not q_cfg.pop('enabled', False):
+        return None
+    return SignalQualityGate(fs, **q_cfg)
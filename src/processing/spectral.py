@@ -0,0 +1,217 @@
+
+from collections import deque
+import numpy as np
+from ..utils.signal import welch_psd, welch_plan, band_weights, seconds_to_samples
+from ..utils.ringbuffer import RingBuffer
+
+class SpectralEngine:
+    """One batched Welch pass over a whole [n_channels, n_samples] chunk.
+    Every configured band is read out of the same PSD with a precomputed
+    trapezoid weight matrix, so cost scales with channels, not channels x bands.
+    """
+    def __init__(self, fs, bands, detrend=True, nperseg=None, noverlap=None):
+        self.fs = fs
+        self.band_names = list(bands.keys())
+        self.band_edges = tuple((float(lo), float(hi)) for lo, hi in bands.values())
+        self.detrend = detrend
+        self.nperseg = nperseg
+        self.noverlap = noverlap
+        self.last_freqs = None
+        self.last_psd = None  # [..., n_channels, n_freqs] of the latest call
+
+    def weights(self, n_samples):
+        plan = welch_plan(self.fs, n_samples, self.nperseg, self.noverlap)
+        return band_weights(self.fs, plan.nperseg, self.band_edges)
+
+    def psd(self, chunk):
+        freqs, psd = welch_psd(chunk, self.fs, nperseg=self.nperseg,
+                               noverlap=self.noverlap, detrend=self.detrend)
+        self.last_freqs, self.last_psd = freqs, psd
+        return freqs, psd
+
+    def bandpowers(self, chunk):
+        """chunk: [..., n_channels, n_samples] -> band powers [..., n_channels, n_bands]"""
+        _, psd = self.psd(chunk)
+        return psd @ self.weights(np.shape(chunk)[-1])
+
+def sliding_welch_grid(fs, window_sec, hop_sec, nperseg=None, noverlap=None):
+    """(window, hop, nperseg, step, grid) in samples for a sliding Welch estimate.
+    Segments are cached on a grid of `grid` samples; that only lines up with every
+    window if the hop is a multiple or a divisor of the segment step. Without an
+    explicit `noverlap` the step is chosen from the hop: the multiple or divisor of
+    the hop closest to `SpectralEngine`'s half-segment step (which it keeps whenever
+    the hop already fits it). An explicit plan the hop cannot follow raises ValueError.
+    """
+    window = seconds_to_samples(fs, window_sec)
+    hop = seconds_to_samples(fs, hop_sec)
+    if hop <= 0 or hop > window:
+        raise ValueError("hop_sec must be in (0, window_sec].")
+    if noverlap is None:
+        seg = welch_plan(fs, window, nperseg).nperseg
+        fits = {d for d in range(1, hop + 1) if hop % d == 0} | set(range(hop, seg + 1, hop))
+        step = min((s for s in fits if s <= seg), key=lambda s: (abs(s - seg // 2), s))
+        nperseg, noverlap = seg, seg - step
+    plan = welch_plan(fs, window, nperseg, noverlap)
+    step = plan.step
+    if hop % step and step % hop:
+        ok = sorted({d for d in range(1, step + 1) if step % d == 0} | set(range(step, window + 1, step)))
+        near = sorted(ok, key=lambda h: abs(h - hop))[:2]
+        raise ValueError(f"hop_sec={hop_sec} ({hop} samples) must be a multiple or a divisor of the "
+                         f"{step}-sample Welch segment step at window_sec={window_sec}; nearest: "
+                         + ", ".join(f"{h / fs:g} s" for h in sorted(near)))
+    return window, hop, plan.nperseg, step, min(hop, step)
+
+class SlidingWelch:
+    """Incremental Welch band power over a sliding window advanced by a fixed hop.
+    Samples live in a per-channel ring buffer; windowed segment spectra are cached by
+    their absolute start sample, so each push only FFTs segments that just completed.
+    Mean removal is applied in the frequency domain on the cached spectra:
+        rfft((x - m) * w) == rfft(x * w) - m * rfft(w)
+    Segments follow the plan `sliding_welch_grid` picks for the hop, so once the window
+    has filled every estimate equals `SpectralEngine` with that plan run on the window
+    (the default plan itself whenever the hop fits its step). Every push must be
+    exactly one hop.
+    """
+    def __init__(self, fs, bands, n_channels, window_sec, hop_sec, detrend=True,
+                 nperseg=None, noverlap=None):
+        self.fs = fs
+        self.band_names = list(bands.keys())
+        self.window, self.hop, nperseg, step, self.grid = sliding_welch_grid(fs, window_sec, hop_sec,
+                                                                             nperseg, noverlap)
+        self.detrend = detrend
+        self.plan = welch_plan(fs, self.window, nperseg, nperseg - step)
+        self._W = band_weights(fs, self.plan.nperseg,
+                               tuple((float(lo), float(hi)) for lo, hi in bands.values()))
+        self._win_fft = np.fft.rfft(self.plan.window)
+        self._n_seg = (self.window - self.plan.nperseg) // step + 1
+        self._stride = step // self.grid  # cached segments between two of one window
+        self.ring = RingBuffer(n_channels, self.window)
+        # Anchor the segment grid so window starts (total - window) fall on it
+        self._next_seg = (-self.window) % self.grid
+        self._starts = deque()
+        self._spectra = deque()
+        self.last_freqs = self.plan.freqs
+        self.last_psd = None
+
+    def push(self, chunk):
+        """Append one hop of new samples [n_channels, hop]. Returns band powers
+        [n_channels, n_bands] over the newest window, or None until the window is full.
+        """
+        if chunk.shape[-1] != self.hop:
+            raise ValueError(f"SlidingWelch takes {self.hop}-sample pushes, got {chunk.shape[-1]}.")
+        self.ring.write(chunk)
+        total = self.ring.total
+        oldest = total - len(self.ring)
+        nperseg = self.plan.nperseg
+        # FFT only the segments that completed with this chunk (one batched call)
+        new_starts = []
+        while self._next_seg + nperseg <= total:
+            if self._next_seg >= oldest:
+                new_starts.append(self._next_seg)
+            self._next_seg += self.grid
+        if new_starts:
+            segs = np.stack([self.ring.latest(total - s)[:, :nperseg] for s in new_starts])
+            spectra = np.fft.rfft(segs * self.plan.window, axis=-1)
+            for s, X in zip(new_starts, spectra):
+                self._starts.append(s)
+                self._spectra.append(X)
+        # Evict segments that slid out of the window
+        while self._starts and self._starts[0] < oldest:
+            self._starts.popleft()
+            self._spectra.popleft()
+        if total < self.window:
+            return None
+        # the window's own segments: every `_stride`-th cached one from its start
+        X = np.stack([self._spectra[i] for i in range(0, self._n_seg * self._stride, self._stride)])
+        if self.detrend:
+            m = self.ring.latest(self.window).mean(axis=-1)
+            X = X - m[None, :, None] * self._win_fft
+        self.last_psd = (X.real**2 + X.imag**2).mean(axis=0) * self.plan.scale
+        return self.last_psd @ self._W
+
+class SlidingDFT:
+    """Recursive sliding-DFT band power: tracks only the DFT bins inside `bands`
+    (plus one neighbour each side) over an N-sample window, N = window_sec * fs.
+    Each push of H samples advances all bins at once:
+        S_k <- S_k * e^{j2pi kH/N} + (x_new - x_old) @ E_H,   E_H[i, k] = e^{j2pi k(H-i)/N}
+    so an update costs O(H x bins x channels) and an estimate is available after every
+    hop, at any hop size. The periodic Hann window is applied in the frequency domain
+    (0.5 S_k - 0.25 (S_{k-1} + S_{k+1})), mean removal via the window's own spectrum, and
+    the bins are recomputed directly every `reanchor_sec` to cancel recursion drift.
+    Equals a Hann periodogram of the newest N samples; like SlidingWelch, `push` returns
+    None until the first N samples have arrived.
+    """
+    def __init__(self, fs, bands, n_channels, window_sec, detrend=True, reanchor_sec=10.0):
+        self.fs = fs
+        self.band_names = list(bands.keys())
+        self.N = N = seconds_to_samples(fs, window_sec)
+        self.detrend = detrend
+        W = band_weights(fs, N, tuple((float(lo), float(hi)) for lo, hi in bands.values()))
+        band_bins = np.flatnonzero(W.any(axis=1))
+        self._W = W[band_bins]                                   # [n_band_bins, n_bands]
+        self.bins = np.unique(np.concatenate([band_bins - 1, band_bins, band_bins + 1]))
+        pos = {k: i for i, k in enumerate(self.bins)}
+        self._c = np.array([pos[k] for k in band_bins])
+        self._lo = np.array([pos[k - 1] for k in band_bins])
+        self._hi = np.array([pos[k + 1] for k in band_bins])
+        # Periodic Hann spectrum at the band bins (nonzero only at k = 0, +-1)
+        kk = np.abs(band_bins) % N
+        self._win_k = np.where(kk == 0, 0.5 * N, np.where((kk == 1) | (kk == N - 1), -0.25 * N, 0.0))
+        self.scale = 1.0 / (fs * N * 0.375)                      # sum(w**2) of a periodic Hann
+        self._twiddle = np.exp(2j * np.pi * self.bins / N)
+        self._F = np.exp(-2j * np.pi * np.outer(np.arange(N), self.bins) / N)  # [N, n_bins]
+        self._E = {}
+        self.ring = RingBuffer(n_channels, N)
+        self.S = np.zeros((n_channels, len(self.bins)), dtype=complex)
+        self._sum = np.zeros(n_channels)
+        self.reanchor = int(round(fs * reanchor_sec)) if reanchor_sec else None
+        self._since_anchor = 0
+        self.last_freqs = band_bins * fs / N
+        self.last_psd = None  # [n_channels, n_band_bins] of the latest estimate
+
+    def _hop(self, H):
+        """(e^{j2pi kH/N}, E_H) for a hop of H samples, cached per H."""
+        hop = self._E.get(H)
+        if hop is None:
+            hop = self._E[H] = (self._twiddle ** H,
+                                np.exp(2j * np.pi * np.outer(H - np.arange(H), self.bins) / self.N))
+        return hop
+
+    def push(self, chunk):
+        """Append new samples [n_channels, H]. Returns band powers [n_channels, n_bands]
+        over the newest N samples, or None until the window is full."""
+        x = np.asarray(chunk, dtype=float)
+        H = x.shape[-1]
+        if self.ring.total < self.N:
+            # filling: no recursion yet, the bins are anchored once the window is full
+            self.ring.write(x)
+            if self.ring.total < self.N:
+                return None
+            self._anchor()
+        elif H >= self.N or (self.reanchor and self._since_anchor + H >= self.reanchor):
+            self.ring.write(x)
+            self._anchor()
+        else:
+            old = self.ring.latest(self.N)[:, :H]
+            d = x - old
+            rot, E = self._hop(H)
+            self.S = self.S * rot + d @ E
+            self._sum += d.sum(axis=-1)
+            self.ring.write(x)
+            self._since_anchor += H
+        return self.bandpowers()
+
+    def _anchor(self):
+        """Recompute the tracked bins directly from the newest N samples."""
+        win = self.ring.latest(self.N)
+        self.S = win @ self._F
+        self._sum = win.sum(axis=-1)
+        self._since_anchor = 0
+
+    def bandpowers(self):
+        S = self.S
+        X = 0.5 * S[:, self._c] - 0.25 * (S[:, self._lo] + S[:, self._hi])
+        if self.detrend:
+            X = X - (self._sum / self.N)[:, None] * self._win_k
+        self.last_psd = (X.real**2 + X.imag**2) * self.scale
+        return self.last_psd @ self._W
@@ -0,0 +1,181 @@
+
+"""Append-only session recordings: chunked .npy segments plus a JSON index.
+
+Layout of a recording directory:
+    index.json                 streams, segment files, row/sample counts, metadata
+    eeg/seg_000000.npy         [n_channels, n_samples] raw EEG in the source dtype
+    eeg_ticks/seg_000000.npy   structured rows (t, sample_start, n_samples) per chunk
+    <stream>/seg_000000.npy    structured rows (one field per column) for tabular streams
+
+Every segment is a plain .npy, so readers can np.load(..., mmap_mode='r') it.
+"""
+import json, os, queue, threading
+import numpy as np
+
+INDEX = 'index.json'
+
+class SessionRecorder:
+    """Full-fidelity recorder with a background writer thread.
+    `record_eeg()` / `record()` only enqueue; the writer batches rows per stream and
+    writes one segment file per `segment_rows` rows (or `eeg_segment_samples`
+    samples), rewriting the index after each segment. If writing fails (disk full,
+    inconsistent rows) the error is logged and kept in `failed`; the writer keeps
+    draining the queue without writing, so the loop is never blocked.
+    Raw EEG keeps the dtype it arrives in, so a replay of the recording is bit-identical
+    to the session; `eeg_dtype` (e.g. 'float32') opts into a smaller, lossy store.
+    """
+    def __init__(self, out_dir, segment_rows=4096, eeg_segment_samples=30000, meta=None,
+                 max_queue=10000, eeg_dtype=None, log_fn=print):
+        self.out_dir = out_dir
+        self.segment_rows = int(segment_rows)
+        self.eeg_segment_samples = int(eeg_segment_samples)
+        self.eeg_dtype = None if eeg_dtype is None else np.dtype(eeg_dtype)
+        self.log = log_fn
+        os.makedirs(out_dir, exist_ok=True)
+        if os.path.exists(os.path.join(out_dir, INDEX)):
+            raise FileExistsError(f"Recording already exists: {out_dir}")
+        self.index = {'version': 1, 'meta': meta or {}, 'streams': {}}
+        self._pending = {}     # stream -> list of rows / chunks
+        self._pending_n = {}
+        self._eeg_samples = 0
+        self._q = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.failed = None  # str: first write error; nothing is written after it
+        self._thread = threading.Thread(target=self._run, name='session-recorder', daemon=True)
+        self._thread.start()
+
+    # --- producer side (control loop) ---
+
+    def record_eeg(self, t, chunk):
+        """chunk: [n_channels, n_samples]; copied, since callers may pass ring views."""
+        self._put(('eeg', float(t), np.array(chunk, dtype=self.eeg_dtype)))
+
+    def record(self, stream, **fields):
+        """One row of a tabular stream. All rows of a stream must share the same keys."""
+        self._put((stream, fields))
+
+    def _put(self, item):
+        try:
+            self._q.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1  # never block the control loop on disk I/O
+
+    # --- writer thread ---
+
+    def _run(self):
+        # Rows are batched per stream in _pending and written a whole segment at a time
+        while True:
+            item = self._q.get()
+            if item is None:
+                break
+            if self.failed is not None:
+                self.dropped += 1
+                continue
+            try:
+                if item[0] == 'eeg':
+                    _, t, chunk = item
+                    self._add('eeg_ticks', {'t': t, 'sample_start': self._eeg_samples, 'n_samples': chunk.shape[1]})
+                    self._eeg_samples += chunk.shape[1]
+                    self._add('eeg', chunk, n=chunk.shape[1])
+                else:
+                    self._add(item[0], item[1])
+            except Exception as e:
+                self._fail(e)
+        if self.failed is None:
+            try:
+                self._flush_all()
+            except Exception as e:
+                self._fail(e)
+
+    def _fail(self, e):
+        self.failed = f"{type(e).__name__}: {e}"
+        self.log(f"[REC] Recording failed ({self.failed}); further records are dropped.")
+
+    def _add(self, stream, row, n=1):
+        self._pending.setdefault(stream, []).append(row)
+        self._pending_n[stream] = self._pending_n.get(stream, 0) + n
+        limit = self.eeg_segment_samples if stream == 'eeg' else self.segment_rows
+        if self._pending_n[stream] >= limit:
+            self._flush(stream)
+
+    def _flush(self, stream):
+        rows = self._pending.get(stream)
+        if not rows:
+            return
+        if stream == 'eeg':
+            arr = np.concatenate(rows, axis=1)
+        else:
+            keys = list(rows[0].keys())
+            dtype = [(k, _field_dtype(rows[0][k])) for k in keys]
+            arr = np.array([tuple(r[k] for k in keys) for r in rows], dtype=dtype)
+        meta = self.index['streams'].setdefault(stream, {'segments': [], 'rows': 0})
+        name = f"seg_{len(meta['segments']):06d}.npy"
+        os.makedirs(os.path.join(self.out_dir, stream), exist_ok=True)
+        np.save(os.path.join(self.out_dir, stream, name), arr)
+        n = arr.shape[1] if stream == 'eeg' else len(arr)
+        meta['segments'].append({'file': f"{stream}/{name}", 'rows': n})
+        meta['rows'] += n
+        if stream == 'eeg':
+            meta['n_channels'] = arr.shape[0]
+        self._pending[stream] = []
+        self._pending_n[stream] = 0
+        self._write_index()
+
+    def _flush_all(self):
+        for stream in list(self._pending):
+            self._flush(stream)
+        self._write_index()
+
+    def _write_index(self):
+        tmp = os.path.join(self.out_dir, INDEX + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp, os.path.join(self.out_dir, INDEX))
+
+    def close(self, timeout=30.0):
+        """Flush everything still queued and stop the writer (waits at most `timeout` s)."""
+        try:
+            self._q.put(None, timeout=timeout)
+        except queue.Full:
+            self.log("[REC] Writer not draining; closing without a final flush.")
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            self.log(f"[REC] Writer still busy after {timeout:.0f} s; recording may be incomplete.")
+        if self.dropped:
+            self.log(f"[REC] Dropped {self.dropped} records (writer queue full).")
+
+def _field_dtype(v):
+    if isinstance(v, (bool, np.bool_)):
+        return np.bool_
+    if isinstance(v, (int, np.integer)):
+        return np.int64
+    if isinstance(v, str):
+        return 'U32'
+    return np.float64
+
+class SessionReader:
+    """Memory-mapped access to a SessionRecorder directory."""
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX), 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        self.meta = self.index.get('meta', {})
+
+    @property
+    def streams(self):
+        return list(self.index['streams'])
+
+    def segments(self, stream):
+        """Memory-mapped segment arrays of one stream, in order."""
+        for seg in self.index['streams'].get(stream, {}).get('segments', []):
+            yield np.load(os.path.join(self.path, seg['file']), mmap_mode='r')
+
+    def table(self, stream):
+        """Whole tabular stream as one structured array (copies the rows)."""
+        segs = list(self.segments(stream))
+        return np.concatenate(segs) if segs else np.zeros(0)
+
+    def eeg(self):
+        """Whole raw EEG as [n_channels, n_samples] (copies; prefer segments('eeg') for long files)."""
+        segs = list(self.segments('eeg'))
+        return np.concatenate(segs, axis=1) if segs else np.zeros((0, 0))
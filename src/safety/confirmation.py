@@ -0,0 +1,197 @@
+
+"""Non-blocking human confirmation of stimulation changes.
+
+The loop posts a proposal and carries on; approvals, denials and emergency stops arrive
+as text lines from the terminal and/or a local Unix socket:
+
+    approve <id> | y <id>     apply proposal <id>
+    deny <id>    | n <id>     reject proposal <id>
+    stop | estop | <e-stop key>   emergency stop (takes effect on the next tick)
+    status                    (socket only) reply with the pending proposal
+
+From the terminal the id may be omitted ("y" / "n" answer the pending proposal).
+Send from another shell with:
+
+    python -m src.safety.confirmation --socket /tmp/tdcs-confirm.sock approve 3
+"""
+import argparse, os, queue, socket, sys, threading
+from collections import namedtuple
+from ..utils.clock import WallClock
+from ..utils.sockets import is_socket
+
+Proposal = namedtuple('Proposal', 'id target_mA current_mA t')
+
+APPROVE = ('approve', 'y', 'yes')
+DENY = ('deny', 'n', 'no')
+STOP = ('stop', 'estop')
+
+class TerminalReader:
+    """The one stdin reader of the process: a single thread (started on first use)
+    copies each line to every subscribed broker inbox. Brokers come and go with
+    sessions; a thread per broker would stay blocked on stdin after close()."""
+    def __init__(self, stream=None):
+        self.stream = stream
+        self._inboxes = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, inbox):
+        with self._lock:
+            self._inboxes.append(inbox)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='confirm-terminal', daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self, inbox):
+        with self._lock:
+            self._inboxes = [q for q in self._inboxes if q is not inbox]
+
+    def _run(self):
+        try:
+            for line in self.stream if self.stream is not None else sys.stdin:
+                with self._lock:
+                    for inbox in self._inboxes:
+                        inbox.put(line)
+        except (OSError, ValueError):
+            pass  # no usable stdin (detached, or captured by a test runner)
+
+_terminal = TerminalReader()
+
+class ConfirmationBroker:
+    """Matches asynchronous operator replies to the one outstanding proposal.
+    Reader threads only enqueue raw lines; `poll()` (called by the loop every tick)
+    interprets them, so proposal state is only ever touched by the loop thread.
+    A proposal expires after `ttl_sec`, or as soon as the output current has moved by
+    more than `tolerance_mA` from what it was when the proposal was made.
+    """
+    def __init__(self, socket_path=None, terminal=True, ttl_sec=10.0, tolerance_mA=0.01,
+                 emergency_stop_key='q', clock=None, log_fn=print):
+        self.clock = clock if clock is not None else WallClock()
+        self.ttl = float(ttl_sec)
+        self.tolerance = float(tolerance_mA)
+        self.stop_words = STOP + ((emergency_stop_key.lower(),) if emergency_stop_key else ())
+        self.log = log_fn
+        self.pending = None
+        self.estopped = False
+        self._next_id = 1
+        self._inbox = queue.Queue()
+        self._closed = threading.Event()
+        self.socket_path = socket_path
+        self._server = None
+        if socket_path:
+            if is_socket(socket_path):
+                os.unlink(socket_path)  # stale socket of an earlier run
+            elif os.path.lexists(socket_path):
+                raise ValueError(f"confirm_socket {socket_path} exists and is not a socket.")
+            self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._server.bind(socket_path)
+            self._server.listen(4)
+            self._server.settimeout(0.5)
+            threading.Thread(target=self._serve, name='confirm-socket', daemon=True).start()
+        self._terminal = _terminal if terminal else None
+        if self._terminal is not None:
+            self._terminal.subscribe(self._inbox)
+
+    # --- loop side ---
+
+    def propose(self, target_mA, current_mA):
+        """Post a proposal (replacing any pending one) and return its id; never blocks."""
+        self.pending = Proposal(self._next_id, float(target_mA), float(current_mA), self.clock.now())
+        self._next_id += 1
+        where = f" or via {self.socket_path}" if self.socket_path else ""
+        self.log(f"[CONFIRM] #{self.pending.id}: apply new target {target_mA:.3f} mA? "
+                 f"'y {self.pending.id}' / 'n {self.pending.id}'{where}")
+        return self.pending.id
+
+    def poll(self, current_mA):
+        """Process queued replies. Returns (approved, denied) Proposals (or None each).
+        Check `estopped` afterwards."""
+        p = self.pending
+        # Expire first: a reply read after the TTL, or after the output moved, must not apply
+        if p is not None and (self.clock.now() - p.t > self.ttl or abs(current_mA - p.current_mA) > self.tolerance):
+            self.log(f"[CONFIRM] #{p.id} expired.")
+            self.pending = None
+        approved = denied = None
+        while True:
+            try:
+                line = self._inbox.get_nowait()
+            except queue.Empty:
+                break
+            verdict = self._handle(line)
+            if verdict is not None:
+                ok, p = verdict
+                approved, denied = (p, None) if ok else (None, p)
+        return approved, denied
+
+    def _handle(self, line):
+        words = line.strip().lower().split()
+        if not words:
+            return None
+        cmd, arg = words[0], words[1] if len(words) > 1 else None
+        if cmd in self.stop_words:
+            self.estopped = True
+            self.log("[SAFETY] Emergency stop requested.")
+            return None
+        if cmd not in APPROVE + DENY:
+            self.log(f"[CONFIRM] Unknown command: {line.strip()!r}")
+            return None
+        p = self.pending
+        if p is None or (arg is not None and arg != str(p.id)):
+            self.log(f"[CONFIRM] No pending proposal #{arg or '?'}; ignored.")
+            return None
+        self.pending = None
+        ok = cmd in APPROVE
+        self.log(f"[CONFIRM] #{p.id} {'approved' if ok else 'denied'}.")
+        return ok, p
+
+    # --- socket threads ---
+
+    def _serve(self):
+        while not self._closed.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self._client, args=(conn,), daemon=True).start()
+
+    def _client(self, conn):
+        with conn, conn.makefile('rw', encoding='utf-8') as f:
+            for line in f:
+                if line.strip().lower() == 'status':
+                    p = self.pending
+                    f.write(f"pending {p.id} {p.target_mA:.3f}\n" if p else "pending none\n")
+                else:
+                    self._inbox.put(line)
+                    f.write("queued\n")
+                f.flush()
+
+    def close(self):
+        self._closed.set()
+        if self._terminal is not None:
+            self._terminal.unsubscribe(self._inbox)
+        if self._server is not None:
+            self._server.close()
+            if is_socket(self.socket_path):
+                os.unlink(self.socket_path)
+
+def send(socket_path, message, timeout=2.0):
+    """Send one command line to a broker socket and return its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(socket_path)
+        with s.makefile('rw', encoding='utf-8') as f:
+            f.write(message.strip() + "\n")
+            f.flush()
+            return f.readline().strip()
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--socket', default='/tmp/tdcs-confirm.sock')
+    p.add_argument('command', nargs='+', help="approve <id> | deny <id> | stop | status")
+    args = p.parse_args()
+    print(send(args.socket, ' '.join(args.command)))
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,11 @@
 
-import time
+from ..utils.clock import WallClock
 
 class SafetyManager:
     def __init__(self, max_mA=2.0, min_mA=0.0, ramp_rate_mA_per_min=0.5,
                  min_seconds_between_changes=30, max_session_minutes=20,
-                 require_human_confirm=True, emergency_stop_key='q', log_fn=print):
+                 require_human_confirm=True, emergency_stop_key='q', log_fn=print, clock=None):
+        self.clock = clock if clock is not None else WallClock()
         self.max_mA = max_mA
         self.min_mA = min_mA
         self.ramp_rate = ramp_rate_mA_per_min
@@ -14,10 +15,11 @@ class SafetyManager:
         self.emergency_key = emergency_stop_key
         self.log = log_fn
         self._last_change_ts = 0.0
-        self._session_start_ts = time.time()
+        self.signal_ok = True  # enough good EEG channels to act on (see report_signal_quality)
+        self._session_start_ts = self.clock.now()
 
     def within_session_limits(self):
-        elapsed = time.time() - self._session_start_ts
+        elapsed = self.clock.now() - self._session_start_ts
         if elapsed > self.max_session_sec:
             self.log("[SAFETY] Max session time exceeded. Stopping.")
             return False
@@ -34,22 +36,20 @@ class SafetyManager:
         return target
 
     def can_change_now(self):
-        return (time.time() - self._last_change_ts) >= self.min_interval
+        return self.signal_ok and (self.clock.now() - self._last_change_ts) >= self.min_interval
 
-    def mark_changed(self):
-        self._last_change_ts = time.time()
+    def report_signal_quality(self, n_good, n_total, min_good):
+        """Per tick from the loop. While fewer than `min_good` channels are usable no change
+        is allowed; the present output is held."""
+        ok = n_good >= min_good
+        if ok != self.signal_ok:
+            if ok:
+                self.log(f"[SAFETY] Signal quality restored ({n_good}/{n_total} good channels).")
+            else:
+                self.log(f"[SAFETY] Only {n_good}/{n_total} good EEG channels (< {min_good}). "
+                         "Holding stimulation; no changes until quality recovers.")
+        self.signal_ok = ok
+        return ok
 
-    def maybe_confirm(self, proposed_mA):
-        if not self.require_confirm:
-            return True
-        self.log(f"[CONFIRM] Apply new target {proposed_mA:.3f} mA? [y/N]")
-        try:
-            import sys, select
-            # Wait up to 10 seconds for user input
-            i, _, _ = select.select([sys.stdin], [], [], 10.0)
-            if i:
-                resp = sys.stdin.readline().strip().lower()
-                return resp in ('y','yes')
-            return False
-        except Exception:
-            return False
+    def mark_changed(self):
+        self._last_change_ts = self.clock.now()
@@ -0,0 +1,113 @@
+
+"""EEG acquisition in a separate process, handing samples over through shared memory.
+
+The child process owns a normal EEGSource (simulation / LSL / replay) and writes each
+chunk into a SharedRing; the control process reads zero-copy windows out of the same
+memory. Liveness is tracked with a heartbeat and the child's exit status, so a crashed
+or stalled acquisition surfaces as AcquisitionError in the control loop (which then
+safe-stops the stimulator).
+"""
+import multiprocessing as mp
+import time
+import traceback
+
+from ..utils.shm_ring import SharedRing, RUNNING, EOF, ERROR
+from ..utils.signal import seconds_to_samples
+
+class AcquisitionError(RuntimeError):
+    """The acquisition process died, reported an error, or stopped sending heartbeats."""
+
+def _acquisition_main(spec, src_kwargs):
+    # Child process: EEGSource on the wall clock -> shared ring
+    from .lsl_client import EEGSource
+    ring = SharedRing.attach(spec)
+    try:
+        src = EEGSource(**src_kwargs)
+        while not ring.stop_requested:
+            if src.exhausted:
+                ring.status = EOF
+                break
+            src.set_stimulation(ring.stim_mA)
+            ring.write(src.next_chunk())
+            ring.heartbeat = time.monotonic()
+    except BaseException:
+        ring.status = ERROR
+        traceback.print_exc()
+        raise
+    finally:
+        ring.close()
+
+class ProcessAcquisition:
+    """Drop-in for EEGSource (next_chunk / exhausted / set_stimulation) backed by a
+    child process. `next_chunk()` returns zero-copy views of the shared ring; they stay
+    valid for `capacity_sec` minus one chunk of newer data.
+    """
+    def __init__(self, mode='simulation', fs=250, n_channels=8, chunk_sec=1.0, log_fn=print, seed=42,
+                 replay_path=None, capacity_sec=30.0, heartbeat_timeout_sec=5.0, startup_timeout_sec=30.0,
+                 poll_sec=0.001):
+        self.mode = mode
+        self.fs = fs
+        self.n_channels = n_channels
+        self.n_samples = seconds_to_samples(fs, chunk_sec)
+        self.log = log_fn
+        self.last_timestamps = None
+        self.heartbeat_timeout = float(heartbeat_timeout_sec)
+        self.poll_sec = float(poll_sec)
+        self.ring = SharedRing(n_channels, max(int(fs*capacity_sec), 4*self.n_samples))
+        self.read_pos = 0          # next sample to hand out
+        self.overruns = 0          # samples skipped because the reader fell behind
+        # Allow for interpreter + NumPy start-up before the first heartbeat
+        self.ring.heartbeat = time.monotonic() + startup_timeout_sec
+        src_kwargs = dict(mode=mode, fs=fs, n_channels=n_channels, chunk_sec=chunk_sec, seed=seed,
+                          replay_path=replay_path)
+        # spawn: the parent may already run threads (ramps, recorder), which fork does not mix with
+        self.proc = mp.get_context('spawn').Process(target=_acquisition_main, args=(self.ring.spec, src_kwargs),
+                                                    name='eeg-acquisition', daemon=True)
+        self.proc.start()
+        self.log(f"[EEG] Acquisition process started (pid {self.proc.pid}, mode={mode}).")
+
+    def check_alive(self):
+        status = self.ring.status
+        if status == ERROR:
+            raise AcquisitionError("Acquisition process reported an error.")
+        if status != EOF and not self.proc.is_alive():
+            raise AcquisitionError(f"Acquisition process exited unexpectedly (exit code {self.proc.exitcode}).")
+        if status == RUNNING and time.monotonic() - self.ring.heartbeat > self.heartbeat_timeout:
+            raise AcquisitionError(f"No data from the acquisition process for {self.heartbeat_timeout:.1f}s.")
+
+    def next_chunk(self, n_samples=None):
+        """Next `n_samples` (default: chunk_sec worth) as a zero-copy [n_channels, n_samples] view."""
+        n = self.n_samples if n_samples is None else int(n_samples)
+        ring = self.ring
+        while ring.total < self.read_pos + n:
+            self.check_alive()
+            if ring.status == EOF:
+                raise EOFError("Acquisition ended.")
+            time.sleep(self.poll_sec)
+        if not ring.intact(self.read_pos, margin=self.n_samples):
+            skip = ring.total + self.n_samples - ring.capacity - self.read_pos
+            self.overruns += skip
+            self.read_pos += skip
+            self.log(f"[EEG] Reader fell behind; skipped {skip} samples.")
+        chunk = ring.view(self.read_pos, n)
+        self.read_pos += n
+        return chunk
+
+    @property
+    def exhausted(self):
+        return self.ring.status == EOF and self.ring.total - self.read_pos < self.n_samples
+
+    def set_stimulation(self, mA):
+        self.ring.stim_mA = mA
+
+    def close(self):
+        """Stop the child (terminate if it does not exit) and release the shared memory."""
+        if self.ring is None:
+            return
+        self.ring.request_stop()
+        self.proc.join(timeout=2.0)
+        if self.proc.is_alive():
+            self.proc.terminate()
+            self.proc.join(timeout=1.0)
+        self.ring.close()
+        self.ring = None
@@ -1,6 +1,9 @@
 
-import numpy as np
-import time
+from ..utils.clock import WallClock
+from ..utils.signal import seconds_to_samples
+from .simulator import VirtualSubjects
+from .lsl_ingest import LSLIngestor
+from .replay import ReplayReader
 
 try:
     from pylsl import StreamInlet, resolve_stream
@@ -10,51 +13,73 @@ except Exception:
 
 class EEGSource:
     """Return EEG chunks [n_channels, n_samples] at a fixed fs and chunk length.
-    In simulation mode, emits synthetic EEG with variable beta bursts.
+    In simulation mode, emits synthetic EEG from one virtual subject whose beta
+    activity responds to the applied current (see set_stimulation).
     """
-    def __init__(self, mode='simulation', fs=250, n_channels=8, chunk_sec=1.0, log_fn=print):
+    def __init__(self, mode='simulation', fs=250, n_channels=8, chunk_sec=1.0, log_fn=print, clock=None, seed=42,
+                 inlet=None, replay_path=None):
         self.mode = mode
+        self.clock = clock if clock is not None else WallClock()
         self.fs = fs
         self.n_channels = n_channels
-        self.n_samples = int(fs*chunk_sec)
+        self.n_samples = seconds_to_samples(fs, chunk_sec)
         self.log = log_fn
-        self._t = 0
-        self._beta_amp = 2.0
-        self._rng = np.random.default_rng(42)
-        if self.mode == 'lsl':
-            if resolve_stream is None:
-                raise RuntimeError("pylsl not installed.")
-            streams = resolve_stream('type','EEG', timeout=3.0)
-            if not streams:
-                raise RuntimeError("No LSL EEG stream found.")
-            self.inlet = StreamInlet(streams[0])
+        self.sim = None
+        self.ingest = None
+        self.replay = None
+        self.last_timestamps = None
+        if self.mode == 'replay':
+            # Recorded EEG; pacing comes only from the clock (virtual = as fast as possible)
+            self.inlet = None
+            self.replay = ReplayReader(replay_path, n_channels=n_channels)
+            if self.replay.fs is not None and float(self.replay.fs) != float(fs):
+                raise ValueError(f"Recording fs={self.replay.fs} does not match configured fs={fs}.")
+            if self.replay.n_channels < n_channels:
+                raise ValueError(f"Recording has {self.replay.n_channels} channels, {n_channels} configured.")
+            self.log(f"[EEG] Replay of {replay_path} ({self.replay.total/fs:.0f}s).")
+        elif self.mode == 'lsl':
+            if inlet is None:
+                # `inlet` may be injected (e.g. streaming.lsl_local.LocalInlet for bench tests)
+                if resolve_stream is None:
+                    raise RuntimeError("pylsl not installed.")
+                streams = resolve_stream('type','EEG', timeout=3.0)
+                if not streams:
+                    raise RuntimeError("No LSL EEG stream found.")
+                inlet = StreamInlet(streams[0])
+            self.inlet = inlet
+            self.ingest = LSLIngestor(inlet, n_channels, fs, capacity_sec=max(10.0, 4*chunk_sec),
+                                      clock=self.clock)
             self.log("[EEG] Connected to LSL stream.")
         else:
             self.inlet = None
+            self.sim = VirtualSubjects(n_subjects=1, n_channels=n_channels, fs=fs, seed=seed)
             self.log("[EEG] Simulation mode.")
 
-    def next_chunk(self):
+    def next_chunk(self, n_samples=None):
+        """Next `n_samples` (default: chunk_sec worth) of EEG as [n_channels, n_samples]."""
+        n_samples = self.n_samples if n_samples is None else int(n_samples)
+        if self.replay is not None:
+            chunk = self.replay.read(n_samples)
+            self.clock.sleep(n_samples/self.fs)
+            return chunk
         if self.mode == 'lsl' and self.inlet is not None:
-            samples, timestamps = self.inlet.pull_chunk(timeout=2.0, max_samples=self.n_samples)
-            if not samples or len(samples) < self.n_samples:
-                time.sleep(self.n_samples/self.fs)
-                return self.next_chunk()
-            arr = np.array(samples).T
-            if arr.shape[0] > self.n_channels:
-                arr = arr[:self.n_channels]
-            return arr[:, :self.n_samples]
+            # Partial pulls accumulate in the ingest ring; nothing is discarded while waiting
+            while not self.ingest.wait_for(n_samples, timeout=2.0):
+                self.log(f"[EEG] Waiting for LSL data ({self.ingest.unread}/{n_samples} samples).")
+            chunk, self.last_timestamps = self.ingest.read(n_samples)
+            return chunk  # zero-copy view into the ingest ring
         else:
-            # Simulation: 1/f noise + oscillations + occasional beta bursts tied to hidden state
-            t = np.arange(self.n_samples)/self.fs
-            out = []
-            # hidden state: occasionally increases beta amplitude
-            if self._rng.random() < 0.2:
-                self._beta_amp = float(np.clip(self._beta_amp + self._rng.normal(0,0.3), 0.5, 5.0))
-            for ch in range(self.n_channels):
-                noise = self._rng.normal(0, 1.0, size=self.n_samples) * (1/np.sqrt(np.maximum(1, np.arange(1,self.n_samples+1))))
-                alpha = 10*np.sin(2*np.pi*10*(t + ch*0.01))
-                beta = self._beta_amp*np.sin(2*np.pi*20*(t + ch*0.02))
-                sig = 0.2*noise + 0.5*alpha + 0.8*beta
-                out.append(sig.astype(float))
-            time.sleep(self.n_samples/self.fs)
-            return np.vstack(out)
+            # Simulation: 1/f noise + alpha/beta oscillations + beta bursts from a closed-loop plant
+            chunk = self.sim.next_chunk(n_samples)[0]
+            self.clock.sleep(n_samples/self.fs)
+            return chunk
+
+    @property
+    def exhausted(self):
+        """True once a replay has fewer than one chunk left (live sources never end)."""
+        return self.replay is not None and self.replay.remaining < self.n_samples
+
+    def set_stimulation(self, mA):
+        """Feed the applied current back into the simulated subject (no-op for real streams)."""
+        if self.sim is not None:
+            self.sim.set_current(mA)
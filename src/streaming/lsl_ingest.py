@@ -0,0 +1,129 @@
+
+import numpy as np
+from ..utils.clock import WallClock
+from ..utils.ringbuffer import RingBuffer
+
+# pylsl channel_format codes -> dtype pull_chunk fills a `dest_obj` with. Other formats
+# (string, int64, undefined) are pulled as lists instead.
+CHANNEL_DTYPES = {1: np.float32, 2: np.float64, 4: np.int32, 5: np.int16, 6: np.int8}
+
+class LSLIngestor:
+    """Lossless LSL ingestion into preallocated NumPy memory.
+    Each pull lands directly in a fixed [max_pull, n_stream_channels] buffer via
+    pylsl's `dest_obj` (in the stream's own channel format), then is appended to a ring buffer together with its LSL
+    timestamps. Partial pulls accumulate until a reader asks for them; `read()` hands
+    out zero-copy views of the ring (valid until `capacity_sec` of newer data arrive).
+    Also tracks inlet clock offset (time_correction) and inter-sample jitter.
+    """
+    def __init__(self, inlet, n_channels, fs, capacity_sec=10.0, max_pull=None,
+                 dtype=None, correction_every_sec=5.0, clock=None):
+        self.inlet = inlet
+        self.fs = fs
+        self.n_channels = int(n_channels)
+        self.clock = clock if clock is not None else WallClock()
+        info = inlet.info()
+        self.n_stream_channels = int(info.channel_count())
+        self.max_pull = int(max_pull or max(1, fs // 4))
+        fmt = info.channel_format() if hasattr(info, 'channel_format') else 1
+        pull_dtype = CHANNEL_DTYPES.get(fmt)
+        self._pull_buf = (np.empty((self.max_pull, self.n_stream_channels), dtype=pull_dtype)
+                          if pull_dtype is not None else None)
+        if dtype is None:
+            # ring storage: double streams stay double, everything else fits float32
+            dtype = np.float64 if pull_dtype is np.float64 else np.float32
+        cap = int(fs * capacity_sec)
+        self.ring = RingBuffer(self.n_channels, cap, dtype=dtype)
+        self.ts_ring = RingBuffer(1, cap, dtype=float)
+        self.unread = 0
+        self.overruns = 0          # samples overwritten before they were read
+        self.correction_every = correction_every_sec
+        self._next_correction = None
+        self._offsets = []         # time_correction() results (s)
+        # Running jitter stats of timestamp steps vs the nominal 1/fs
+        self._dt_n = 0
+        self._dt_mean = 0.0
+        self._dt_m2 = 0.0
+        self._dt_max_dev = 0.0
+        self._last_ts = None
+
+    def pull(self, timeout=0.0):
+        """One pull from the inlet into the ring. Returns the number of new samples."""
+        rows, stamps = self.inlet.pull_chunk(timeout=timeout, max_samples=self.max_pull,
+                                             dest_obj=self._pull_buf)
+        n = len(stamps)
+        if not n:
+            return 0
+        if self._pull_buf is not None:
+            self.ring.write(self._pull_buf[:n, :self.n_channels].T)
+        else:
+            self.ring.write(np.asarray(rows, dtype=float)[:, :self.n_channels].T)
+        ts = np.asarray(stamps, dtype=float)
+        self.ts_ring.write(ts[None, :])
+        self._update_jitter(ts)
+        self.unread += n
+        if self.unread > self.ring.capacity:
+            self.overruns += self.unread - self.ring.capacity
+            self.unread = self.ring.capacity
+        now = self.clock.now()
+        if self._next_correction is None or now >= self._next_correction:
+            self._offsets.append(float(self.inlet.time_correction()))
+            self._next_correction = now + self.correction_every
+        return n
+
+    def _update_jitter(self, ts):
+        if self._last_ts is not None:
+            ts_all = np.concatenate(([self._last_ts], ts))
+        else:
+            ts_all = ts
+        self._last_ts = ts[-1]
+        dts = np.diff(ts_all)
+        if not len(dts):
+            return
+        # Chan et al. parallel merge of (count, mean, M2)
+        n_b, mean_b = len(dts), float(dts.mean())
+        m2_b = float(((dts - mean_b)**2).sum())
+        n = self._dt_n + n_b
+        delta = mean_b - self._dt_mean
+        self._dt_mean += delta * n_b / n
+        self._dt_m2 += m2_b + delta**2 * self._dt_n * n_b / n
+        self._dt_n = n
+        self._dt_max_dev = max(self._dt_max_dev, float(np.max(np.abs(dts - 1.0/self.fs))))
+
+    def wait_for(self, n_samples, timeout=2.0):
+        """Pull until `n_samples` are unread or `timeout` (s) passes. Returns True if available."""
+        deadline = self.clock.now() + timeout
+        while self.unread < n_samples:
+            remaining = deadline - self.clock.now()
+            if remaining <= 0:
+                return False
+            self.pull(timeout=min(remaining, 0.1))
+        return True
+
+    def read(self, n_samples):
+        """Consume the oldest `n_samples` unread samples.
+        Returns (data [n_channels, n] view, timestamps [n] view)."""
+        if n_samples > self.unread:
+            raise ValueError(f"Requested {n_samples} samples, only {self.unread} unread.")
+        data = self.ring.latest(self.unread)[:, :n_samples]
+        ts = self.ts_ring.latest(self.unread)[0, :n_samples]
+        self.unread -= n_samples
+        return data, ts
+
+    def window(self, n_samples):
+        """Zero-copy view of the newest `n_samples` (read or not), e.g. for sliding features."""
+        return self.ring.latest(n_samples), self.ts_ring.latest(n_samples)[0]
+
+    def stats(self):
+        offs = np.asarray(self._offsets) if self._offsets else np.zeros(1)
+        sd = np.sqrt(self._dt_m2 / self._dt_n) if self._dt_n else 0.0
+        return {
+            'samples': self.ring.total,
+            'unread': self.unread,
+            'overruns': self.overruns,
+            'clock_offset_sec': float(offs[-1]),
+            'clock_offset_sd_sec': float(offs.std()),
+            'dt_mean_sec': self._dt_mean,
+            'dt_jitter_sd_sec': float(sd),
+            'dt_max_dev_sec': self._dt_max_dev,
+            'effective_fs': 1.0/self._dt_mean if self._dt_mean > 0 else 0.0,
+        }
@@ -0,0 +1,84 @@
+
+"""In-process stand-in for a pylsl outlet/inlet pair, so ingestion can be exercised
+and benchmarked on one machine without liblsl. Mirrors the subset of the pylsl API
+used here: push_chunk / pull_chunk(dest_obj=...) / time_correction / info().channel_count()
+/ info().channel_format(). Like pylsl, pull_chunk fills `dest_obj` in the stream's channel
+format and rejects a buffer of another dtype.
+"""
+import threading
+import numpy as np
+from ..utils.clock import WallClock
+from .lsl_ingest import CHANNEL_DTYPES
+
+class _Info:
+    def __init__(self, n_channels, fs, channel_format=1):
+        self._n, self._fs, self._fmt = n_channels, fs, channel_format
+    def channel_count(self): return self._n
+    def nominal_srate(self): return self._fs
+    def channel_format(self): return self._fmt
+
+class LocalOutlet:
+    """Producer side: push [n_samples, n_channels] chunks with LSL-style timestamps."""
+    def __init__(self, n_channels, fs, clock=None, clock_offset=0.0, jitter_sec=0.0, seed=0,
+                 channel_format=1):
+        self.info_ = _Info(n_channels, fs, channel_format)
+        self.fs = fs
+        self.clock = clock if clock is not None else WallClock()
+        self.clock_offset = clock_offset  # outlet clock minus local clock
+        self.jitter_sec = jitter_sec
+        self._rng = np.random.default_rng(seed)
+        self._cv = threading.Condition()
+        self._data = []   # list of (samples [n, ch], timestamps [n])
+        self._next_ts = None
+
+    def push_chunk(self, samples, timestamps=None):
+        samples = np.asarray(samples, dtype=CHANNEL_DTYPES.get(self.info_.channel_format()))
+        n = samples.shape[0]
+        if timestamps is None:
+            if self._next_ts is None:
+                self._next_ts = self.clock.now() + self.clock_offset
+            timestamps = self._next_ts + np.arange(n) / self.fs
+            self._next_ts = timestamps[-1] + 1.0 / self.fs
+            if self.jitter_sec:
+                timestamps = timestamps + self._rng.normal(0, self.jitter_sec, n)
+        with self._cv:
+            self._data.append((samples.copy(), np.asarray(timestamps, dtype=float)))
+            self._cv.notify_all()
+
+class LocalInlet:
+    """Consumer side with pylsl StreamInlet.pull_chunk semantics."""
+    def __init__(self, outlet):
+        self.outlet = outlet
+
+    def info(self):
+        return self.outlet.info_
+
+    def time_correction(self, timeout=None):
+        return -self.outlet.clock_offset
+
+    def pull_chunk(self, timeout=0.0, max_samples=1024, dest_obj=None):
+        out = self.outlet
+        with out._cv:
+            if not out._data and timeout:
+                out._cv.wait(timeout)
+            rows, stamps, n = [], [], 0
+            while out._data and n < max_samples:
+                s, t = out._data[0]
+                take = min(max_samples - n, s.shape[0])
+                rows.append(s[:take]); stamps.append(t[:take])
+                if take == s.shape[0]:
+                    out._data.pop(0)
+                else:
+                    out._data[0] = (s[take:], t[take:])
+                n += take
+        if not n:
+            return [], []
+        block = np.concatenate(rows)
+        if dest_obj is not None:
+            want = CHANNEL_DTYPES.get(out.info_.channel_format())
+            if want is None or dest_obj.dtype != want:
+                raise TypeError(f"dest_obj of {dest_obj.dtype} for channel format {out.info_.channel_format()}")
+            dest = np.asarray(dest_obj).reshape(-1)
+            dest[:block.size] = block.ravel()
+            return [], np.concatenate(stamps).tolist()
+        return block.tolist(), np.concatenate(stamps).tolist()
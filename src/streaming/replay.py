@@ -0,0 +1,77 @@
+
+import os, zipfile
+import numpy as np
+from ..recording.session_recorder import SessionReader, INDEX
+
+def npz_memmap(path, key):
+    """Read-only memory map of one member of an uncompressed .npz (np.savez). Compressed
+    members cannot be mapped and raise ValueError."""
+    with zipfile.ZipFile(path) as z:
+        info = z.getinfo(key + '.npy')
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"{path}: '{key}' is compressed (np.savez_compressed) and cannot be "
+                             "memory-mapped; re-save it with np.save / np.savez.")
+    with open(path, 'rb') as f:
+        f.seek(info.header_offset)
+        local = f.read(30)  # zip local file header: name and extra-field lengths at 26..30
+        f.seek(info.header_offset + 30 + int.from_bytes(local[26:28], 'little')
+               + int.from_bytes(local[28:30], 'little'))
+        version = np.lib.format.read_magic(f)
+        read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                       else np.lib.format.read_array_header_2_0)
+        shape, fortran, dtype = read_header(f)
+        offset = f.tell()
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape, order='F' if fortran else 'C', offset=offset)
+
+class ReplayReader:
+    """Sequential fixed-size reads over recorded EEG without loading it into RAM.
+    Accepts a SessionRecorder directory, a channels-first .npy [n_channels, n_samples]
+    or an uncompressed .npz holding 'eeg' (or 'data') and optionally 'fs'; either is
+    memory-mapped.
+    """
+    def __init__(self, path, n_channels=None):
+        self.path = path
+        self.fs = None
+        if os.path.isdir(path) and os.path.exists(os.path.join(path, INDEX)):
+            reader = SessionReader(path)
+            self.segments = list(reader.segments('eeg'))
+            self.fs = reader.meta.get('config', {}).get('eeg', {}).get('fs')
+        elif path.endswith('.npy'):
+            self.segments = [np.load(path, mmap_mode='r')]
+        elif path.endswith('.npz'):
+            with np.load(path, allow_pickle=False) as d:
+                key = 'eeg' if 'eeg' in d.files else 'data' if 'data' in d.files else d.files[0]
+                if 'fs' in d.files:
+                    self.fs = float(d['fs'])
+            self.segments = [npz_memmap(path, key)]
+        else:
+            raise ValueError(f"Unsupported replay source: {path}")
+        if n_channels is not None:
+            self.segments = [s[:n_channels] for s in self.segments]
+        self.n_channels = self.segments[0].shape[0] if self.segments else 0
+        self.total = sum(s.shape[1] for s in self.segments)
+        self.position = 0
+        self._seg = 0
+        self._off = 0
+
+    @property
+    def remaining(self):
+        return self.total - self.position
+
+    def read(self, n):
+        """Next n samples [n_channels, n]: a view when inside one segment, else a copy."""
+        if n > self.remaining:
+            raise EOFError(f"Replay exhausted ({self.remaining} < {n} samples left).")
+        parts = []
+        need = n
+        while need:
+            seg = self.segments[self._seg]
+            take = min(need, seg.shape[1] - self._off)
+            parts.append(seg[:, self._off:self._off+take])
+            self._off += take
+            need -= take
+            if self._off == seg.shape[1]:
+                self._seg += 1
+                self._off = 0
+        self.position += n
+        return parts[0] if len(parts) == 1 else np.concatenate(parts, axis=1)
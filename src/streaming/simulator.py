@@ -0,0 +1,109 @@
+
+import numpy as np
+
+# Population ranges for per-subject plant parameters (uniform draws, simulation units)
+DEFAULT_PARAM_RANGES = {
+    'beta_base': (1.5, 3.0),       # resting beta amplitude
+    'beta_hz': (18.0, 24.0),       # beta peak frequency
+    'alpha_hz': (9.0, 11.0),       # alpha peak frequency
+    'stim_gain': (0.3, 1.0),       # beta amplitude suppressed per effective mA
+    'tau_sec': (5.0, 30.0),        # time constant of the stimulation effect
+    'burst_rate_hz': (0.02, 0.1),  # burst onset rate at 0 mA
+    'burst_stim_k': (0.2, 1.0),    # burst rate scales by exp(-k * effective mA)
+    'burst_gain': (1.0, 2.5),      # extra relative beta amplitude during a burst
+    'burst_sec': (0.5, 3.0),       # mean burst duration
+    'drift_sd': (0.05, 0.2),       # slow OU drift of the beta baseline (per sqrt(s))
+}
+
+def pink_noise(rng, shape, exponent=1.0):
+    """Unit-variance 1/f^exponent noise along the last axis (FFT spectral shaping)."""
+    n = shape[-1]
+    spec = np.fft.rfft(rng.standard_normal(shape), axis=-1)
+    f = np.arange(spec.shape[-1], dtype=float)
+    f[0] = np.inf  # drop DC
+    spec *= f ** (-exponent / 2.0)
+    x = np.fft.irfft(spec, n=n, axis=-1)
+    x /= np.maximum(x.std(axis=-1, keepdims=True), 1e-12)
+    return x
+
+class VirtualSubjects:
+    """Batched synthetic EEG for a population: next_chunk() -> [n_subjects, n_channels, n_samples].
+    Closed-loop plant model per subject: the applied current (set_current) is low-pass
+    filtered with time constant tau_sec into an effective dose that lowers the beta
+    amplitude and the beta-burst onset rate. Bursts are a Poisson onset process with
+    exponential durations that carry across chunk boundaries; background is 1/f noise.
+    """
+    def __init__(self, n_subjects=1, n_channels=8, fs=250, seed=42, params=None,
+                 noise_scale=0.2, noise_block_sec=16.0):
+        self.n_subjects = int(n_subjects)
+        self.n_channels = int(n_channels)
+        self.fs = fs
+        self._rng = np.random.default_rng(seed)
+        params = dict(params or {})
+        self.params = {}
+        for k, (lo, hi) in DEFAULT_PARAM_RANGES.items():
+            v = params.get(k)
+            self.params[k] = (self._rng.uniform(lo, hi, self.n_subjects) if v is None
+                              else np.broadcast_to(np.asarray(v, dtype=float), (self.n_subjects,)).copy())
+        self.noise_scale = noise_scale
+        self._t = 0  # samples emitted so far (keeps oscillator phase continuous)
+        self._ch_phase = np.arange(self.n_channels)
+        self.current_mA = np.zeros(self.n_subjects)
+        self.effective_mA = np.zeros(self.n_subjects)
+        self._drift = np.zeros(self.n_subjects)
+        self._burst_left = np.zeros(self.n_subjects, dtype=np.int64)  # samples left in current burst
+        self.beta_amp = self.params['beta_base'].copy()
+        self._noise_block = max(1, int(fs * noise_block_sec))
+        self._noise = None
+        self._noise_pos = 0
+
+    def set_current(self, mA):
+        """Applied stimulation per subject (scalar or [n_subjects])."""
+        self.current_mA = np.broadcast_to(np.asarray(mA, dtype=float), (self.n_subjects,)).copy()
+
+    def _noise_chunk(self, n):
+        # 1/f noise is generated in long blocks so its spectrum extends below one chunk
+        out = np.empty((self.n_subjects, self.n_channels, n))
+        filled = 0
+        while filled < n:
+            if self._noise is None or self._noise_pos >= self._noise.shape[-1]:
+                self._noise = pink_noise(self._rng, (self.n_subjects, self.n_channels,
+                                                     max(self._noise_block, n)))
+                self._noise_pos = 0
+            take = min(n - filled, self._noise.shape[-1] - self._noise_pos)
+            out[..., filled:filled+take] = self._noise[..., self._noise_pos:self._noise_pos+take]
+            filled += take
+            self._noise_pos += take
+        return out
+
+    def next_chunk(self, n_samples):
+        p, rng, n = self.params, self._rng, int(n_samples)
+        dt = n / self.fs
+
+        # Plant: first-order response to stimulation, plus slow OU drift of the baseline
+        self.effective_mA += (1.0 - np.exp(-dt / p['tau_sec'])) * (self.current_mA - self.effective_mA)
+        self._drift += -self._drift * min(1.0, dt / 60.0) + p['drift_sd'] * np.sqrt(dt) * rng.standard_normal(self.n_subjects)
+        self.beta_amp = np.clip(p['beta_base'] + self._drift - p['stim_gain'] * self.effective_mA, 0.2, None)
+
+        # Bursts: continuing ones, plus at most one new onset per chunk
+        idx = np.arange(n)
+        active = idx[None, :] < self._burst_left[:, None]
+        rate = p['burst_rate_hz'] * np.exp(-p['burst_stim_k'] * self.effective_mA)
+        onset = (self._burst_left <= 0) & (rng.random(self.n_subjects) < 1.0 - np.exp(-rate * dt))
+        start = rng.integers(0, n, self.n_subjects)
+        length = np.maximum(1, (rng.exponential(p['burst_sec']) * self.fs).astype(np.int64))
+        new = onset[:, None] & (idx[None, :] >= start[:, None]) & (idx[None, :] < (start + length)[:, None])
+        active |= new
+        self._burst_left = np.where(onset, start + length - n, self._burst_left - n).clip(0)
+        self.burst_active = active[:, -1].copy()
+
+        # Oscillators [n_subjects, n_channels, n_samples]
+        t = (self._t + idx) / self.fs
+        self._t += n
+        alpha_ph = 2*np.pi * p['alpha_hz'][:, None, None] * (t[None, None, :] + 0.01*self._ch_phase[None, :, None])
+        beta_ph = 2*np.pi * p['beta_hz'][:, None, None] * (t[None, None, :] + 0.02*self._ch_phase[None, :, None])
+        beta_env = self.beta_amp[:, None] * (1.0 + p['burst_gain'][:, None] * active)
+        sig = 5.0 * np.sin(alpha_ph)
+        sig += 0.8 * beta_env[:, None, :] * np.sin(beta_ph)
+        sig += self.noise_scale * self._noise_chunk(n)
+        return sig
@@ -0,0 +1,53 @@
+
+import time
+
+# Virtual sessions start far from 0 so "never happened" timestamps initialised to 0.0
+# (last change, last burst, cooldowns) behave exactly as they do on wall time.
+VIRTUAL_EPOCH = 1.0e9
+
+class WallClock:
+    """Real time: `now()` is time.time() and `sleep()` blocks."""
+    def now(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+class VirtualClock:
+    """Simulated time that only moves when someone sleeps on it.
+    Lets a full session run as fast as the CPU allows while every timestamp-based
+    rule (cooldowns, ramp durations, session limits) sees the same elapsed time.
+    """
+    def __init__(self, start=VIRTUAL_EPOCH):
+        self._now = float(start)
+
+    def now(self):
+        return self._now
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self._now += float(seconds)
+
+class ScaledClock:
+    """Real time running `speed` times faster (e.g. replay at 4x real time)."""
+    def __init__(self, speed=1.0):
+        if speed <= 0:
+            raise ValueError("speed must be > 0 (use VirtualClock for as-fast-as-possible).")
+        self.speed = float(speed)
+        self._t0 = time.time()
+        self._m0 = time.monotonic()
+
+    def now(self):
+        return self._t0 + (time.monotonic() - self._m0) * self.speed
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+def make_clock(kind='wall', speed=1.0):
+    if kind == 'wall':
+        return WallClock() if speed == 1.0 else ScaledClock(speed)
+    if kind == 'virtual':
+        return VirtualClock()
+    raise ValueError(f"Unknown clock: {kind}")
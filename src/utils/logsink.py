@@ -0,0 +1,34 @@
+
+import time
+
+class RateLimitedLog:
+    """Human-readable log sink that lets at most one line per tag through every
+    `min_interval_sec` (tag = leading "[...]" of the message, e.g. "[EEG]").
+    Suppressed lines are counted and reported with the next line of that tag.
+    Lines that record decisions or events (`always`: control, bursts, safety, ...)
+    are never suppressed. Time is the session `clock`'s, so a virtual-clock session
+    is limited per simulated second. Call it like `print`; pass min_interval_sec=0
+    to log everything.
+    """
+    def __init__(self, log_fn=print, min_interval_sec=1.0, clock=None,
+                 always=('[START]', '[END]', '[STOP]', '[SAFETY]', '[WARN]', '[CONFIRM]',
+                         '[CTRL]', '[BURST]', '[QUALITY]', '[REC]')):
+        self.log_fn = log_fn
+        self.min_interval = float(min_interval_sec)
+        self.clock = clock
+        self.always = tuple(always)
+        self._last = {}
+        self._suppressed = {}
+
+    def __call__(self, msg):
+        if self.min_interval <= 0 or msg.startswith(self.always):
+            self.log_fn(msg)
+            return
+        tag = msg.split(']', 1)[0] if msg.startswith('[') else ''
+        now = self.clock.now() if self.clock is not None else time.monotonic()
+        if now - self._last.get(tag, -float('inf')) < self.min_interval:
+            self._suppressed[tag] = self._suppressed.get(tag, 0) + 1
+            return
+        self._last[tag] = now
+        n = self._suppressed.pop(tag, 0)
+        self.log_fn(msg if not n else f"{msg} (+{n} suppressed)")
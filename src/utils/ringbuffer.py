@@ -0,0 +1,39 @@
+
+import numpy as np
+
+class RingBuffer:
+    """Fixed-capacity per-channel ring buffer [n_channels, capacity].
+    Every sample is stored twice (at i and i+capacity), so the latest `n` samples
+    are always one contiguous slice and `latest()` can return a zero-copy view.
+    """
+    def __init__(self, n_channels, capacity, dtype=float):
+        self.n_channels = int(n_channels)
+        self.capacity = int(capacity)
+        self._buf = np.zeros((self.n_channels, 2 * self.capacity), dtype=dtype)
+        self._pos = 0      # next write index in [0, capacity)
+        self.total = 0     # samples ever written
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def write(self, chunk):
+        """chunk: [n_channels, n_samples]. Older samples are overwritten once full."""
+        n = chunk.shape[-1]
+        if n > self.capacity:
+            chunk = chunk[:, n - self.capacity:]
+        m = chunk.shape[-1]
+        cap, pos = self.capacity, self._pos
+        first = min(m, cap - pos)
+        for off in (0, cap):
+            self._buf[:, off+pos:off+pos+first] = chunk[:, :first]
+            if m > first:
+                self._buf[:, off:off+m-first] = chunk[:, first:]
+        self._pos = (pos + m) % cap
+        self.total += n
+
+    def latest(self, n):
+        """Zero-copy view of the newest `n` samples, oldest first."""
+        if n > len(self):
+            raise ValueError(f"Requested {n} samples, only {len(self)} buffered.")
+        end = self._pos + self.capacity
+        return self._buf[:, end-n:end]
@@ -0,0 +1,135 @@
+
+import numpy as np
+from multiprocessing import shared_memory
+
+_HEADER = 64  # 4 x int64 + 4 x float64
+
+# int header slots
+_TOTAL, _STATUS, _STOP = 0, 1, 2
+# float header slots
+_HEARTBEAT, _STIM = 0, 1
+
+RUNNING, EOF, ERROR = 0, 1, 2
+
+def _attach(name):
+    """Attach to an existing block. Only the creating process unlinks it; spawned
+    children share the creator's resource tracker, so attaching registers nothing new."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        return shared_memory.SharedMemory(name=name)
+
+class SharedRing:
+    """RingBuffer layout ([n_channels, 2*capacity], every sample stored twice) in a
+    multiprocessing.shared_memory block: one writer process, any number of readers.
+    Lock-free: the writer stores samples first and then publishes them by bumping the
+    sample counter `total`; readers only view samples below the counter they read and
+    re-check it afterwards (`intact()`) to detect having been overwritten.
+    A small header also carries status, a stop request, a heartbeat and the applied
+    stimulation current, so the writer needs no other channel to the reader.
+    """
+    def __init__(self, n_channels, capacity, dtype=np.float32, name=None):
+        self.n_channels = int(n_channels)
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self._owner = name is None
+        if self._owner:
+            size = _HEADER + 2 * self.n_channels * self.capacity * self.dtype.itemsize
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = _attach(name)
+        self._ints = np.ndarray(4, np.int64, self.shm.buf, 0)
+        self._floats = np.ndarray(4, np.float64, self.shm.buf, 32)
+        self._buf = np.ndarray((self.n_channels, 2 * self.capacity), self.dtype, self.shm.buf, _HEADER)
+        if self._owner:
+            self._ints[:] = 0
+            self._floats[:] = 0.0
+
+    @property
+    def spec(self):
+        """Picklable description for SharedRing.attach() in another process."""
+        return (self.shm.name, self.n_channels, self.capacity, self.dtype.str)
+
+    @classmethod
+    def attach(cls, spec):
+        name, n_channels, capacity, dtype = spec
+        return cls(n_channels, capacity, dtype, name=name)
+
+    @property
+    def total(self):
+        """Samples ever published."""
+        return int(self._ints[_TOTAL])
+
+    def write(self, chunk):
+        """Writer only. chunk: [n_channels, n_samples] (n_samples <= capacity)."""
+        n = chunk.shape[-1]
+        if n > self.capacity:
+            raise ValueError("Chunk larger than the ring capacity.")
+        cap = self.capacity
+        total = int(self._ints[_TOTAL])
+        pos = total % cap
+        first = min(n, cap - pos)
+        for off in (0, cap):
+            self._buf[:, off+pos:off+pos+first] = chunk[:, :first]
+            if n > first:
+                self._buf[:, off:off+n-first] = chunk[:, first:]
+        self._ints[_TOTAL] = total + n  # publish
+
+    def view(self, start, n):
+        """Zero-copy view of samples [start, start + n). Valid while intact(start)."""
+        total = self.total
+        if start + n > total or total - start > self.capacity:
+            raise ValueError(f"Samples [{start}, {start+n}) not in ring (total={total}).")
+        off = start % self.capacity
+        return self._buf[:, off:off+n]
+
+    def intact(self, start, margin=0):
+        """True if samples from `start` on cannot have been overwritten yet, allowing for
+        an in-flight (unpublished) writer chunk of `margin` samples."""
+        return self.total + margin - start <= self.capacity
+
+    # --- control header ---
+
+    @property
+    def status(self):
+        return int(self._ints[_STATUS])
+
+    @status.setter
+    def status(self, value):
+        self._ints[_STATUS] = value
+
+    @property
+    def stop_requested(self):
+        return bool(self._ints[_STOP])
+
+    def request_stop(self):
+        self._ints[_STOP] = 1
+
+    @property
+    def heartbeat(self):
+        return float(self._floats[_HEARTBEAT])
+
+    @heartbeat.setter
+    def heartbeat(self, t):
+        self._floats[_HEARTBEAT] = t
+
+    @property
+    def stim_mA(self):
+        return float(self._floats[_STIM])
+
+    @stim_mA.setter
+    def stim_mA(self, mA):
+        self._floats[_STIM] = mA
+
+    def close(self):
+        """Release this process's mapping; the owner also unlinks the block."""
+        self._ints = self._floats = self._buf = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # chunk views still alive somewhere; the mapping goes away with them
+        if self._owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -1,38 +1,83 @@
 
+from collections import namedtuple
+from functools import lru_cache
 import numpy as np
 
-def welch_bandpower(x, fs, fmin, fmax, nperseg=None, noverlap=None, detrend=True):
-    """Compute band power via simple Welch periodogram (NumPy only).
-    x: 1D array (samples)
-    fs: sampling rate (Hz)
-    Returns power in uV^2 (relative units if input is arbitrary).
+# np.trapz was renamed to np.trapezoid in NumPy 2.0 (and later removed)
+_trapz = getattr(np, 'trapezoid', None) or getattr(np, 'trapz')
+
+WelchPlan = namedtuple('WelchPlan', 'nperseg step window scale freqs')
+
+def seconds_to_samples(fs, seconds):
+    """Samples in `seconds` at `fs`, rounded to nearest. Sources, preprocessing and the
+    sliding estimators all size chunks / hops / windows with this, so they agree."""
+    return int(round(fs * seconds))
+
+@lru_cache(maxsize=64)
+def welch_plan(fs, n_samples, nperseg=None, noverlap=None):
+    """Precompute the window, normalization and frequency grid for a Welch PSD.
+    Cached per (fs, n_samples, nperseg, noverlap) so repeated ticks with the same
+    window length never rebuild them. Arrays are read-only since they are shared.
     """
-    x = np.asarray(x)
-    if detrend:
-        x = x - np.mean(x)
     if nperseg is None:
-        nperseg = min(len(x), 256)
+        nperseg = min(n_samples, 256)
     if noverlap is None:
         noverlap = nperseg // 2
     step = nperseg - noverlap
-    if nperseg <= 0 or step <= 0 or len(x) < nperseg:
-        # fallback to single FFT on full window
-        freqs = np.fft.rfftfreq(len(x), 1.0/fs)
-        psd = (np.abs(np.fft.rfft(x))**2) / (fs * len(x))
-        band = (freqs >= fmin) & (freqs <= fmax)
-        return float(np.trapz(psd[band], freqs[band]))
-    # segment
-    psds = []
-    for start in range(0, len(x)-nperseg+1, step):
-        seg = x[start:start+nperseg]
-        seg = seg * np.hanning(len(seg))
-        fft = np.fft.rfft(seg)
-        psd = (np.abs(fft)**2) / (fs * np.sum(np.hanning(len(seg))**2))
-        psds.append(psd)
-    psd = np.mean(psds, axis=0)
+    if nperseg <= 0 or step <= 0 or n_samples < nperseg:
+        # fallback to single (unwindowed) FFT on full window
+        nperseg, step = n_samples, n_samples
+        window = np.ones(n_samples)
+        scale = 1.0 / (fs * n_samples)
+    else:
+        window = np.hanning(nperseg)
+        scale = 1.0 / (fs * np.sum(window**2))
+    freqs = np.fft.rfftfreq(nperseg, 1.0/fs)
+    window.flags.writeable = False
+    freqs.flags.writeable = False
+    return WelchPlan(nperseg, step, window, scale, freqs)
+
+@lru_cache(maxsize=64)
+def band_weights(fs, nperseg, bands):
+    """Trapezoid weights [n_freqs, n_bands] so that `psd @ W` integrates every band.
+    bands: tuple of (fmin, fmax) pairs (hashable, for caching).
+    Equivalent to np.trapz(psd[band], freqs[band]) for each band.
+    """
     freqs = np.fft.rfftfreq(nperseg, 1.0/fs)
+    W = np.zeros((len(freqs), len(bands)))
+    for j, (fmin, fmax) in enumerate(bands):
+        idx = np.flatnonzero((freqs >= fmin) & (freqs <= fmax))
+        if len(idx) < 2:
+            continue
+        half_df = np.diff(freqs[idx]) / 2.0
+        W[idx[:-1], j] += half_df
+        W[idx[1:], j] += half_df
+    W.flags.writeable = False
+    return W
+
+def welch_psd(x, fs, nperseg=None, noverlap=None, detrend=True):
+    """Batched Welch PSD (NumPy only).
+    x: array [..., n_samples]; every leading axis (e.g. channels) is handled in one FFT.
+    Returns (freqs, psd) with psd shaped [..., n_freqs].
+    """
+    x = np.asarray(x, dtype=float)
+    if detrend:
+        x = x - np.mean(x, axis=-1, keepdims=True)
+    plan = welch_plan(fs, x.shape[-1], nperseg, noverlap)
+    segs = np.lib.stride_tricks.sliding_window_view(x, plan.nperseg, axis=-1)[..., ::plan.step, :]
+    fft = np.fft.rfft(segs * plan.window, axis=-1)
+    psd = (fft.real**2 + fft.imag**2).mean(axis=-2) * plan.scale
+    return plan.freqs, psd
+
+def welch_bandpower(x, fs, fmin, fmax, nperseg=None, noverlap=None, detrend=True):
+    """Compute band power via simple Welch periodogram (NumPy only).
+    x: 1D array (samples)
+    fs: sampling rate (Hz)
+    Returns power in uV^2 (relative units if input is arbitrary).
+    """
+    freqs, psd = welch_psd(x, fs, nperseg=nperseg, noverlap=noverlap, detrend=detrend)
     band = (freqs >= fmin) & (freqs <= fmax)
-    return float(np.trapz(psd[band], freqs[band]))
+    return float(_trapz(psd[band], freqs[band]))
 
 def ema(prev, new, alpha):
     if prev is None:
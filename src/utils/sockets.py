@@ -0,0 +1,9 @@
+
+import os, stat
+
+def is_socket(path):
+    """True if `path` is a Unix socket (a stale one left by an earlier run can be unlinked)."""
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,33 @@
+import numpy as np
+
+from src.processing.burst_detector import BetaBurstDetector, detect_bursts_batch
+
+def _streaming(vals, ts, **kw):
+    det = BetaBurstDetector(**kw)
+    on, off, z = [], [], []
+    for i, (v, t) in enumerate(zip(vals, ts)):
+        evt = det.update(v, timestamp=t)
+        z.append(evt['z_score'])
+        if evt['just_started']:
+            on.append(i)
+        if evt['just_ended']:
+            off.append(i)
+    return on, off, np.asarray(z)
+
+def test_batch_matches_streaming_over_grid():
+    rng = np.random.default_rng(3)
+    n = 3000
+    vals = rng.gamma(2.0, 1.0, n)
+    vals[500:560] += 8.0
+    vals[1800:1900] += 5.0
+    ts = np.arange(n) * 0.25
+    grid = [(1.5, 0.5, 1.0), (2.0, 0.5, 2.0), (1.0, 0.2, 0.0), (2.5, 1.0, 0.5), (1.0, -0.3, 0.5)]
+    zt, hy, md = (np.array(c) for c in zip(*grid))
+    res = detect_bursts_batch(vals, ts, ema_alpha=0.05, z_thresh=zt, hysteresis=hy, min_duration_sec=md)
+    for i, (z_thresh, hyst, min_dur) in enumerate(grid):
+        on, off, z = _streaming(vals, ts, ema_alpha=0.05, z_thresh=z_thresh, hysteresis=hyst,
+                                min_duration_sec=min_dur)
+        assert res['onsets'][i].tolist() == on
+        assert res['offsets'][i].tolist() == off
+        np.testing.assert_allclose(res['z_score'][i], z, rtol=1e-9, atol=1e-9)
+    assert res['active'].shape == (len(grid), n)
@@ -0,0 +1,53 @@
+import time
+
+import pytest
+import yaml
+
+from src.app.closed_loop import ClosedLoopSession
+from src.safety.safety_manager import SafetyManager
+from src.utils.clock import ScaledClock, VirtualClock, WallClock, make_clock
+
+def _safety(clock):
+    return SafetyManager(min_seconds_between_changes=30, max_session_minutes=1, log_fn=lambda msg: None,
+                         clock=clock)
+
+def test_virtual_clock_cooldown_and_session_limit():
+    clock = VirtualClock()
+    safety = _safety(clock)
+    assert safety.can_change_now()  # "never changed" counts as long ago
+    safety.mark_changed()
+    t0 = time.perf_counter()
+    clock.sleep(29.0)
+    assert not safety.can_change_now()
+    clock.sleep(1.0)
+    assert safety.can_change_now() and safety.within_session_limits()
+    clock.sleep(30.5)
+    assert not safety.within_session_limits()
+    assert time.perf_counter() - t0 < 0.1  # simulated minutes, no real waiting
+
+def test_scaled_clock_runs_the_same_rules_faster():
+    clock = ScaledClock(speed=200.0)
+    safety = _safety(clock)
+    safety.mark_changed()
+    t0 = time.perf_counter()
+    clock.sleep(30.0)
+    real = time.perf_counter() - t0
+    assert safety.can_change_now()
+    assert 0.1 <= real < 1.0  # 30 clock seconds in ~0.15 s
+    with pytest.raises(ValueError):
+        ScaledClock(speed=0)
+    assert isinstance(make_clock('wall'), WallClock) and isinstance(make_clock('wall', 4.0), ScaledClock)
+    assert isinstance(make_clock('virtual'), VirtualClock)
+
+def test_virtual_session_covers_its_length_without_waiting():
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    cfg.update(mode='simulation', clock='virtual', seconds=300)
+    cfg['safety']['require_human_confirm'] = False
+    clock = VirtualClock()
+    t0 = time.perf_counter()
+    m = ClosedLoopSession(cfg, clock=clock, log_fn=lambda msg: None).run()
+    assert m['ticks'] == 300 and m['seconds'] == pytest.approx(300.0)
+    assert time.perf_counter() - t0 < 30.0
+    # 30 s between changes: at most one change per change window, with ramps of >= 2 s
+    assert 0 < m['changes'] <= 300 // cfg['safety']['min_seconds_between_changes'] + 1
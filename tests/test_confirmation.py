@@ -0,0 +1,92 @@
+
+import os, queue
+
+import pytest
+import yaml
+
+from src.app.closed_loop import ClosedLoopSession
+from src.safety.confirmation import ConfirmationBroker, TerminalReader, send
+from src.utils.clock import VirtualClock
+
+def test_broker_matches_ids_and_expires(tmp_path):
+    clock = VirtualClock()
+    path = str(tmp_path / 'confirm.sock')
+    broker = ConfirmationBroker(socket_path=path, terminal=False, ttl_sec=5.0, clock=clock, log_fn=lambda msg: None)
+    try:
+        pid = broker.propose(1.0, 0.8)
+        assert send(path, 'status') == f"pending {pid} 1.000"
+        assert send(path, f"approve {pid + 7}") == 'queued'  # wrong id: ignored
+        assert broker.poll(0.8) == (None, None) and broker.pending.id == pid
+        send(path, f"y {pid}")
+        approved, denied = broker.poll(0.8)
+        assert approved.id == pid and approved.target_mA == 1.0 and denied is None
+        assert broker.pending is None
+
+        broker.propose(1.2, 1.0)
+        clock.sleep(6.0)
+        assert broker.poll(1.0) == (None, None) and broker.pending is None  # stale
+        broker.propose(1.2, 1.0)
+        assert broker.poll(0.9) == (None, None) and broker.pending is None  # output moved
+
+        send(path, 'stop')
+        broker.poll(0.0)
+        assert broker.estopped
+    finally:
+        broker.close()
+
+def test_late_approval_is_not_applied(tmp_path):
+    clock = VirtualClock()
+    path = str(tmp_path / 'confirm.sock')
+    broker = ConfirmationBroker(socket_path=path, terminal=False, ttl_sec=5.0, clock=clock, log_fn=lambda msg: None)
+    try:
+        pid = broker.propose(1.2, 1.0)
+        send(path, f"y {pid}")
+        clock.sleep(6.0)                    # the reply is queued, but read only after the TTL
+        assert broker.poll(1.0) == (None, None) and broker.pending is None
+        pid = broker.propose(1.2, 1.0)
+        send(path, f"y {pid}")
+        assert broker.poll(0.9) == (None, None)  # output moved within the same poll interval
+    finally:
+        broker.close()
+
+def test_session_keeps_ticking_until_approved(tmp_path):
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    cfg.update(mode='simulation', clock='virtual', seconds=600)
+    path = str(tmp_path / 'confirm.sock')
+    cfg['safety'].update(require_human_confirm=True, confirm_terminal=False, confirm_socket=path,
+                         confirm_timeout_sec=1000, min_seconds_between_changes=0)
+    session = ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None)
+    try:
+        for _ in range(5):
+            assert session.step()
+        p = session.confirm.pending
+        assert p is not None and session.metrics['changes'] == 0
+        send(path, f"approve {p.id}")
+        session.step()
+        assert session.metrics['changes'] == 1
+        send(path, 'q')
+        session.step()  # picked up by this tick's control stage
+        assert session.estopped and not session.stim.is_on
+        assert not session.step()
+    finally:
+        session.stop()
+
+def test_one_terminal_reader_and_no_unlinking_foreign_files(tmp_path):
+    r, w = os.pipe()
+    reader = TerminalReader(os.fdopen(r))
+    a, b, gone = queue.Queue(), queue.Queue(), queue.Queue()
+    reader.subscribe(gone)
+    reader.unsubscribe(gone)
+    reader.subscribe(a)
+    reader.subscribe(b)
+    with os.fdopen(w, 'w') as stream:   # lines arrive only after everyone subscribed
+        stream.write("y 1\nstop\n")
+    reader._thread.join(2.0)
+    assert list(a.queue) == list(b.queue) == ["y 1\n", "stop\n"] and gone.empty()
+
+    path = tmp_path / 'confirm.sock'
+    path.write_text('not a socket')
+    with pytest.raises(ValueError, match='not a socket'):
+        ConfirmationBroker(socket_path=str(path), terminal=False, log_fn=lambda msg: None)
+    assert path.read_text() == 'not a socket'
@@ -0,0 +1,150 @@
+
+import os
+import numpy as np
+import yaml
+
+from src.app.extract import extract_library, feature_params, load_manifest, params_hash
+from src.processing.burst_detector import BetaBurstDetector, detect_bursts_batch
+from src.processing.eeg_pipeline import EEGPipeline
+from src.processing.preprocess import make_preprocessor
+
+def _cfg():
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+def test_extracted_features_match_the_streaming_pipeline(tmp_path):
+    cfg = _cfg()
+    fs, n_ch = cfg['eeg']['fs'], 4
+    rng = np.random.default_rng(0)
+    t = np.arange(fs * 120) / fs
+    env = 1.0 + 2.0 * (np.sin(2 * np.pi * t / 17.0) > 0.6)  # recurring beta bursts
+    x = (env * np.sin(2 * np.pi * 20 * t) + rng.normal(size=(n_ch, t.size))).astype(np.float32)
+    os.makedirs(tmp_path / 'rec' / 'day1')
+    np.save(tmp_path / 'rec' / 'day1' / 'a.npy', x)
+    np.save(tmp_path / 'rec' / 'b.npy', x[:, :fs * 30])
+
+    params = feature_params(cfg)
+    out = str(tmp_path / 'out')
+    m = extract_library(str(tmp_path / 'rec'), out, params, workers=1, log_fn=lambda msg: None)
+    assert sorted(m['files']) == ['b.npy', os.path.join('day1', 'a.npy')]
+    cols = np.load(os.path.join(out, m['files'][os.path.join('day1', 'a.npy')]['output']))
+
+    # Reference: the session's per-chunk path (preprocessing -> EEGPipeline -> detector)
+    pre = make_preprocessor(cfg['eeg'], n_ch)
+    pipe = EEGPipeline(fs=fs, bands=cfg['eeg']['bands'], detrend=cfg['eeg']['detrend'],
+                       smoothing=cfg['biomarker']['smoothing'])
+    det = BetaBurstDetector(**cfg['burst_detector'])
+    n = int(fs * cfg['eeg']['chunk_sec'])
+    onsets = []
+    for k, start in enumerate(range(0, x.shape[1] - n + 1, n)):
+        feats = pipe.features(pre.process(x[:, start:start+n]))
+        evt = det.update(feats['beta_power_smooth'], timestamp=(start + n) / fs)
+        assert np.isclose(cols['beta_power'][k], feats['beta_power'], rtol=1e-9)
+        assert np.isclose(cols['beta_power_smooth'][k], feats['beta_power_smooth'], rtol=1e-9)
+        assert cols['burst_active'][k] == evt['active']
+        if evt['just_started']:
+            onsets.append((start + n) / fs)
+    assert len(onsets) > 0 and np.allclose(cols['burst_onset_t'], onsets)
+    assert cols['beta_power_ch'].shape == (x.shape[1] // n, n_ch)
+
+def test_rerun_skips_unchanged_inputs(tmp_path):
+    params = feature_params(_cfg())
+    rec = tmp_path / 'rec'
+    os.makedirs(rec)
+    x = np.random.default_rng(1).normal(size=(2, 250 * 20)).astype(np.float32)
+    np.save(rec / 'a.npy', x)
+    np.save(rec / 'b.npy', x)
+    out = str(tmp_path / 'out')
+    logs = []
+    extract_library(str(rec), out, params, workers=1, log_fn=logs.append)
+    assert '2 recordings, extracting or re-checking 2' in logs[0]
+
+    logs.clear()
+    os.utime(rec / 'a.npy', ns=(1, 1))          # touched, same content: hashed, not re-extracted
+    np.save(rec / 'b.npy', x[:, :250 * 10])     # changed content
+    m = extract_library(str(rec), out, params, workers=1, log_fn=logs.append)
+    assert 'extracting or re-checking 2' in logs[0]
+    assert any('a.npy: unchanged' in line for line in logs)
+    assert m['files']['b.npy']['n_windows'] == 10
+
+    logs.clear()
+    extract_library(str(rec), out, params, workers=1, log_fn=logs.append)
+    assert logs == ['[EXTRACT] 2 recordings, extracting or re-checking 0']
+    assert load_manifest(out)['files']['a.npy']['n_windows'] == 20
+
+def test_corrupt_recording_is_recorded_not_fatal(tmp_path):
+    params = feature_params(_cfg())
+    rec = tmp_path / 'rec'
+    os.makedirs(rec)
+    np.save(rec / 'a.npy', np.random.default_rng(2).normal(size=(2, 250 * 10)).astype(np.float32))
+    (rec / 'b.npy').write_bytes(b'not a numpy file')
+    np.savez(rec / 'c.npz', eeg=np.random.default_rng(3).normal(size=(2, 250 * 10)), fs=250.0)
+    out = str(tmp_path / 'out')
+    m = extract_library(str(rec), out, params, workers=1, log_fn=lambda msg: None)
+    assert 'error' in m['files']['b.npy'] and 'params_hash' not in m['files']['b.npy']
+    assert m['files']['a.npy']['n_windows'] == 10 and m['files']['c.npz']['n_windows'] == 10
+    assert load_manifest(out)['files']['b.npy']['error'] == m['files']['b.npy']['error']
+
+def test_burst_input_selects_the_detected_feature(tmp_path):
+    cfg = _cfg()
+    cfg['features'].update(burst_input='beta_rel', nodes={'beta_rel_ch': {'op': 'relative', 'band': 'beta'},
+                                                          'beta_rel': {'op': 'mean', 'input': 'beta_rel_ch'}})
+    rec = tmp_path / 'rec'
+    os.makedirs(rec)
+    np.save(rec / 'a.npy', np.random.default_rng(4).normal(size=(2, 250 * 30)).astype(np.float32))
+    params = feature_params(cfg)
+    m = extract_library(str(rec), str(tmp_path / 'out'), params, workers=1, log_fn=lambda msg: None)
+    cols = np.load(tmp_path / 'out' / m['files']['a.npy']['output'])
+    bands = list(cfg['eeg']['bands'])
+    rel = cols['beta_power_ch'] / sum(cols[f"{b}_power_ch"] for b in bands)
+    use = cols['good_ch'] | ~cols['good_ch'].any(axis=1, keepdims=True)
+    np.testing.assert_allclose(cols['beta_rel'], (rel * use).sum(axis=1) / use.sum(axis=1))
+    ev = detect_bursts_batch(cols['beta_rel'], cols['t'], **cfg['burst_detector'])
+    np.testing.assert_array_equal(cols['burst_active'], ev['active'][0])
+    assert feature_params(_cfg())['features'] != params['features']
+
+def test_quality_gate_drops_the_channels_a_replayed_session_drops(tmp_path):
+    from src.app.closed_loop import ClosedLoopSession
+    from src.recording.session_recorder import SessionRecorder, SessionReader
+    from src.utils.clock import VirtualClock
+    cfg = _cfg()
+    fs = cfg['eeg']['fs']
+    rng = np.random.default_rng(5)
+    t = np.arange(fs * 20) / fs
+    x = np.sin(2 * np.pi * 20 * t) + rng.normal(scale=0.5, size=(4, t.size))
+    x[2, fs * 5:fs * 12] *= 2000.0                  # an electrode pop on one channel
+    rec = tmp_path / 'rec'
+    os.makedirs(rec)
+    np.save(rec / 'a.npy', x)
+    params = feature_params(cfg)
+    m = extract_library(str(rec), str(tmp_path / 'out'), params, workers=1, log_fn=lambda msg: None)
+    cols = np.load(tmp_path / 'out' / m['files']['a.npy']['output'])
+    assert not cols['good_ch'][6, 2] and cols['good_channels'].min() == 3
+
+    cfg.update(mode='replay', seconds=10**6, replay={'path': str(rec / 'a.npy')})
+    cfg['eeg']['n_channels'] = 4
+    cfg['safety']['require_human_confirm'] = False
+    recorder = SessionRecorder(str(tmp_path / 'session'), log_fn=lambda msg: None)
+    ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None, recorder=recorder).run()
+    feats = SessionReader(str(tmp_path / 'session')).table('features')
+    np.testing.assert_allclose(cols['beta_power'], feats['beta_power'], rtol=1e-9)
+    np.testing.assert_array_equal(cols['good_channels'], feats['good_channels'])
+    assert params_hash(params) != params_hash(feature_params(dict(cfg, quality={'enabled': False})))
+
+def test_overlapping_windows_use_the_sessions_sliding_plan(tmp_path):
+    from src.processing.spectral import SlidingWelch
+    cfg = _cfg()
+    cfg['quality']['enabled'] = False
+    fs = cfg['eeg']['fs']
+    x = np.random.default_rng(6).normal(size=(3, fs * 10))
+    rec = tmp_path / 'rec'
+    os.makedirs(rec)
+    np.save(rec / 'a.npy', x)
+    params = feature_params(cfg, window_sec=2.0, hop_sec=0.25)   # 62-sample hop: step 124, not 128
+    m = extract_library(str(rec), str(tmp_path / 'out'), params, workers=1, log_fn=lambda msg: None)
+    cols = np.load(tmp_path / 'out' / m['files']['a.npy']['output'])
+    pre = make_preprocessor(cfg['eeg'], 3)
+    sw = SlidingWelch(fs, cfg['eeg']['bands'], 3, window_sec=2.0, hop_sec=0.25)
+    ref = [sw.push(pre.process(x[:, e - sw.hop:e])) for e in range(sw.hop, x.shape[1] + 1, sw.hop)]
+    ref = np.array([bp[:, 0].mean() for bp in ref if bp is not None])
+    np.testing.assert_allclose(cols['beta_power'], ref, rtol=1e-9)
@@ -0,0 +1,62 @@
+
+import numpy as np
+import pytest
+import yaml
+
+from src.app.closed_loop import ClosedLoopSession
+from src.processing.feature_graph import FeatureGraph
+from src.utils.clock import VirtualClock
+
+BANDS = ['beta', 'alpha', 'theta', 'gamma']
+NODES = {'beta_rel': {'op': 'relative', 'band': 'beta', 'over': ['beta', 'alpha', 'theta']},
+         'alpha_rel': {'op': 'relative', 'band': 'alpha', 'over': ['beta', 'alpha', 'theta']},
+         'rel_ratio': {'op': 'ratio', 'inputs': ['beta_rel', 'alpha_rel']},
+         'beta_left': {'op': 'mean', 'input': 'beta', 'group': 'left'},
+         'left_smooth': {'op': 'ema', 'input': 'beta_left', 'alpha': 0.5},
+         'unused': {'op': 'mean', 'input': 'gamma'}}
+
+def test_graph_values_slots_and_laziness():
+    g = FeatureGraph(BANDS, 4, ['left_smooth', 'rel_ratio', 'beta_power'], nodes=NODES, groups={'left': [0, 1]})
+    assert g.slots == {'left_smooth': slice(0, 1), 'rel_ratio': slice(1, 5), 'beta_power': slice(5, 6)}
+    plan = [name for name, _ in g.plan]
+    assert 'unused' not in plan and plan.count('_sum:beta+alpha+theta') == 1  # band sum shared
+    assert [b for _, b in g.leaves] == ['beta', 'alpha', 'theta']              # gamma never read
+    rng = np.random.default_rng(0)
+    bp1, bp2 = rng.uniform(1, 2, size=(2, 4, 4))
+    g.evaluate(bp1)
+    out = g.evaluate(bp2)
+    assert out is g.values
+    assert g.value('left_smooth') == pytest.approx(0.5 * bp2[:2, 0].mean() + 0.5 * bp1[:2, 0].mean())
+    np.testing.assert_allclose(g.value('rel_ratio'), bp2[:, 0] / bp2[:, 1])
+    assert g.value('beta_power') == pytest.approx(bp2[:, 0].mean())
+    with pytest.raises(ValueError, match='cycle'):
+        FeatureGraph(BANDS, 4, ['a'], nodes={'a': {'op': 'ema', 'input': 'b'}, 'b': {'op': 'mean', 'input': 'a'}})
+
+def test_session_ml_inputs_from_graph(tmp_path):
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    cfg.update(mode='simulation', clock='virtual', seconds=30)
+    cfg['safety']['require_human_confirm'] = False
+    rng = np.random.default_rng(1)
+    np.savez(tmp_path / 'w.npz', W1=rng.normal(size=(4, 8)), b1=np.zeros(8), W2=rng.normal(size=(8, 1)), b2=np.zeros(1))
+    cfg['controller'].update(kind='ml_policy', weights_path=str(tmp_path / 'w.npz'))
+    cfg['features'] = {'ml_inputs': ['beta_power_smooth', 'alpha_power', 'beta_alpha_ratio', 'beta_left'],
+                       'groups': {'left': [0, 1, 2]}, 'nodes': {'beta_left': {'op': 'mean', 'input': 'beta', 'group': 'left'}}}
+    session = ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None)
+    try:
+        session.start()
+        feats, _ = session.process(session.acquire())
+        bp = session.last_bandpowers
+        # the graph is the only feature source: first tick, the smoothed marker is the raw mean
+        assert feats['beta_power_smooth'] == pytest.approx(bp[:, 0].mean()) and feats['beta_left'] == bp[:3, 0].mean()
+        np.testing.assert_allclose(session.ml_features(feats),
+                                   [feats['beta_power_smooth'], feats['alpha_power'], feats['beta_alpha_ratio'],
+                                    bp[:3, 0].mean()], rtol=1e-12)
+    finally:
+        session.stop()
+    cfg['features']['ml_inputs'] = ['beta_power_smooth']
+    with pytest.raises(ValueError, match='expects 4'):
+        ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None)
+    cfg['features']['ml_inputs'] = ['beta_power_smooth', 'alpha_power', 'beta_left', 'beta_left']
+    with pytest.raises(ValueError, match='more than once'):
+        ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None)
@@ -0,0 +1,31 @@
+
+import numpy as np
+
+from src.streaming.lsl_local import LocalOutlet, LocalInlet
+from src.streaming.lsl_client import EEGSource
+
+def test_partial_pulls_are_accumulated_without_loss():
+    outlet = LocalOutlet(n_channels=16, fs=1000, clock_offset=0.25)
+    src = EEGSource(mode='lsl', fs=1000, n_channels=8, chunk_sec=0.1,
+                    inlet=LocalInlet(outlet), log_fn=lambda msg: None)
+    data = np.random.default_rng(0).normal(size=(1000, 16)).astype(np.float32)
+    for start in range(0, 1000, 37):  # pushes never line up with the 100-sample chunks
+        outlet.push_chunk(data[start:start+37])
+    chunks = [np.array(src.next_chunk()) for _ in range(10)]
+    got = np.concatenate(chunks, axis=1)
+    assert got.shape == (8, 1000)
+    assert np.array_equal(got, data[:, :8].T)
+    stats = src.ingest.stats()
+    assert stats['overruns'] == 0 and stats['clock_offset_sec'] == -0.25
+    assert np.isclose(stats['effective_fs'], 1000.0)
+
+def test_pull_buffer_follows_the_stream_channel_format():
+    from src.streaming.lsl_ingest import LSLIngestor
+    data = np.random.default_rng(1).normal(scale=1000, size=(200, 4))
+    for fmt, expect in ((2, data), (5, data.astype(np.int16)), (7, data.astype(np.int64))):  # double, int16, int64
+        outlet = LocalOutlet(n_channels=4, fs=250, channel_format=fmt)
+        ingest = LSLIngestor(LocalInlet(outlet), 4, 250)
+        outlet.push_chunk(expect)
+        assert ingest.wait_for(200, timeout=0.5)
+        got, _ = ingest.read(200)
+        np.testing.assert_allclose(got, expect.T, rtol=1e-12 if fmt == 2 else 0)
@@ -0,0 +1,58 @@
+
+import numpy as np
+import yaml
+
+from src.app.closed_loop import ClosedLoopSession
+
+from src.app.metrics import STAGES, StreamingHistogram, LoopInstrumentation
+from src.utils.clock import VirtualClock
+
+def test_histogram_quantiles_within_bucket_error():
+    x = np.random.default_rng(0).lognormal(mean=-7, sigma=1.0, size=20000)
+    h = StreamingHistogram()
+    for v in x:
+        h.add(float(v))
+    for q in (0.5, 0.95, 0.99):
+        assert abs(h.quantile(q) / np.quantile(x, q) - 1) < 0.13
+    assert h.max == x.max() and h.count == len(x)
+
+def test_prometheus_export_counts_deadline_misses(tmp_path):
+    inst = LoopInstrumentation(1.0, stage_deadlines_sec={'features': 0.01},
+                               prom_path=str(tmp_path / 'loop.prom'), export_every_sec=None)
+    inst.record('features', 0.02)
+    inst.record('features', 0.001)
+    inst.end_tick()
+    inst.export()
+    text = (tmp_path / 'loop.prom').read_text()
+    assert 'closed_loop_deadline_misses_total{stage="features"} 1' in text
+    assert 'closed_loop_stage_seconds_count{stage="features"} 2' in text
+
+def test_session_times_every_stage_it_runs():
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    cfg.update(mode='simulation', clock='virtual', seconds=10)
+    cfg['safety']['require_human_confirm'] = False
+    inst = LoopInstrumentation(1.0, export_every_sec=None)
+    ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None, instrumentation=inst).run()
+    assert set(inst.hist) == set(STAGES)
+    assert inst.hist['quality'].count == inst.hist['features'].count > 0
+
+def test_tick_busy_counts_each_tick_once_across_threads():
+    import threading
+    inst = LoopInstrumentation(1.0, export_every_sec=None)
+    handoff = []
+
+    def processing():
+        for _ in range(100):
+            inst.record('features', 0.002)
+            handoff.append(inst.take_busy())
+    t = threading.Thread(target=processing)
+    t.start()
+    t.join()
+    for busy in handoff:          # control thread: its own share plus the one handed over
+        inst.add_busy(busy)
+        inst.record('policy', 0.001)
+        inst.end_tick()
+    s = inst.snapshot()
+    assert s['ticks'] == 100 and s['stages_sec']['features']['count'] == 100
+    assert abs(s['tick_busy_sec']['max'] - 0.003) < 1e-12 and abs(s['tick_busy_sec']['mean'] - 0.003) < 1e-12
@@ -0,0 +1,33 @@
+import os
+import numpy as np
+
+from src.policy.ml_policy import MLPolicy
+
+def test_deep_mlp_matches_reference(tmp_path):
+    rng = np.random.default_rng(0)
+    w = dict(W1=rng.normal(size=(3, 16)), b1=rng.normal(size=16), W2=rng.normal(size=(16, 8)),
+             b2=rng.normal(size=8), W3=rng.normal(size=(8, 1)), b3=rng.normal(size=1),
+             x_mean=np.array([3.0, 6.0, 0.5]), x_std=np.array([2.0, 3.0, 0.2]))
+    np.savez(tmp_path / 'w.npz', **w)
+    os.makedirs(tmp_path / 'npy')
+    for k, v in w.items():
+        np.save(tmp_path / 'npy' / f'{k}.npy', v)
+    X = rng.normal(size=(20, 3)) * 2.0 + 4.0
+    h = (X - w['x_mean']) / w['x_std']
+    h = np.maximum(0, h @ w['W1'] + w['b1'])
+    h = np.maximum(0, h @ w['W2'] + w['b2'])
+    ref = (h @ w['W3'] + w['b3'])[:, 0]
+    for path in (tmp_path / 'w.npz', tmp_path / 'npy'):
+        ml = MLPolicy(str(path))
+        np.testing.assert_allclose(ml.predict_batch(X), ref, rtol=1e-4, atol=1e-3)
+        np.testing.assert_allclose([ml.predict_mA(x) for x in X], ref, rtol=1e-4, atol=1e-3)
+
+def test_zero_std_input_is_left_unscaled_and_extra_npz_arrays_are_ignored(tmp_path):
+    rng = np.random.default_rng(1)
+    w = dict(W1=rng.normal(size=(2, 4)), b1=rng.normal(size=4), W2=rng.normal(size=(4, 1)), b2=rng.normal(size=1),
+             x_mean=np.array([1.0, 2.0]), x_std=np.array([0.5, 0.0]))
+    np.savez(tmp_path / 'w.npz', history=np.zeros((3, 3)), **w)
+    ml = MLPolicy(str(tmp_path / 'w.npz'))
+    X = rng.normal(size=(5, 2))
+    h = np.maximum(0, (X - w['x_mean']) / [0.5, 1.0] @ w['W1'] + w['b1'])
+    np.testing.assert_allclose(ml.predict_batch(X), (h @ w['W2'] + w['b2'])[:, 0], rtol=1e-4, atol=1e-4)
@@ -0,0 +1,42 @@
+import numpy as np
+
+from src.processing.preprocess import Preprocessor, butter_bandpass_sos
+
+def _gain(sos, f, fs):
+    z = np.exp(-2j * np.pi * f / fs * np.arange(3))
+    return abs(np.prod([(s[:3] @ z) / (s[3:] @ z) for s in sos]))
+
+def test_bandpass_design():
+    sos = butter_bandpass_sos(13.0, 30.0, 250, order=4)
+    assert abs(_gain(sos, 13.0, 250) - 2 ** -0.5) < 1e-6
+    assert abs(_gain(sos, 30.0, 250) - 2 ** -0.5) < 1e-6
+    assert _gain(sos, 60.0, 250) < 0.01
+
+def test_chunked_stream_matches_one_pass_and_removes_line_noise():
+    fs = 1000
+    t = np.arange(4 * fs) / fs
+    x = np.stack([np.sin(2 * np.pi * 20 * t) + np.sin(2 * np.pi * 50 * t)] * 3)
+    x += np.random.default_rng(0).normal(scale=0.1, size=x.shape)
+    kw = dict(notch_hz=50.0, bandpass=(1.0, 45.0), decimate=4)
+    whole = Preprocessor(fs, 3, **kw).process(x)
+    pre = Preprocessor(fs, 3, **kw)
+    cuts = [0, 7, 250, 333, 1999, 4000]
+    chunked = np.concatenate([pre.process(x[:, a:b]) for a, b in zip(cuts[:-1], cuts[1:])], axis=1)
+    np.testing.assert_allclose(chunked, whole, atol=1e-10)
+    assert pre.fs_out == 250 and whole.shape == (3, 1000)
+    spec = np.abs(np.fft.rfft(whole[0, 250:]))  # 3 s after settling, 1/3 Hz bins
+    assert spec[3 * 50] < 0.02 * spec[3 * 20]
+
+def test_session_rejects_a_hop_that_does_not_decimate_evenly():
+    import pytest, yaml
+    from src.app.closed_loop import ClosedLoopSession
+    from src.utils.clock import VirtualClock
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    cfg.update(mode='simulation', seconds=5)
+    cfg['safety']['require_human_confirm'] = False
+    cfg['eeg'].update(fs=1000, decimate=3, hop_sec=0.097, window_sec=0.768)
+    with pytest.raises(ValueError, match='decimated by 3'):
+        ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None)
+    cfg['eeg']['hop_sec'] = 0.096
+    assert ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None).run()['ticks'] > 0
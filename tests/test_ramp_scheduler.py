@@ -0,0 +1,81 @@
+import time
+import pytest
+
+from src.hardware.ramp_scheduler import RampScheduler
+from src.hardware.stimulator_api import StimulatorAPI
+from src.utils.clock import VirtualClock
+
+class StepStim(StimulatorAPI):
+    """Per-step stimulator (no waveforms) that records every output command."""
+    def __init__(self, clock=None, fail_above=None):
+        super().__init__(clock=clock)
+        self.sent = []
+        self.fail_above = fail_above
+
+    def _apply_output(self, mA):
+        if self.fail_above is not None and mA > self.fail_above:
+            raise RuntimeError(f"{mA:.2f} mA rejected")
+        self.sent.append(mA)
+
+def test_ramp_returns_at_once_and_follows_the_clock():
+    clock = VirtualClock()
+    stim = StepStim(clock)
+    stim.start()
+    ramp = RampScheduler(stim, clock=clock)
+    t0 = clock.now()
+    assert ramp.ramp_to(2.0, seconds=1.0)
+    assert clock.now() == t0 and ramp.active and ramp.target == 2.0
+    levels = []
+    while ramp.poll():
+        levels.append(stim.current_mA)
+        clock.sleep(0.25)
+    levels.append(stim.current_mA)
+    assert levels == pytest.approx([0.0, 0.5, 1.0, 1.5, 2.0])
+    assert not ramp.active and ramp.target is None
+
+def test_retarget_cancel_and_safe_stop():
+    clock = VirtualClock()
+    stim = StepStim(clock)
+    stim.start()
+    ramp = RampScheduler(stim, clock=clock)
+    ramp.ramp_to(2.0, seconds=1.0)
+    clock.sleep(0.5)
+    ramp.poll()
+    assert stim.current_mA == pytest.approx(1.0)
+    ramp.ramp_to(0.0, seconds=1.0)       # re-target from the present level, not the old start
+    clock.sleep(0.5)
+    ramp.poll()
+    assert stim.current_mA == pytest.approx(0.5)
+    ramp.cancel()
+    clock.sleep(1.0)
+    assert not ramp.poll() and stim.current_mA == pytest.approx(0.5)
+    ramp.ramp_to(2.0, seconds=1.0)
+    ramp.safe_stop()
+    assert not ramp.active and not stim.is_on
+    assert stim.current_mA == 0.0 and stim.sent[-1] == 0.0
+
+def test_failed_output_stops_and_blocks_new_ramps():
+    clock = VirtualClock()
+    stim = StepStim(clock, fail_above=1.0)
+    stim.start()
+    ramp = RampScheduler(stim, clock=clock)
+    ramp.ramp_to(2.0, seconds=1.0)
+    while ramp.poll():
+        clock.sleep(0.25)
+    assert 'rejected' in ramp.fault
+    assert not stim.is_on and stim.current_mA == 0.0
+    assert ramp.ramp_to(0.5, seconds=1.0) is False
+
+def test_threaded_ramp_runs_without_polling():
+    stim = StepStim()
+    stim.start()
+    ramp = RampScheduler(stim, step_sec=0.01, threaded=True)
+    try:
+        ramp.ramp_to(1.0, seconds=0.1)
+        deadline = time.monotonic() + 2.0
+        while ramp.active and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not ramp.active and stim.current_mA == 1.0
+        assert len(stim.sent) > 1        # applied in steps, not one jump
+    finally:
+        ramp.close()
@@ -0,0 +1,52 @@
+
+import numpy as np
+
+from src.recording.session_recorder import SessionRecorder, SessionReader
+
+def test_recording_round_trip(tmp_path):
+    rec = SessionRecorder(str(tmp_path / 'rec'), segment_rows=3, eeg_segment_samples=500,
+                          log_fn=lambda msg: None)
+    chunks = [np.random.default_rng(i).normal(size=(4, 250)) for i in range(5)]
+    for i, chunk in enumerate(chunks):
+        rec.record_eeg(float(i), chunk)
+        rec.record('features', t=float(i), beta_power=float(i) * 2, active=bool(i % 2))
+    rec.close()
+
+    r = SessionReader(str(tmp_path / 'rec'))
+    assert r.eeg().dtype == np.float64 and np.array_equal(r.eeg(), np.concatenate(chunks, axis=1))
+    assert len(r.index['streams']['eeg']['segments']) == 3
+    feats = r.table('features')
+    assert feats['beta_power'].tolist() == [0.0, 2.0, 4.0, 6.0, 8.0]
+    assert feats['active'].tolist() == [False, True, False, True, False]
+    assert r.table('eeg_ticks')['sample_start'].tolist() == [0, 250, 500, 750, 1000]
+
+def test_eeg_downcast_is_opt_in(tmp_path):
+    chunk = np.random.default_rng(0).normal(size=(2, 100))
+    rec = SessionRecorder(str(tmp_path / 'rec'), eeg_dtype='float32', log_fn=lambda msg: None)
+    rec.record_eeg(0.0, chunk)
+    rec.close()
+    eeg = SessionReader(str(tmp_path / 'rec')).eeg()
+    assert eeg.dtype == np.float32 and np.allclose(eeg, chunk, atol=1e-6)
+
+def test_writer_failure_is_reported_and_never_blocks(tmp_path):
+    logs = []
+    rec = SessionRecorder(str(tmp_path / 'rec'), segment_rows=2, max_queue=4, log_fn=logs.append)
+    rec.record('features', t=0.0, beta_power=1.0)
+    rec.record('features', t=1.0)  # mismatched keys: the segment cannot be written
+    for i in range(50):
+        rec.record('features', t=float(i), beta_power=1.0)
+    rec.close(timeout=5.0)
+    assert rec.failed.startswith('KeyError') and not rec._thread.is_alive()
+    assert any('Recording failed' in m for m in logs)
+
+def test_rate_limited_log_uses_session_time_and_keeps_events():
+    from src.utils.clock import VirtualClock
+    from src.utils.logsink import RateLimitedLog
+    clock, out = VirtualClock(), []
+    log = RateLimitedLog(out.append, min_interval_sec=1.0, clock=clock)
+    for i in range(4):
+        log(f"[EEG] tick {i}")
+        log(f"[BURST] event {i}")
+        clock.sleep(0.5)
+    assert out == ['[EEG] tick 0', '[BURST] event 0', '[BURST] event 1',
+                   '[EEG] tick 2 (+1 suppressed)', '[BURST] event 2', '[BURST] event 3']
@@ -0,0 +1,28 @@
+
+import numpy as np
+import yaml
+
+from src.app.closed_loop import ClosedLoopSession
+from src.recording.session_recorder import SessionRecorder, SessionReader
+from src.utils.clock import VirtualClock
+
+def _replay(cfg, rec_dir):
+    rec = SessionRecorder(rec_dir, log_fn=lambda msg: None)
+    session = ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None, recorder=rec)
+    return session.run(), SessionReader(rec_dir)
+
+def test_replay_is_bit_reproducible(tmp_path):
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    eeg = np.random.default_rng(0).normal(size=(8, 250 * 120))
+    np.save(tmp_path / 'eeg.npy', eeg)
+    cfg.update(mode='replay', seconds=10**6, replay={'path': str(tmp_path / 'eeg.npy')})
+    cfg['controller']['kind'] = 'bandpower_pid'
+    cfg['safety']['require_human_confirm'] = False
+
+    m1, r1 = _replay(cfg, str(tmp_path / 'a'))
+    m2, r2 = _replay(cfg, str(tmp_path / 'b'))
+    assert m1 == m2 and m1['ticks'] == 120
+    assert r1.eeg().dtype == eeg.dtype and np.array_equal(r1.eeg(), eeg)
+    for stream in ('features', 'bursts', 'control', 'stim'):
+        assert r1.table(stream).tobytes() == r2.table(stream).tobytes()
@@ -0,0 +1,23 @@
+import copy
+import yaml
+
+from src.app.closed_loop import ClosedLoopSession
+from src.app.session_host import SessionHost
+from src.utils.clock import VirtualClock
+
+def test_host_matches_independent_sessions():
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    cfg.update(mode='simulation', clock='virtual', seconds=180)
+    cfg['safety']['require_human_confirm'] = False
+    cfgs = [copy.deepcopy(cfg) for _ in range(3)]
+    cfgs[1]['controller']['kind'] = 'bandpower_pid'
+    cfgs[2]['safety']['max_session_minutes'] = 1  # ends early; the others keep running
+
+    ref = [ClosedLoopSession(copy.deepcopy(c), clock=VirtualClock(), log_fn=lambda msg: None, seed=42 + i).run()
+           for i, c in enumerate(cfgs)]
+    host = SessionHost(cfgs, clock=VirtualClock(), log_fn=lambda msg: None)
+    # the host's batched pass is the only feature path: no per-session pipeline, filters or gate
+    assert all(s.pipe is None and s.pre is None and s.quality is host.quality for s in host.sessions)
+    assert host.run() == ref
+    assert ref[2]['ticks'] < ref[0]['ticks']
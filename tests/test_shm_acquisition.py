@@ -0,0 +1,65 @@
+import numpy as np
+
+from src.processing.channel_pool import ChannelGroupPool
+from src.processing.spectral import SpectralEngine
+from src.streaming.acquisition_process import ProcessAcquisition
+from src.utils.shm_ring import SharedRing
+
+BANDS = {'beta': [13.0, 30.0], 'alpha': [8.0, 12.0]}
+
+def test_shared_ring_wraps_and_detects_overwrite():
+    ring = SharedRing(2, 100)
+    reader = SharedRing.attach(ring.spec)
+    data = np.arange(2 * 250, dtype=np.float32).reshape(2, 250)
+    for i in range(0, 250, 30):
+        ring.write(data[:, i:i+30])
+    assert reader.total == 250
+    np.testing.assert_array_equal(reader.view(170, 80), data[:, 170:250])
+    assert reader.intact(150) and not reader.intact(149)
+    reader.close()
+    ring.close()
+
+def test_process_acquisition_is_lossless(tmp_path):
+    eeg = np.random.default_rng(0).normal(size=(8, 500)).astype(np.float32)
+    np.save(tmp_path / 'eeg.npy', eeg)
+    src = ProcessAcquisition(mode='replay', fs=250, n_channels=8, chunk_sec=0.2, log_fn=lambda msg: None,
+                             replay_path=str(tmp_path / 'eeg.npy'))
+    pool = ChannelGroupPool(src.ring.spec, 250, BANDS, window_samples=250, n_workers=2)
+    try:
+        chunks = []
+        while not src.exhausted:
+            chunks.append(np.array(src.next_chunk()))
+        np.testing.assert_array_equal(np.concatenate(chunks, axis=1), eeg)
+        np.testing.assert_allclose(pool.bandpowers(src.read_pos),
+                                   SpectralEngine(250, BANDS).bandpowers(eeg[:, -250:]), rtol=1e-5)
+    finally:
+        pool.close()
+        src.close()
+
+class _EndsMidRead:
+    """Source whose stream ends while next_chunk() waits, as a process replay can."""
+    def __init__(self, src, chunks):
+        self.src, self.left, self.exhausted = src, chunks, False
+
+    def __getattr__(self, name):
+        return getattr(self.src, name)
+
+    def next_chunk(self, n_samples=None):
+        if self.left == 0:
+            self.exhausted = True
+            raise EOFError("Acquisition ended.")
+        self.left -= 1
+        return self.src.next_chunk(n_samples)
+
+def test_stream_end_during_read_ends_the_session(tmp_path):
+    import yaml
+    from src.app.closed_loop import ClosedLoopSession
+    from src.utils.clock import VirtualClock
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    cfg.update(mode='simulation', seconds=600)
+    cfg['safety']['require_human_confirm'] = False
+    session = ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None)
+    session.src = _EndsMidRead(session.src, chunks=3)
+    metrics = session.run()
+    assert metrics['ticks'] == 3 and not session.stim.is_on
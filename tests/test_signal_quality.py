@@ -0,0 +1,92 @@
+
+import numpy as np
+import yaml
+
+from src.app.closed_loop import ClosedLoopSession
+from src.processing.eeg_pipeline import EEGPipeline
+from src.processing.signal_quality import CLIP, FLAT, HF, LINE, RANGE, SignalQualityGate
+from src.utils.clock import VirtualClock
+
+FS = 250
+BANDS = {'theta': [4, 8], 'alpha': [8, 12], 'beta': [13, 30]}
+
+def test_flags_per_channel_from_shared_spectrum():
+    rng = np.random.default_rng(0)
+    t = np.arange(2 * FS) / FS
+    x = rng.normal(0, 10, size=(6, len(t)))
+    x[1] = 0.01 * rng.normal(size=len(t))                   # flat
+    x[2] = np.clip(x[2] * 5, -20, 20)                        # railed
+    x[3] += 80 * np.sin(2 * np.pi * 50 * t)                  # mains
+    x[4] += 60 * np.sin(2 * np.pi * 90 * t)                  # EMG-like
+    x[5, 100:110] += 2000                                    # electrode pop
+    pipe = EEGPipeline(fs=FS, bands=BANDS, chunk_sec=2.0)
+    bp = pipe.bandpowers(x)
+    gate = SignalQualityGate(FS)
+    good = gate.assess(x, *pipe.last_spectrum)
+    assert good.tolist() == [True, False, False, False, False, False]
+    assert all(gate.flags[c] & bit for c, bit in zip(range(1, 6), (FLAT, CLIP, LINE, HF, RANGE)))
+    feats = pipe.features_from_bandpowers(bp, good)
+    assert feats['beta_power'] == bp[0, list(BANDS).index('beta')]
+    # batched over sessions: same verdicts per row
+    np.testing.assert_array_equal(gate.assess(np.stack([x, x]))[1], gate.assess(x[None])[0])
+
+def test_session_holds_output_on_bad_signal():
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    cfg.update(mode='simulation', clock='virtual', seconds=20)
+    cfg['safety']['require_human_confirm'] = False
+    logs = []
+    session = ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=logs.append)
+    next_chunk = session.src.next_chunk
+    def flat_chunk():
+        chunk = next_chunk()
+        chunk[1:] = 0.0  # all but one electrode disconnected
+        return chunk
+    session.src.next_chunk = flat_chunk
+    metrics = session.run()
+    assert metrics['low_quality_ticks'] > 0
+    assert metrics['changes'] == 0 and session.stim.current_mA == 0.0
+    assert any('good EEG channels' in m for m in logs) and any('[QUALITY] bad channels' in m for m in logs)
+
+def test_hop_mode_checks_the_analysis_window():
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    cfg.update(mode='simulation', clock='virtual', seconds=60)
+    cfg['eeg']['hop_sec'] = 0.1  # 25-sample hops; a lone max/min in them is not clipping
+    cfg['safety']['require_human_confirm'] = False
+    session = ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None)
+    metrics = session.run()
+    assert metrics['low_quality_ticks'] == 0 and metrics['changes'] > 0
+    assert session.pipe.last_window.shape[-1] == int(cfg['eeg']['fs'] * cfg['eeg']['chunk_sec'])
+    # short clean noise passes, a railed stretch does not
+    x = np.random.default_rng(2).normal(0, 10, size=(2, 25))
+    x[1, 5:15] = x[1].max()
+    assert SignalQualityGate(FS).assess(x).tolist() == [True, False]
+
+def test_sdft_backend_has_no_spectrum_for_the_ratios():
+    t = np.arange(FS) / FS
+    x = np.random.default_rng(3).normal(0, 10, size=(2, FS)) + 30 * np.sin(2 * np.pi * 50 * t)
+    pipe = EEGPipeline(fs=FS, bands={'gamma': [40, 60]}, chunk_sec=1.0, hop_sec=0.25, feature_backend='sdft')
+    pipe.bandpowers(x)
+    assert pipe.last_spectrum == (None, None)
+    assert SignalQualityGate(FS).assess(pipe.last_window, *pipe.last_spectrum).all()
+
+def test_default_config_gates_the_raw_samples_not_the_notched_ones():
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    cfg.update(mode='simulation', clock='virtual', seconds=5)
+    cfg['safety']['require_human_confirm'] = False
+    assert cfg['eeg']['notch_hz'] == cfg['quality']['line_hz']
+    session = ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None)
+    next_chunk = session.src.next_chunk
+    def faulty_chunk():
+        chunk = next_chunk()
+        t = np.arange(chunk.shape[1]) / cfg['eeg']['fs']
+        chunk[0] += 40 * np.sin(2 * np.pi * 50 * t)   # mains the notch would remove
+        chunk[1] = np.clip(chunk[1], -0.5, 0.5)       # railed, rounded off by the filter
+        return chunk
+    session.src.next_chunk = faulty_chunk
+    session.run()
+    flags = session.quality.flags
+    assert flags[0] & LINE and flags[1] & CLIP
+    assert not flags[2:].any()
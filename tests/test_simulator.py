@@ -0,0 +1,44 @@
+import numpy as np
+
+from src.processing.spectral import SpectralEngine
+from src.streaming.simulator import VirtualSubjects
+
+FIXED = {'beta_base': 2.0, 'beta_hz': 20.0, 'alpha_hz': 10.0, 'stim_gain': 0.5, 'tau_sec': 10.0,
+         'burst_rate_hz': 0.1, 'burst_stim_k': 1.0, 'burst_gain': 2.0, 'burst_sec': 1.0, 'drift_sd': 0.0}
+
+def test_stimulation_lowers_beta_and_burst_rate_per_subject():
+    fs, seconds = 250, 2000
+    sim = VirtualSubjects(n_subjects=3, n_channels=2, fs=fs, seed=0, params=FIXED)
+    sim.set_current([0.0, 1.0, 2.0])
+    engine = SpectralEngine(fs, {'beta': [13.0, 30.0]})
+    beta = np.zeros(3)
+    onsets = np.zeros(3, dtype=int)
+    was_active = np.zeros(3, dtype=bool)
+    for _ in range(seconds):
+        chunk = sim.next_chunk(fs)
+        assert chunk.shape == (3, 2, fs)
+        beta += engine.bandpowers(chunk)[..., 0].mean(axis=-1)
+        onsets += sim.burst_active & ~was_active
+        was_active = sim.burst_active
+    assert np.allclose(sim.effective_mA, [0.0, 1.0, 2.0])
+    assert np.allclose(sim.beta_amp, [2.0, 1.5, 1.0])
+    assert beta[0] > beta[1] > beta[2]
+    # onset rate 0.1 * exp(-mA) per s: ~200, ~74, ~27 bursts
+    assert onsets[0] > onsets[1] > onsets[2] and onsets[0] > 3 * onsets[2]
+
+def test_stimulation_effect_follows_the_time_constant():
+    sim = VirtualSubjects(n_subjects=2, n_channels=1, fs=250, seed=1, params=FIXED)
+    sim.set_current(2.0)
+    for _ in range(10):                      # one tau of 1 s chunks
+        sim.next_chunk(250)
+    assert np.allclose(sim.effective_mA, 2.0 * (1 - np.exp(-1.0)))
+    sim.set_current(0.0)
+    for _ in range(100):
+        sim.next_chunk(250)
+    assert np.all(sim.effective_mA < 0.01)
+
+def test_subjects_are_drawn_from_the_population_and_reproducible():
+    a = VirtualSubjects(n_subjects=4, n_channels=2, seed=7)
+    b = VirtualSubjects(n_subjects=4, n_channels=2, seed=7)
+    assert len(set(a.params['beta_hz'])) == 4
+    np.testing.assert_array_equal(a.next_chunk(100), b.next_chunk(100))
@@ -3,12 +3,37 @@ def test_imports():
     import importlib
     for mod in [
         'src.app.closed_loop',
+        'src.app.sweep',
+        'src.app.stages',
+        'src.app.metrics',
+        'src.app.session_host',
+        'src.app.extract',
         'src.streaming.lsl_client',
+        'src.streaming.simulator',
+        'src.streaming.lsl_ingest',
+        'src.streaming.lsl_local',
+        'src.streaming.replay',
+        'src.streaming.acquisition_process',
+        'src.processing.channel_pool',
+        'src.utils.shm_ring',
         'src.processing.eeg_pipeline',
+        'src.processing.spectral',
+        'src.processing.preprocess',
+        'src.processing.feature_graph',
+        'src.processing.signal_quality',
         'src.policy.bandpower_controller',
         'src.policy.ml_policy',
         'src.hardware.stimulator_api',
+        'src.hardware.ramp_scheduler',
+        'src.hardware.socket_stimulator',
+        'src.hardware.mock_device',
         'src.safety.safety_manager',
+        'src.safety.confirmation',
         'src.utils.signal',
+        'src.utils.ringbuffer',
+        'src.utils.clock',
+        'src.utils.logsink',
+        'src.utils.sockets',
+        'src.recording.session_recorder',
     ]:
         importlib.import_module(mod)
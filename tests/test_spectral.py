@@ -0,0 +1,110 @@
+
+import numpy as np
+import pytest
+
+from src.utils.signal import welch_bandpower, _trapz
+from src.processing.eeg_pipeline import EEGPipeline
+
+BANDS = {'beta': [13.0, 30.0], 'alpha': [8.0, 12.0]}
+
+def _reference_bandpower(x, fs, fmin, fmax):
+    # Per-segment loop, as the pipeline computed it before batching
+    x = x - np.mean(x)
+    nperseg = min(len(x), 256)
+    step = nperseg - nperseg // 2
+    psds = []
+    for start in range(0, len(x)-nperseg+1, step):
+        seg = x[start:start+nperseg] * np.hanning(nperseg)
+        psds.append(np.abs(np.fft.rfft(seg))**2 / (fs * np.sum(np.hanning(nperseg)**2)))
+    psd = np.mean(psds, axis=0)
+    freqs = np.fft.rfftfreq(nperseg, 1.0/fs)
+    band = (freqs >= fmin) & (freqs <= fmax)
+    return float(_trapz(psd[band], freqs[band]))
+
+def test_batched_features_match_per_channel_welch():
+    rng = np.random.default_rng(0)
+    chunk = rng.normal(size=(16, 500))
+    feats = EEGPipeline(fs=250, bands=BANDS).features(chunk)
+    for name, (fmin, fmax) in BANDS.items():
+        ref = np.mean([_reference_bandpower(chunk[ch], 250, fmin, fmax) for ch in range(16)])
+        assert np.isclose(feats[f"{name}_power"], ref, rtol=1e-12)
+        assert np.isclose(welch_bandpower(chunk[0], 250, fmin, fmax),
+                          _reference_bandpower(chunk[0], 250, fmin, fmax), rtol=1e-12)
+
+def test_sliding_window_matches_batch_welch_on_each_window():
+    from src.processing.spectral import SlidingWelch, SpectralEngine
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=(8, 2500))
+    engine = SpectralEngine(250, BANDS)  # the disjoint path's plan
+    for hop_sec in (0.128, 0.256, 1.024):  # divisor, equal, multiple of the 128-sample step
+        sw = SlidingWelch(250, BANDS, 8, window_sec=2.0, hop_sec=hop_sec)
+        for end in range(sw.hop, x.shape[1] + 1, sw.hop):
+            bp = sw.push(x[:, end-sw.hop:end])
+            if end >= sw.window:
+                assert np.allclose(bp, engine.bandpowers(x[:, end-sw.window:end]), rtol=1e-10)
+            else:
+                assert bp is None
+    # a hop off the default 128-sample step gets a step that fits it (2 x 62 samples)
+    sw = SlidingWelch(250, BANDS, 8, window_sec=2.0, hop_sec=0.25)
+    assert (sw.hop, sw.plan.nperseg, sw.plan.step) == (62, 256, 124)
+    ref = SpectralEngine(250, BANDS, nperseg=256, noverlap=256 - 124)
+    for end in range(sw.hop, x.shape[1] + 1, sw.hop):
+        bp = sw.push(x[:, end-sw.hop:end])
+        if end >= sw.window:
+            assert np.allclose(bp, ref.bandpowers(x[:, end-sw.window:end]), rtol=1e-10)
+    with pytest.raises(ValueError, match='segment step'):
+        SlidingWelch(250, BANDS, 8, window_sec=2.0, hop_sec=0.25, nperseg=256, noverlap=128)
+    with pytest.raises(ValueError, match='pushes'):
+        sw.push(x[:, :10])
+
+def test_sliding_dft_matches_hann_periodogram_and_welch():
+    from src.processing.spectral import SlidingDFT, SpectralEngine
+    from src.utils.signal import band_weights
+    fs, N = 250, 250
+    t = np.arange(fs * 30) / fs
+    rng = np.random.default_rng(2)
+    x = np.stack([2 * np.sin(2 * np.pi * 20 * t) + np.sin(2 * np.pi * 10 * t) + 3.0
+                  + rng.normal(scale=0.3, size=t.size) for _ in range(4)])
+    sd = SlidingDFT(fs, BANDS, 4, window_sec=1.0, reanchor_sec=5.0)
+    w = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(N) / N)  # periodic Hann
+    W = band_weights(fs, N, tuple(tuple(b) for b in BANDS.values()))
+    welch = SpectralEngine(fs, BANDS, nperseg=N)
+    end = 0
+    for hop in [7, 62, 63, 100, 249, 250, 400] * 5:  # irregular hops, incl. > window
+        bp = sd.push(x[:, end:end+hop])
+        end += hop
+        if end >= N:
+            win = x[:, end-N:end] - x[:, end-N:end].mean(axis=-1, keepdims=True)
+            ref = (np.abs(np.fft.rfft(win * w)) ** 2 / (fs * w @ w)) @ W
+            assert np.allclose(bp, ref, rtol=1e-9)
+            # Welch's symmetric Hann over the same window differs only slightly
+            assert np.allclose(bp, welch.bandpowers(x[:, end-N:end]), rtol=0.02)
+
+def test_sliding_dft_warm_up_follows_welch():
+    from src.processing.eeg_pipeline import EEGPipeline
+    fs, hop = 250, 62
+    t = np.arange(fs * 3) / fs
+    rng = np.random.default_rng(4)
+    x = np.stack([2 * np.sin(2 * np.pi * 20 * t) + np.sin(2 * np.pi * 10 * t)
+                  + rng.normal(scale=0.3, size=t.size) for _ in range(2)])
+    welch = EEGPipeline(fs, {'beta': [13, 30]}, window_sec=1.0, hop_sec=0.25)
+    sdft = EEGPipeline(fs, {'beta': [13, 30]}, window_sec=1.0, hop_sec=0.25, feature_backend='sdft')
+    for i in range(8):
+        chunk = x[:, i * hop:(i + 1) * hop]
+        ref, bp = welch.bandpowers(chunk), sdft.bandpowers(chunk)
+        # before the window fills: the buffered samples, not a window padded with zeros
+        assert np.allclose(bp, ref, rtol=0.2 if i < 4 else 0.02)
+        assert sdft.last_window.shape == welch.last_window.shape
+
+def test_source_and_sliding_window_agree_on_the_hop():
+    import yaml
+    from src.app.closed_loop import ClosedLoopSession
+    from src.utils.clock import VirtualClock
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    cfg.update(mode='simulation', seconds=10)
+    cfg['safety']['require_human_confirm'] = False
+    cfg['eeg'].update(fs=100, hop_sec=0.29, window_sec=1.0, notch_hz=None)   # 28.999... samples
+    session = ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None)
+    assert session.run()['ticks'] > 30
+    assert session.src.n_samples == session.pipe.sliding.hop == 29
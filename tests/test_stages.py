@@ -0,0 +1,94 @@
+
+import threading
+
+from src.app.stages import StageQueue
+
+def test_drop_oldest_keeps_freshest_items():
+    q = StageQueue(maxsize=2, overflow='drop_oldest')
+    for i in range(5):
+        q.put(i)
+    assert q.dropped == 3
+    assert [q.get(), q.get(), q.get(timeout=0.01)] == [3, 4, None]
+
+def test_block_applies_backpressure_until_stopped():
+    q = StageQueue(maxsize=1, overflow='block')
+    stop = threading.Event()
+    assert q.put('a', stop)
+    t = threading.Thread(target=lambda: q.put('b', stop))
+    t.start()
+    t.join(0.2)
+    assert t.is_alive() and len(q) == 1
+    assert q.get() == 'a'
+    t.join(1.0)
+    assert q.get() == 'b' and q.dropped == 0
+
+def test_raw_chunks_are_never_dropped():
+    from types import SimpleNamespace
+    from src.app.stages import StagedRunner
+    session = SimpleNamespace(src=SimpleNamespace(n_samples=250, fs=250))
+    runner = StagedRunner(session, overflow='drop_oldest')
+    assert runner.q_proc.overflow == 'block' and runner.q_ctrl.overflow == 'drop_oldest'
+
+def _staged_session(seconds):
+    import yaml
+    from src.app.closed_loop import ClosedLoopSession
+    from src.utils.clock import VirtualClock
+    with open('configs/config.yaml', 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    cfg.update(mode='simulation', clock='virtual', seconds=seconds)
+    cfg['safety']['require_human_confirm'] = False
+    return ClosedLoopSession(cfg, clock=VirtualClock(), log_fn=lambda msg: None)
+
+def _trace(session, control_sec=0.0):
+    """Number every acquired chunk and log which numbers each stage handled."""
+    import time
+    seen = {'acquisition': [], 'processing': [], 'control': []}
+    acquire, process, control = session.acquire, session.process, session.control
+    def traced_acquire():
+        chunk = acquire()
+        if chunk is None:
+            return None
+        seen['acquisition'].append(len(seen['acquisition']))
+        return seen['acquisition'][-1], chunk
+    def traced_process(item):
+        seq, chunk = item
+        seen['processing'].append(seq)
+        feats, b_evt = process(chunk)
+        return dict(feats, seq=seq), b_evt
+    def traced_control(feats, b_evt, proposed_mA=None):
+        seen['control'].append(feats['seq'])
+        time.sleep(control_sec)
+        control(feats, b_evt, proposed_mA)
+    session.acquire, session.process, session.control = traced_acquire, traced_process, traced_control
+    return seen
+
+def test_staged_session_handles_every_tick_in_order():
+    from src.app.stages import StagedRunner
+    session = _staged_session(seconds=20)
+    seen = _trace(session)
+    runner = StagedRunner(session, queue_size=2, overflow='block')
+    metrics = runner.run()
+    assert all(st.error is None for st in runner.stages)
+    acq, proc, ctrl = seen['acquisition'], seen['processing'], seen['control']
+    assert len(acq) >= 20
+    # nothing dropped: each stage saw a gap-free prefix of the one before it, and only
+    # what was still queued (or in hand) when the session ended went unhandled
+    assert proc == acq[:len(proc)] and ctrl == proc[:len(ctrl)]
+    assert len(acq) - len(proc) <= len(runner.q_proc) + 1
+    assert len(proc) - len(ctrl) <= len(runner.q_ctrl) + 1
+    assert metrics['ticks'] == len(ctrl) and metrics['dropped_processing'] == metrics['dropped_control'] == 0
+
+def test_slow_control_skips_stale_features_but_never_raw_chunks():
+    from src.app.stages import StagedRunner
+    session = _staged_session(seconds=30)
+    seen = _trace(session, control_sec=0.005)
+    runner = StagedRunner(session, queue_size=2, overflow='drop_oldest')
+    metrics = runner.run()
+    acq, proc, ctrl = seen['acquisition'], seen['processing'], seen['control']
+    assert proc == acq[:len(proc)]                       # raw chunks: backpressure, no gaps
+    assert ctrl == sorted(set(ctrl)) and set(ctrl) <= set(proc)
+    assert metrics['dropped_control'] > 0 and metrics['dropped_processing'] == 0
+    # every processed tick was either controlled, dropped as stale, or still queued / in hand
+    unhandled = len(proc) - len(ctrl) - metrics['dropped_control']
+    assert len(runner.q_ctrl) <= unhandled <= len(runner.q_ctrl) + 1
+    assert metrics['ticks'] == len(ctrl)
@@ -0,0 +1,114 @@
+
+import socket, threading, time
+import pytest
+
+from src.hardware.mock_device import MockDeviceServer
+from src.hardware.ramp_scheduler import RampScheduler
+from src.hardware.socket_stimulator import SocketStimulator
+from src.hardware.stimulator_api import MockStimulator
+from src.utils.clock import VirtualClock
+
+def test_ramp_is_one_waveform_followed_by_the_mirror():
+    clock = VirtualClock()
+    stim = MockStimulator(log_fn=lambda msg: None, clock=clock)
+    seen = []
+    stim.add_output_listener(lambda t, mA: seen.append((t, mA)))
+    stim.current_mA = 1.0
+    stim.start()
+    ramp = RampScheduler(stim, clock=clock, step_sec=0.1)
+    ramp.ramp_to(2.0, seconds=1.0)
+    while ramp.poll():
+        clock.sleep(0.25)
+    assert stim.current_mA == 2.0
+    assert [mA for _, mA in seen] == pytest.approx([1.2, 1.5, 1.7, 2.0])
+    # charge follows the step-held setpoints that were actually applied
+    assert stim.delivered_mC == pytest.approx(0.25 * (1.0 + 1.2 + 1.5 + 1.7))
+
+def test_socket_stimulator_acknowledged_waveform_and_readback(tmp_path):
+    path = str(tmp_path / 'stim.sock')
+    dev = MockDeviceServer(path, latency_sec=0.001, max_mA=2.0, log_fn=lambda msg: None)
+    stim = SocketStimulator(path, log_fn=lambda msg: None)
+    try:
+        stim.connect()
+        stim.current_mA = 0.5
+        stim.start()
+        assert stim.readback() == 0.5
+        ramp = RampScheduler(stim, step_sec=0.05)
+        before = dev.commands
+        ramp.ramp_to(1.0, seconds=0.2)
+        while ramp.poll():
+            time.sleep(0.02)
+        assert dev.commands == before + 2  # the whole ramp was one command, plus the final readback
+        assert stim.current_mA == 1.0
+        time.sleep(0.01)
+        assert stim.readback() == 1.0
+        with pytest.raises(RuntimeError, match='device limit'):
+            stim.output(3.0)
+        ramp.safe_stop()
+        assert stim.readback() == 0.0
+    finally:
+        stim.disconnect()
+        dev.close()
+
+def test_rejected_waveform_safe_stops(tmp_path):
+    path = str(tmp_path / 'stim.sock')
+    dev = MockDeviceServer(path, max_mA=0.5, log_fn=lambda msg: None)
+    stim = SocketStimulator(path, log_fn=lambda msg: None)
+    try:
+        stim.connect()
+        stim.current_mA = 0.2
+        stim.start()
+        ramp = RampScheduler(stim, step_sec=0.05)
+        assert ramp.ramp_to(1.0, seconds=0.2) is False
+        assert not ramp.active and 'device limit' in ramp.fault
+        assert not stim.is_on and stim.readback() == 0.0
+    finally:
+        stim.disconnect()
+        dev.close()
+
+def test_device_lost_mid_ramp_is_caught_by_readback(tmp_path):
+    path = str(tmp_path / 'stim.sock')
+    dev = MockDeviceServer(path, log_fn=lambda msg: None)
+    stim = SocketStimulator(path, timeout_sec=0.2, log_fn=lambda msg: None)
+    try:
+        stim.connect()
+        stim.start()
+        ramp = RampScheduler(stim, step_sec=0.05)
+        assert ramp.ramp_to(1.0, seconds=0.2)
+        dev.close()  # the host keeps mirroring the playback it can no longer see
+        while ramp.poll():
+            time.sleep(0.02)
+        assert ramp.fault is not None and not stim.is_on
+    finally:
+        stim.disconnect()
+
+def test_garbled_reply_safe_stops(tmp_path):
+    path = str(tmp_path / 'stim.sock')
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+
+    def garble():
+        conn, _ = server.accept()
+        with conn, conn.makefile('rw', encoding='utf-8') as f:
+            for _ in f:
+                f.write("#!garbage\n")
+                f.flush()
+    threading.Thread(target=garble, daemon=True).start()
+    stim = SocketStimulator(path, timeout_sec=0.5, log_fn=lambda msg: None)
+    try:
+        stim.connect()
+        stim.is_on = True
+        ramp = RampScheduler(stim, step_sec=0.05)
+        assert ramp.ramp_to(1.0, seconds=0.2) is False
+        assert 'malformed acknowledgement' in ramp.fault and not stim.is_on
+    finally:
+        stim.disconnect()
+        server.close()
+
+def test_device_never_unlinks_a_regular_file(tmp_path):
+    path = tmp_path / 'stim.sock'
+    path.write_text('not a socket')
+    with pytest.raises(ValueError, match='not a socket'):
+        MockDeviceServer(str(path), log_fn=lambda msg: None)
+    assert path.read_text() == 'not a socket'